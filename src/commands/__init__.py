@@ -4,31 +4,99 @@ Registre dynamique des commandes slash du bot Discord.
 Convention :
 - Chaque fichier de ce package (hors _*) expose une fonction `register(bot)`
 	qui attache une ou plusieurs commandes au `bot.tree`.
-- La fonction `load_all_commands(bot)` importe et exécute automatiquement tous les modules de commandes.
+- La fonction `load_all_commands(bot)` importe et exécute automatiquement tous les modules de commandes
+	activés par le manifeste (`FEATURES` / `FEATURES_DISABLED`, voir `core.config`).
+- Chaque module est chronométré (import puis `register`) ; le détail est journalisé et conservé
+	dans `bot.feature_report`.
 """
 from __future__ import annotations
 
+import asyncio
 import importlib
 import pkgutil
 import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional
 import discord
 
+from core import config
+
 logger = logging.getLogger(__name__)
 
-async def load_all_commands(bot: discord.Client):
-	for mod in pkgutil.iter_modules(__path__):  # type: ignore[name-defined]
-		if mod.name.startswith('_'):
+
+@dataclass
+class ModuleLoad:
+	name: str
+	status: str  # "chargé" | "désactivé" | "sans register" | "échec"
+	import_s: float = 0.0
+	register_s: float = 0.0
+
+
+def available_features() -> List[str]:
+	return sorted(m.name for m in pkgutil.iter_modules(__path__) if not m.name.startswith('_'))  # type: ignore[name-defined]
+
+
+def feature_enabled(name: str) -> bool:
+	"""Vrai si le module de commandes `name` est activé par le manifeste."""
+	if name in config.FEATURES_DISABLED:
+		return False
+	return config.FEATURES is None or name in config.FEATURES
+
+
+def format_feature_report(loads: List[ModuleLoad]) -> str:
+	loaded = [m for m in loads if m.status == "chargé"]
+	total = sum(m.import_s + m.register_s for m in loads)
+	parts = [
+		f"{m.name} {m.import_s * 1000:.0f}+{m.register_s * 1000:.0f}ms"
+		for m in sorted(loaded, key=lambda m: m.import_s + m.register_s, reverse=True)
+	]
+	others = [f"{m.name} ({m.status})" for m in loads if m.status != "chargé"]
+	line = f"Modules de commandes: {len(loaded)}/{len(loads)} en {total * 1000:.0f}ms (import+register) : " + ", ".join(parts)
+	if others:
+		line += " ; " + ", ".join(others)
+	return line
+
+
+async def load_all_commands(bot: discord.Client) -> List[ModuleLoad]:
+	loads: List[ModuleLoad] = []
+	names = available_features()
+	for wanted in sorted((config.FEATURES or set()) | config.FEATURES_DISABLED):
+		if wanted not in names:
+			logger.warning("Manifeste: module de commandes inconnu %r (disponibles: %s)", wanted, ", ".join(names))
+	for name in names:
+		full_name = f"{__name__}.{name}"
+		if not feature_enabled(name):
+			loads.append(ModuleLoad(name, "désactivé"))
 			continue
-		full_name = f"{__name__}.{mod.name}"
+		load = ModuleLoad(name, "chargé")
+		loads.append(load)
+		started = time.perf_counter()
+		module: Optional[object] = None
 		try:
 			module = importlib.import_module(full_name)
-			if hasattr(module, 'register'):
-				reg = getattr(module, 'register')
-				result = reg(bot)
-				if hasattr(result, '__await__'):
-					await result
-				logger.debug("Commande chargée: %s", full_name)
 		except Exception:  # noqa: BLE001
+			load.status = "échec"
 			logger.exception("Echec chargement commande %s", full_name)
+		load.import_s = time.perf_counter() - started
+		if module is not None:
+			if not hasattr(module, 'register'):
+				load.status = "sans register"
+			else:
+				started = time.perf_counter()
+				try:
+					result = getattr(module, 'register')(bot)
+					if hasattr(result, '__await__'):
+						await result
+					logger.debug("Commande chargée: %s", full_name)
+				except Exception:  # noqa: BLE001
+					load.status = "échec"
+					logger.exception("Echec chargement commande %s", full_name)
+				load.register_s = time.perf_counter() - started
+		# Rend la main entre deux imports : les phases de démarrage concurrentes (schémas DB) avancent
+		await asyncio.sleep(0)
+	bot.feature_report = loads  # type: ignore[attr-defined]
+	logger.info("%s", format_feature_report(loads))
+	return loads
 
-__all__ = ["load_all_commands"]
+__all__ = ["load_all_commands", "feature_enabled", "available_features", "ModuleLoad", "format_feature_report"]
@@ -1,16 +1,29 @@
 """
-Commandes slash `/autorole` : create, add, remove, list, link, delete, modify.
+Commandes slash `/autorole` : create, add, remove, list, link, delete, modify, repair, backfill (start/status/cancel).
 
 Implémentation MVP complète : la logique métier est déléguée à `views/autorole.py` (UI) et `db/autorole.py` (persistance).
+
+Deux modes de panneau :
+- component (défaut) : bouton / select(s) persistants
+- reaction : le membre réagit avec l'emoji de l'item ; les handlers `on_raw_reaction_*`
+  passent par un index mémoire `(channel_id, message_id) -> groupe` et ne touchent jamais
+  la base pour les messages qui ne sont pas des panneaux.
 """
 from __future__ import annotations
 
+import asyncio
 import re
 import discord
 from discord import app_commands
 import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
 
+from core import member_cache, metrics
+from core.db import workload
 from core.permissions import require_perms, ADMINISTRATOR
+from core.autorole_backfill import get_backfill_engine
+from core.autorole_repair import get_repair_sweeper
 from db import autorole as db
 from views import autorole as ui
 
@@ -78,6 +91,28 @@ def _parse_emojis_arg(text: str | None, count: int):
     return parts[:count]
 
 
+def _group_mode(grp) -> str:
+    try:
+        return str(grp['mode'] or 'component')
+    except Exception:
+        return 'component'
+
+
+def _reaction_index(client: discord.Client) -> "ReactionIndex":
+    ensure_autorole_runtime(client)
+    return client.autorole_runtime.reaction_index  # type: ignore[attr-defined]
+
+
+async def _refresh_reaction_group(client: discord.Client, pool, grp):
+    """Recharge l'entrée d'index d'un groupe en mode réaction après modification."""
+    if grp is None or _group_mode(grp) != 'reaction':
+        return
+    try:
+        await _reaction_index(client).refresh_group(pool, int(grp['id']))
+    except Exception:
+        logger.exception("Autorole: échec rafraîchissement index réactions (%s)", grp['id'])
+
+
 def _bot_role_position_ok(guild: discord.Guild, role_id: int) -> bool:
     # Vérifie que le bot peut gérer le rôle (position dans la hiérarchie Discord)
     me = guild.me
@@ -162,6 +197,7 @@ async def add(inter: discord.Interaction, nom_groupe: str, role: discord.Role, e
     except Exception:
         await inter.response.send_message("Conflit (doublon rôle/position)", ephemeral=True)
         return
+    await _refresh_reaction_group(inter.client, pool, grp)
     await inter.response.send_message("Ajouté.", ephemeral=True)
 
 
@@ -194,6 +230,7 @@ async def remove(inter: discord.Interaction, nom_groupe: str, cible: str):
         await db.remove_item_by_role(pool, grp['id'], rid)
     else:
         await db.remove_item_by_emoji(pool, grp['id'], cible)
+    await _refresh_reaction_group(inter.client, pool, grp)
     await inter.response.send_message("Retiré.", ephemeral=True)
 
 
@@ -221,7 +258,7 @@ async def list_cmd(inter: discord.Interaction, nom_groupe: str | None = None):
                 fb = bool(g['feedback'])
             except Exception:
                 fb = True
-            lines.append(f"• {g['name']} — multi={g['multi']} max={g['max']} feedback={fb} — {state}{' (cassé)' if g['broken'] else ''}")
+            lines.append(f"• {g['name']} — multi={g['multi']} max={g['max']} feedback={fb} mode={_group_mode(g)} — {state}{' (cassé)' if g['broken'] else ''}")
         await inter.response.send_message("\n".join(lines) or "Aucun groupe.", ephemeral=True)
         return
     grp = await db.get_group(pool, inter.guild.id, nom_groupe)
@@ -244,10 +281,17 @@ async def ac_nom_groupe_list(interaction: discord.Interaction, current: str):
 @autorole.command(name="link", description="Lier à un message / créer panneau")
 @app_commands.describe(
     nom_groupe="Nom du groupe",
-    message="ID ou lien d’un message existant (laisser vide pour créer un panneau)"
+    message="ID ou lien d’un message existant (laisser vide pour créer un panneau)",
+    mode="component (bouton/select, défaut) ou reaction (emoji de chaque rôle)"
+)
+@app_commands.choices(
+    mode=[
+        app_commands.Choice(name="component", value="component"),
+        app_commands.Choice(name="reaction", value="reaction"),
+    ]
 )
 @require_perms(ADMINISTRATOR)
-async def link(inter: discord.Interaction, nom_groupe: str, message: str | None = None):
+async def link(inter: discord.Interaction, nom_groupe: str, message: str | None = None, mode: str | None = None):
     if not inter.guild or not isinstance(inter.channel, discord.TextChannel):
         await inter.response.send_message("Salon texte requis", ephemeral=True)
         return
@@ -277,6 +321,9 @@ async def link(inter: discord.Interaction, nom_groupe: str, message: str | None
                 target_message = await inter.channel.fetch_message(mid)
         except Exception:
             target_message = None
+    if mode == "reaction":
+        await _link_reaction_panel(inter, pool, grp, items, target_message)
+        return
     # build UI per rules
     count = len(items)
     view: Optional[discord.ui.View] = None
@@ -341,10 +388,12 @@ async def link(inter: discord.Interaction, nom_groupe: str, message: str | None
             # Copy content and attach UI below
             content = target_message.content or None
             out = await inter.channel.send(content=content, view=view)
-            await db.update_group(pool, grp['id'], linked_message_id=out.id, channel_id=inter.channel.id, broken=False)
+            await db.update_group(pool, grp['id'], linked_message_id=out.id, channel_id=inter.channel.id, broken=False, mode="component")
         else:
             out = await inter.channel.send(embed=embed, view=view)
-            await db.update_group(pool, grp['id'], linked_message_id=out.id, channel_id=inter.channel.id, broken=False)
+            await db.update_group(pool, grp['id'], linked_message_id=out.id, channel_id=inter.channel.id, broken=False, mode="component")
+        # Un groupe repassé en mode composant ne doit plus réagir aux réactions
+        _reaction_index(inter.client).discard_group(int(grp['id']))
         await inter.followup.send("Lié.", ephemeral=True)
     except Exception:
         logger.exception("Link failed")
@@ -352,6 +401,32 @@ async def link(inter: discord.Interaction, nom_groupe: str, message: str | None
         await inter.followup.send("Echec lien.", ephemeral=True)
 
 
+async def _link_reaction_panel(inter: discord.Interaction, pool, grp, items, target_message: discord.Message | None):
+    """Publie un panneau en mode réaction et enregistre le message dans l'index."""
+    usable = [it for it in items if ui.reaction_key(it['emoji'])]
+    if not usable:
+        await inter.followup.send("Aucun emoji défini pour ce groupe (voir /autorole modify emojis).", ephemeral=True)
+        return
+    try:
+        if target_message:
+            out = await inter.channel.send(content=target_message.content or None)  # type: ignore[union-attr]
+        else:
+            out = await inter.channel.send(embed=ui.build_reaction_embed(grp['name'], usable, inter.guild))  # type: ignore[union-attr, arg-type]
+        for it in usable:
+            try:
+                await out.add_reaction(ui.parse_emoji(it['emoji']))  # type: ignore[arg-type]
+            except Exception:
+                logger.warning("Autorole: emoji invalide %r (groupe %s)", it['emoji'], grp['name'])
+        await db.update_group(pool, grp['id'], linked_message_id=out.id, channel_id=inter.channel.id, broken=False, mode="reaction")  # type: ignore[union-attr]
+        await _reaction_index(inter.client).refresh_group(pool, int(grp['id']))
+        skipped = len(items) - len(usable)
+        await inter.followup.send("Lié (réactions)." + (f" {skipped} rôle(s) sans emoji ignoré(s)." if skipped else ""), ephemeral=True)
+    except Exception:
+        logger.exception("Link (reaction) failed")
+        await db.update_group(pool, grp['id'], broken=True)
+        await inter.followup.send("Echec lien.", ephemeral=True)
+
+
 @link.autocomplete('nom_groupe')
 async def ac_nom_groupe_link(interaction: discord.Interaction, current: str):
     return await _group_choices(interaction, current)
@@ -379,6 +454,8 @@ async def delete(inter: discord.Interaction, nom_groupe: str):
             except Exception:
                 pass
     await db.delete_group(pool, inter.guild.id, nom_groupe)
+    if grp:
+        _reaction_index(inter.client).discard_group(int(grp['id']))
     await inter.response.send_message("Supprimé.", ephemeral=True)
 
 
@@ -433,6 +510,7 @@ async def modify(inter: discord.Interaction, nom_groupe: str, cible: str, valeur
     if cible == 'multi':
         new_multi = str(valeur).lower() in ('1','true','yes','y','on')
         await db.update_group(pool, grp['id'], multi=new_multi, max_value=(1 if not new_multi else grp['max']))
+        await _refresh_reaction_group(inter.client, pool, grp)
         await inter.response.send_message("MAJ ok.", ephemeral=True)
         return
     if cible == 'max':
@@ -442,6 +520,7 @@ async def modify(inter: discord.Interaction, nom_groupe: str, cible: str, valeur
             await inter.response.send_message("Entier requis.", ephemeral=True)
             return
         await db.update_group(pool, grp['id'], max_value=new_max)
+        await _refresh_reaction_group(inter.client, pool, grp)
         await inter.response.send_message("MAJ ok.", ephemeral=True)
         return
     if cible == 'feedback':
@@ -465,6 +544,8 @@ async def modify(inter: discord.Interaction, nom_groupe: str, cible: str, valeur
             for idx, rid in enumerate(roles, start=1):
                 em = emojis[idx-1] if idx-1 < len(emojis) else None
                 await db.add_item(pool, rec['id'], rid, em, idx)
+        # Le groupe est recréé (nouvel id, non lié) : l'ancienne entrée d'index est caduque
+        _reaction_index(inter.client).discard_group(int(grp['id']))
         await inter.response.send_message("MAJ ok.", ephemeral=True)
         return
     if cible == 'emojis':
@@ -479,6 +560,7 @@ async def modify(inter: discord.Interaction, nom_groupe: str, cible: str, valeur
                 await conn.execute("DELETE FROM autorole_item WHERE group_id=$1", grp['id'])
                 for idx, it in enumerate(items, start=1):
                     await conn.execute("INSERT INTO autorole_item(group_id, role_id, emoji, position) VALUES($1,$2,$3,$4)", grp['id'], it['role_id'], em_list[idx-1] if idx-1 < len(em_list) else None, idx)
+        await _refresh_reaction_group(inter.client, pool, grp)
         await inter.response.send_message("MAJ ok.", ephemeral=True)
         return
     await inter.response.send_message("Cible inconnue.", ephemeral=True)
@@ -489,9 +571,277 @@ async def ac_nom_groupe_modify(interaction: discord.Interaction, current: str):
     return await _group_choices(interaction, current)
 
 
+@autorole.command(name="repair", description="Vérifier et republier les panneaux cassés de ce serveur")
+@require_perms(ADMINISTRATOR)
+async def repair(inter: discord.Interaction):
+    if not inter.guild:
+        await inter.response.send_message("Guild requise", ephemeral=True)
+        return
+    sweeper = get_repair_sweeper(inter.client)
+    if sweeper is None:
+        await inter.response.send_message("DB non configurée", ephemeral=True)
+        return
+    await inter.response.defer(ephemeral=True, thinking=True)
+    try:
+        # Vérification complète (existence des messages) limitée au serveur courant
+        reports = await sweeper.sweep(guild_id=inter.guild.id, deep=True)
+    except Exception:
+        logger.exception("Autorole repair failed")
+        await inter.followup.send("Echec réparation.", ephemeral=True)
+        return
+    await inter.followup.send(embed=ui.build_repair_embed(reports), ephemeral=True)
+
+
+backfill = app_commands.Group(name="backfill", description="Ajout/retrait massif des rôles d'un groupe", parent=autorole)
+
+
+@backfill.command(name="start", description="Appliquer les rôles d'un groupe à tous les membres correspondants")
+@app_commands.describe(
+    nom_groupe="Nom du groupe",
+    action="add (donner) ou remove (retirer)",
+    role="Rôle du groupe à appliquer (add: requis si le groupe a plusieurs rôles ; remove: vide = tous)",
+    filtre_role="Ne traiter que les membres ayant ce rôle",
+    sans_role_groupe="Ne traiter que les membres n'ayant encore aucun rôle du groupe",
+)
+@app_commands.choices(
+    action=[
+        app_commands.Choice(name="add", value="add"),
+        app_commands.Choice(name="remove", value="remove"),
+    ]
+)
+@require_perms(ADMINISTRATOR)
+async def backfill_start(inter: discord.Interaction, nom_groupe: str, action: str, role: discord.Role | None = None,
+                         filtre_role: discord.Role | None = None, sans_role_groupe: bool | None = False):
+    if not inter.guild:
+        await inter.response.send_message("Guild requise", ephemeral=True)
+        return
+    pool = getattr(inter.client, 'db_pool', None)
+    engine = get_backfill_engine(inter.client)
+    if pool is None or engine is None:
+        await inter.response.send_message("DB non configurée", ephemeral=True)
+        return
+    grp = await db.get_group(pool, inter.guild.id, nom_groupe)
+    if not grp:
+        await inter.response.send_message("Groupe introuvable.", ephemeral=True)
+        return
+    group_role_ids = [int(it['role_id']) for it in await db.list_items(pool, grp['id'])]
+    if role is not None:
+        if role.id not in group_role_ids:
+            await inter.response.send_message("Ce rôle n'appartient pas au groupe.", ephemeral=True)
+            return
+        role_ids = [role.id]
+    elif action == 'remove' or len(group_role_ids) == 1:
+        role_ids = group_role_ids
+    else:
+        await inter.response.send_message("Précisez le rôle à donner (le groupe en contient plusieurs).", ephemeral=True)
+        return
+    role_ids = [rid for rid in role_ids if _bot_role_position_ok(inter.guild, rid)]
+    if not role_ids:
+        await inter.response.send_message("Rôle(s) trop haut(s) ou introuvable(s).", ephemeral=True)
+        return
+    job = await db.create_backfill_job(
+        pool, inter.guild.id, int(grp['id']), action, role_ids,
+        filter_role_id=filtre_role.id if filtre_role else None,
+        only_without_group=bool(sans_role_groupe),
+        total=inter.guild.member_count or len(inter.guild.members),
+        created_by=inter.user.id,
+    )
+    if job is None:
+        await inter.response.send_message("Un backfill est déjà en cours pour ce groupe.", ephemeral=True)
+        return
+    engine.start(job)
+    await inter.response.send_message(f"Backfill #{job['id']} démarré. Suivi: /autorole backfill status", ephemeral=True)
+
+
+@backfill_start.autocomplete('nom_groupe')
+async def ac_nom_groupe_backfill_start(interaction: discord.Interaction, current: str):
+    return await _group_choices(interaction, current)
+
+
+@backfill.command(name="status", description="Progression des jobs de backfill")
+@require_perms(ADMINISTRATOR)
+async def backfill_status(inter: discord.Interaction):
+    if not inter.guild:
+        await inter.response.send_message("Guild requise", ephemeral=True)
+        return
+    pool = getattr(inter.client, 'db_pool', None)
+    engine = get_backfill_engine(inter.client)
+    if pool is None or engine is None:
+        await inter.response.send_message("DB non configurée", ephemeral=True)
+        return
+    jobs = await db.list_backfill_jobs(pool, inter.guild.id)
+    live = {jid: prog for jid, prog in engine.progress.items() if engine.is_running(jid)}
+    await inter.response.send_message(embed=ui.build_backfill_embed(jobs, live), ephemeral=True)
+
+
+@backfill.command(name="cancel", description="Annuler le backfill en cours d'un groupe")
+@app_commands.describe(nom_groupe="Nom du groupe")
+@require_perms(ADMINISTRATOR)
+async def backfill_cancel(inter: discord.Interaction, nom_groupe: str):
+    if not inter.guild:
+        await inter.response.send_message("Guild requise", ephemeral=True)
+        return
+    pool = getattr(inter.client, 'db_pool', None)
+    engine = get_backfill_engine(inter.client)
+    if pool is None or engine is None:
+        await inter.response.send_message("DB non configurée", ephemeral=True)
+        return
+    grp = await db.get_group(pool, inter.guild.id, nom_groupe)
+    job = await db.get_running_backfill_job(pool, int(grp['id'])) if grp else None
+    if not job:
+        await inter.response.send_message("Aucun backfill en cours pour ce groupe.", ephemeral=True)
+        return
+    await engine.cancel(int(job['id']))
+    await inter.response.send_message(f"Backfill #{job['id']} annulé ({job['processed']} membres traités).", ephemeral=True)
+
+
+@backfill_cancel.autocomplete('nom_groupe')
+async def ac_nom_groupe_backfill_cancel(interaction: discord.Interaction, current: str):
+    return await _group_choices(interaction, current)
+
+
+@dataclass
+class _PendingRoleEdit:
+    member: discord.Member
+    future: asyncio.Future
+    add: Dict[int, discord.Role] = field(default_factory=dict)
+    remove: Dict[int, discord.Role] = field(default_factory=dict)
+    reason: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+
+
+class RoleEditCoalescer:
+    """Fusionne les modifications de rôles d'un même membre sur une courte fenêtre.
+
+    Plusieurs clics (select) ou réactions rapprochés sont fusionnés : un rôle ajouté puis retiré
+    dans la fenêtre ne coûte aucun appel REST. Les changements restants sont appliqués en deltas
+    (`add_roles` / `remove_roles`, un appel atomique par rôle) et jamais en remplaçant la liste
+    complète des rôles : un rôle modifié entre-temps par un autre bot ou un modérateur n'est pas
+    écrasé par l'état (éventuellement périmé) du cache. Chaque appelant attend le flush commun et
+    reçoit l'éventuelle exception (ex: `discord.Forbidden`).
+    """
+
+    def __init__(self, delay: float = 0.25):
+        self.delay = delay
+        self._pending: Dict[tuple[int, int], _PendingRoleEdit] = {}
+
+    async def submit(self, member: discord.Member, *, add: Sequence[discord.Role] = (), remove: Sequence[discord.Role] = (), reason: Optional[str] = None):
+        key = (member.guild.id, member.id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = _PendingRoleEdit(member=member, future=asyncio.get_running_loop().create_future())
+            self._pending[key] = pending
+            pending.task = asyncio.create_task(self._flush_later(key))
+        pending.member = member
+        # La dernière intention gagne pour un même rôle
+        for r in add:
+            pending.remove.pop(r.id, None)
+            pending.add[r.id] = r
+        for r in remove:
+            pending.add.pop(r.id, None)
+            pending.remove[r.id] = r
+        if reason:
+            pending.reason = reason
+        await asyncio.shield(pending.future)
+
+    async def _flush_later(self, key: tuple[int, int]):
+        await asyncio.sleep(self.delay)
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        try:
+            member = pending.member
+            if pending.remove:
+                await member.remove_roles(*pending.remove.values(), reason=pending.reason)
+            if pending.add:
+                await member.add_roles(*pending.add.values(), reason=pending.reason)
+        except Exception as exc:  # noqa: BLE001
+            pending.future.set_exception(exc)
+            # Marque l'exception comme récupérée si plus personne n'attend
+            pending.future.exception()
+        else:
+            pending.future.set_result(None)
+
+
+@dataclass
+class ReactionBinding:
+    """Entrée d'index d'un panneau en mode réaction."""
+    group_id: int
+    guild_id: int
+    channel_id: int
+    message_id: int
+    multi: bool
+    max_value: int
+    roles: Dict[str, int] = field(default_factory=dict)  # reaction_key -> role_id
+
+
+class ReactionIndex:
+    """Index mémoire des panneaux en mode réaction.
+
+    `on_raw_reaction_*` est déclenché pour chaque réaction de chaque serveur : la
+    recherche `(channel_id, message_id)` est un simple accès dict, la base n'est
+    consultée qu'à la construction (démarrage) et lors des modifications d'un groupe.
+    """
+
+    def __init__(self):
+        self._by_message: Dict[tuple[int, int], ReactionBinding] = {}
+        self._by_group: Dict[int, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_message)
+
+    def lookup(self, channel_id: int, message_id: int) -> Optional[ReactionBinding]:
+        return self._by_message.get((channel_id, message_id))
+
+    def put(self, binding: ReactionBinding):
+        self.discard_group(binding.group_id)
+        key = (binding.channel_id, binding.message_id)
+        self._by_message[key] = binding
+        self._by_group[binding.group_id] = key
+
+    def discard_group(self, group_id: int):
+        key = self._by_group.pop(group_id, None)
+        if key is not None:
+            self._by_message.pop(key, None)
+
+    @staticmethod
+    def _bindings_from_rows(rows) -> list[ReactionBinding]:
+        out: Dict[int, ReactionBinding] = {}
+        for r in rows:
+            gid = int(r['group_id'])
+            b = out.get(gid)
+            if b is None:
+                b = ReactionBinding(group_id=gid, guild_id=int(r['guild_id']), channel_id=int(r['channel_id']),
+                                    message_id=int(r['linked_message_id']), multi=bool(r['multi']), max_value=int(r['max']))
+                out[gid] = b
+            k = ui.reaction_key(r['emoji'])
+            if k:
+                b.roles.setdefault(k, int(r['role_id']))
+        return list(out.values())
+
+    async def load(self, pool):
+        rows = await db.fetch_reaction_rows(pool)
+        self._by_message.clear()
+        self._by_group.clear()
+        for b in self._bindings_from_rows(rows):
+            self.put(b)
+
+    async def refresh_group(self, pool, group_id: int):
+        rows = await db.fetch_reaction_rows(pool, group_id)
+        self.discard_group(group_id)
+        for b in self._bindings_from_rows(rows):
+            self.put(b)
+
+
 class AutoroleRuntime:
+    def __init__(self):
+        self.roles = RoleEditCoalescer()
+        self.reaction_index = ReactionIndex()
+
+    @workload("autorole", "interactive")
+    @metrics.timed(metrics.AUTOROLE_SECONDS, op="toggle")
     async def handle_toggle(self, interaction: discord.Interaction, role_id: int, multi: bool, group_id: int | None = None):
-        member = interaction.guild.get_member(interaction.user.id) if interaction.guild else None
+        member = member_cache.from_interaction(interaction)
         role = interaction.guild.get_role(role_id) if interaction.guild else None
         if not isinstance(member, discord.Member) or not role:
             await interaction.followup.send("Introuvable.", ephemeral=True)
@@ -527,8 +877,10 @@ class AutoroleRuntime:
             logger.exception("Autorole toggle failed")
             await interaction.followup.send("Echec.", ephemeral=True)
 
+    @workload("autorole", "interactive")
+    @metrics.timed(metrics.AUTOROLE_SECONDS, op="select")
     async def handle_select(self, interaction: discord.Interaction, group_name: str, role_ids: list[int], multi: bool, max_value: int, scope_ids: list[int] | None = None):
-        member = interaction.guild.get_member(interaction.user.id) if interaction.guild else None
+        member = member_cache.from_interaction(interaction)
         if not isinstance(member, discord.Member):
             await interaction.followup.send("Introuvable.", ephemeral=True)
             return
@@ -597,10 +949,7 @@ class AutoroleRuntime:
                 await interaction.followup.send("Aucune modification.", ephemeral=True)
             return
         try:
-            if to_remove:
-                await member.remove_roles(*to_remove, reason="autorole select (deselection)")
-            if to_add:
-                await member.add_roles(*to_add, reason="autorole select")
+            await self.roles.submit(member, add=to_add, remove=to_remove, reason="autorole select")
             # Réponse conditionnelle selon feedback
             try:
                 fb = bool(grp['feedback'])
@@ -614,17 +963,107 @@ class AutoroleRuntime:
             logger.exception("Autorole select failed")
             await interaction.followup.send("Echec.", ephemeral=True)
 
+    @workload("autorole", "interactive")
+    @metrics.timed(metrics.AUTOROLE_SECONDS, op="reaction")
+    async def handle_reaction(self, bot: discord.Client, payload: discord.RawReactionActionEvent, added: bool):
+        binding = self.reaction_index.lookup(payload.channel_id, payload.message_id)
+        if binding is None:
+            return
+        if bot.user is not None and payload.user_id == bot.user.id:
+            return
+        role_id = binding.roles.get(ui.reaction_key(payload.emoji) or '')
+        if role_id is None:
+            return
+        guild = bot.get_guild(binding.guild_id)
+        if guild is None or guild.me is None:
+            return
+        if added and payload.member:
+            member = payload.member
+            member_cache.remember(member)
+        else:
+            try:
+                member = await member_cache.resolve(guild, payload.user_id)
+            except Exception:
+                return
+            if member is None:
+                return
+        if member.bot:
+            return
+        role = guild.get_role(role_id)
+        if not role or role >= guild.me.top_role:
+            return
+        try:
+            if not added:
+                if role in member.roles:
+                    await self.roles.submit(member, remove=[role], reason="autorole reaction (retrait)")
+                return
+            if role in member.roles:
+                return
+            group_role_ids = set(binding.roles.values())
+            to_remove: list[discord.Role] = []
+            if not binding.multi:
+                to_remove = [r for r in member.roles if r.id in group_role_ids and r.id != role_id and r < guild.me.top_role]
+            elif binding.max_value > 0:
+                held = sum(1 for r in member.roles if r.id in group_role_ids)
+                if held >= binding.max_value:
+                    # Limite atteinte : on retire la réaction pour refléter le refus
+                    channel = guild.get_channel(payload.channel_id)
+                    if isinstance(channel, discord.TextChannel):
+                        try:
+                            await channel.get_partial_message(payload.message_id).remove_reaction(payload.emoji, member)
+                        except Exception:
+                            pass
+                    return
+            await self.roles.submit(member, add=[role], remove=to_remove, reason="autorole reaction")
+        except discord.Forbidden:
+            logger.warning("Autorole: permissions insuffisantes (groupe %s, rôle %s)", binding.group_id, role_id)
+        except Exception:
+            logger.exception("Autorole reaction failed")
+
 
 def ensure_autorole_runtime(bot: discord.Client):
     """Garantit l'initialisation du runtime autorole sur le bot."""
     rt = getattr(bot, 'autorole_runtime', None)
-    if not hasattr(rt, 'handle_select') or not hasattr(rt, 'handle_toggle'):
+    if not hasattr(rt, 'handle_select') or not hasattr(rt, 'handle_toggle') or not hasattr(rt, 'handle_reaction'):
         bot.autorole_runtime = AutoroleRuntime()  # type: ignore
 
 
+async def load_reaction_index(bot: discord.Client) -> int:
+    """Construit l'index des panneaux en mode réaction depuis la base (démarrage)."""
+    pool = getattr(bot, 'db_pool', None)
+    if pool is None:
+        return 0
+    index = _reaction_index(bot)
+    await index.load(pool)
+    return len(index)
+
+
+async def resume_backfill_jobs(bot: discord.Client) -> int:
+    """Relance les jobs de backfill interrompus (à appeler une fois le cache des serveurs prêt)."""
+    engine = get_backfill_engine(bot)
+    if engine is None:
+        return 0
+    return await engine.resume_all()
+
+
+def setup_reaction_listeners(bot: discord.Client):
+    @bot.event
+    async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):  # type: ignore
+        rt = getattr(bot, 'autorole_runtime', None)
+        if rt is not None and payload.guild_id is not None:
+            await rt.handle_reaction(bot, payload, added=True)
+
+    @bot.event
+    async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):  # type: ignore
+        rt = getattr(bot, 'autorole_runtime', None)
+        if rt is not None and payload.guild_id is not None:
+            await rt.handle_reaction(bot, payload, added=False)
+
+
 def register(bot: discord.Client):
     bot.tree.add_command(autorole)
     ensure_autorole_runtime(bot)
+    setup_reaction_listeners(bot)
 
 from typing import Iterable
 
@@ -655,26 +1094,13 @@ async def ensure_autorole_views(bot: discord.Client) -> int:
             try:
                 if not g['linked_message_id'] or not g['channel_id']:
                     continue
+                # Les panneaux en mode réaction n'ont pas de vue (servis par l'index mémoire)
+                if _group_mode(g) == 'reaction':
+                    continue
                 items = await db.list_items(pool, g['id'])
                 if not items:
                     continue
-                count = len(items)
-                if count == 1:
-                    label = None
-                    style = None
-                    try:
-                        label = g['button_label']
-                    except Exception:
-                        label = None
-                    try:
-                        style = int(g['button_style']) if g['button_style'] is not None else None
-                    except Exception:
-                        style = None
-                    v = ui.AutoroleButton(role_id=int(items[0]['role_id']), multi=bool(g['multi']), guild_id=guild.id, group_id=int(g['id']), label=label, style=style)
-                elif 2 <= count <= 25:
-                    v = ui.AutoroleSelect(group_name=str(g['name']), group_id=int(g['id']), items=items, multi=bool(g['multi']), max_value=int(g['max']), guild=guild)
-                else:
-                    v = ui.AutoroleMultiSelect(group_name=str(g['name']), group_id=int(g['id']), items=items, multi=bool(g['multi']), max_value=int(g['max']), guild=guild)
+                v = ui.build_panel_view(g, items, guild)
                 bot.add_view(v)
                 added += 1
             except Exception:
@@ -686,4 +1112,7 @@ async def ensure_autorole_views(bot: discord.Client) -> int:
     return added
 
 
-__all__ = ["register", "ensure_autorole_runtime", "AutoroleRuntime", "ensure_autorole_views"]
+__all__ = [
+    "register", "ensure_autorole_runtime", "AutoroleRuntime", "ensure_autorole_views",
+    "RoleEditCoalescer", "ReactionIndex", "load_reaction_index", "resume_backfill_jobs",
+]
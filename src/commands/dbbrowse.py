@@ -3,27 +3,53 @@ Commande slash `/dbbrowse` refactorisée.
 
 Utilise les modules db/ et views/ pour la logique métier et l'UI.
 Permet de parcourir les tables de la base de données via Discord.
+La navigation est paginée par clé (voir `db.dbbrowse`) : chaque bouton coûte une requête indexée,
+quelle que soit la taille de la table ; le total affiché est estimé, « Compter » donne le total exact.
+`/dbquery` (propriétaire de l'application) exécute une requête SELECT en lecture seule, sous le rôle
+`DBQUERY_ROLE`, paginée par curseur serveur.
+`/dbexport` (owner) exporte une table complète en pièce jointe gzip (CSV ou JSON lines, voir `core.table_export`).
 """
 from __future__ import annotations
 
+import asyncio
 import discord
 from discord import app_commands
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Dict, Optional
+from core import config
+from core.db import workload
+from core.lazy import lazy_import
+from core.permissions import app_owner_only, owner_only
 from db import dbbrowse as db_layer
-from views import dbbrowse as view_layer
+
+# Chargés à la première utilisation (rendu des pages, export)
+view_layer = lazy_import("views.dbbrowse")
+table_export = lazy_import("core.table_export")
 
 logger = logging.getLogger(__name__)
 
+MAX_EXPORT_PARTS = 10
+DEFAULT_FILESIZE_LIMIT = 25 * 1024 * 1024
+
+# Chaque console ouverte réserve une connexion du pool : leur nombre est borné
+_QUERY_SLOTS = asyncio.Semaphore(config.DBQUERY_MAX_SESSIONS)
+
+Anchor = db_layer.Anchor
+FIRST = db_layer.FIRST
+LAST = db_layer.LAST
+
+
 @dataclass
 class BrowserSession:
     user_id: int
     tables: list[str]
     current_table: Optional[str] = None
-    page_cache: Dict[tuple[str, int], db_layer.TablePage] = field(default_factory=dict)
     current_page_index: int = 0
     page_size: int = 10
+    exact_totals: Dict[str, int] = field(default_factory=dict)
+    current_anchor: Anchor = FIRST
+    current_page: Optional[db_layer.TablePage] = None
 
 
 class DBBrowserView(discord.ui.View):
@@ -42,19 +68,49 @@ class DBBrowserView(discord.ui.View):
             except Exception:  # noqa: BLE001
                 pass
 
-    async def get_page(self, table: str, page: int):
+    @workload("dbbrowse", "browse")
+    async def get_meta(self, table: str) -> db_layer.TableMeta:
+        return await db_layer.fetch_table_meta(self.pool, table)
+
+    def _apply_total(self, page_obj: db_layer.TablePage):
+        exact = self.session.exact_totals.get(page_obj.table)
+        if exact is not None:
+            page_obj.total = exact
+            page_obj.total_exact = True
+
+    @workload("dbbrowse", "browse")
+    async def get_page(self, table: str, anchor: Anchor = FIRST, page: int = 0, *, approx: bool = False):
         # Validation défensive: table doit exister dans la liste blanche connue
         if table not in self.session.tables:
             raise ValueError("Table non autorisée")
-        key = (table, page)
-        if key not in self.session.page_cache:
-            self.session.page_cache[key] = await db_layer.fetch_page(self.pool, table, page, self.session.page_size)
-        return self.session.page_cache[key]
+        meta = await self.get_meta(table)
+        shared = await db_layer.cached_page(self.pool, meta, self.session.page_size, anchor)
+        # Page partagée entre sessions : l'index affiché dépend du chemin de navigation, on travaille sur une copie
+        page_obj = replace(shared, page=page, page_approx=approx)
+        if anchor[0] == 'before' and not page_obj.has_prev:
+            page_obj.page, page_obj.page_approx = 0, False
+        self._apply_total(page_obj)
+        self.session.current_table = table
+        self.session.current_anchor = anchor
+        self.session.current_page_index = page_obj.page
+        self.session.current_page = page_obj
+        self._prefetch_neighbor(meta, page_obj, backwards=anchor[0] in ('before', 'last'))
+        return page_obj
+
+    def _prefetch_neighbor(self, meta: db_layer.TableMeta, page_obj: db_layer.TablePage, *, backwards: bool):
+        """Précharge la page suivante dans le sens de navigation."""
+        if backwards and page_obj.has_prev and page_obj.first_key is not None:
+            anchor: Anchor = ('before', page_obj.first_key)
+        elif not backwards and page_obj.has_next and page_obj.last_key is not None:
+            anchor = ('after', page_obj.last_key)
+        else:
+            return
+        db_layer.prefetch_page(self.pool, meta, self.session.page_size, anchor)
 
     def build_current_embed(self):
         if not self.session.current_table:
             return view_layer.build_root_embed(self.session.tables)
-        page_obj = self.session.page_cache.get((self.session.current_table, self.session.current_page_index))
+        page_obj = self.session.current_page
         if not page_obj:
             # Fallback embed minimal (ne devrait pas arriver car get_page est appelé avant)
             return view_layer.build_root_embed(self.session.tables)
@@ -64,16 +120,36 @@ class DBBrowserView(discord.ui.View):
         if not self.session.current_table:
             await interaction.response.edit_message(embed=view_layer.build_root_embed(self.session.tables), view=self)
             return
-        # Recharger page courante (invalider cache entrée)
-        key = (self.session.current_table, self.session.current_page_index)
+        # Recharger page courante (purger le cache partagé de la table et rafraîchir l'estimation)
+        table = self.session.current_table
+        db_layer.invalidate_table(table)
+        current = self.session.current_page
         try:
-            self.session.page_cache[key] = await db_layer.fetch_page(
-                self.pool, self.session.current_table, self.session.current_page_index, self.session.page_size
+            await self.get_page(
+                table, self.session.current_anchor, self.session.current_page_index,
+                approx=bool(current and current.page_approx),
             )
         except Exception:  # noqa: BLE001
             pass
         await interaction.response.edit_message(embed=self.build_current_embed(), view=self)
 
+    @workload("dbbrowse", "browse")
+    async def count_table(self, interaction: discord.Interaction):
+        """Comptage exact (COUNT(*)) de la table courante, uniquement sur demande."""
+        table = self.session.current_table
+        if not table:
+            await interaction.response.defer()
+            return
+        await interaction.response.defer()
+        try:
+            self.session.exact_totals[table] = await db_layer.exact_count(self.pool, table)
+        except Exception:  # noqa: BLE001
+            logger.exception("dbbrowse: échec comptage exact %s", table)
+            return
+        if self.session.current_page is not None:
+            self._apply_total(self.session.current_page)
+        await interaction.edit_original_response(embed=self.build_current_embed(), view=self)
+
 class TableSelect(discord.ui.Select):
     def __init__(self, browser_view: DBBrowserView):
         self.browser_view = browser_view
@@ -85,9 +161,7 @@ class TableSelect(discord.ui.Select):
             await interaction.response.defer(ephemeral=True)
             return
         table = self.values[0]
-        self.browser_view.session.current_table = table
-        self.browser_view.session.current_page_index = 0
-        await self.browser_view.get_page(table, 0)
+        await self.browser_view.get_page(table, FIRST, 0)
         await interaction.response.edit_message(embed=self.browser_view.build_current_embed(), view=self.browser_view)
 
 
@@ -96,38 +170,50 @@ class NavButtons(discord.ui.View):
         super().__init__(timeout=None)
         self.browser = browser
 
+    def _last_page_index(self, page_obj: db_layer.TablePage) -> tuple[int, bool]:
+        """Index de la dernière page déduit du total (exact ou estimé)."""
+        if page_obj.total is None:
+            return page_obj.page + 1, True
+        pages = -(-page_obj.total // page_obj.page_size)
+        return max(pages - 1, page_obj.page + 1), not page_obj.total_exact
+
     async def _move(self, interaction: discord.Interaction, direction: str):
         if interaction.user.id != self.browser.session.user_id:
             await interaction.response.defer(ephemeral=True)
             return
-        if not self.browser.session.current_table:
+        session = self.browser.session
+        current = session.current_page
+        if not session.current_table or current is None:
             await interaction.response.defer()
             return
-        current = self.browser.session.current_page_index
-        new_page = current
         if direction == 'first':
-            new_page = 0
+            if not current.has_prev:
+                await interaction.response.defer()
+                return
+            await self.browser.get_page(session.current_table, FIRST, 0)
         elif direction == 'prev':
-            new_page = max(current - 1, 0)
+            if not current.has_prev or current.first_key is None:
+                await interaction.response.defer()
+                return
+            await self.browser.get_page(
+                session.current_table, ('before', current.first_key), max(current.page - 1, 0),
+                approx=current.page_approx,
+            )
         elif direction == 'next':
-            new_page = current + 1
-        elif direction == 'last':  # best effort: increment until empty
-            # naive: chercher jusqu'à page vide (limité à 100 pages)
-            test_page = current
-            while test_page - current < 100:
-                page_obj = await db_layer.fetch_page(
-                    self.browser.pool, self.browser.session.current_table, test_page, self.browser.session.page_size
-                )
-                self.browser.session.page_cache[(self.browser.session.current_table, test_page)] = page_obj
-                if page_obj.total <= test_page * page_obj.page_size:
-                    break
-                test_page += 1
-            new_page = test_page
-        if new_page == current:
-            await interaction.response.defer()
-            return
-        self.browser.session.current_page_index = new_page
-        await self.browser.get_page(self.browser.session.current_table, new_page)
+            if not current.has_next or current.last_key is None:
+                await interaction.response.defer()
+                return
+            await self.browser.get_page(
+                session.current_table, ('after', current.last_key), current.page + 1,
+                approx=current.page_approx,
+            )
+        elif direction == 'last':
+            # Saut direct en fin de table (ORDER BY clé DESC), sans parcourir les pages intermédiaires
+            if not current.has_next:
+                await interaction.response.defer()
+                return
+            index, approx = self._last_page_index(current)
+            await self.browser.get_page(session.current_table, LAST, index, approx=approx)
         await interaction.response.edit_message(embed=self.browser.build_current_embed(), view=self.browser)
 
     @discord.ui.button(label="Retour", style=discord.ButtonStyle.danger)
@@ -158,17 +244,102 @@ class NavButtons(discord.ui.View):
     async def refresh_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
         await self.browser.refresh_table(interaction)
 
+    @discord.ui.button(label="Compter", style=discord.ButtonStyle.secondary)
+    async def count_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
+        if interaction.user.id != self.browser.session.user_id:
+            await interaction.response.defer(ephemeral=True)
+            return
+        await self.browser.count_table(interaction)
+
+
+class QueryConsoleView(discord.ui.View):
+    """Pager d'une requête `/dbquery` ; ferme le curseur (et rend la connexion) à l'inactivité."""
+
+    def __init__(self, cursor: db_layer.QueryCursor, user_id: int):
+        super().__init__(timeout=config.DBQUERY_IDLE_TIMEOUT)
+        self.cursor = cursor
+        self.user_id = user_id
+        self.page: Optional[db_layer.TablePage] = None
+        self.message: Optional[discord.Message] = None
+        self._released = False
+
+    def build_embed(self) -> discord.Embed:
+        footer = f"Exécution : {self.cursor.last_ms:.0f} ms"
+        if self.page is not None and self.page.rows:
+            first = self.page.page * self.page.page_size + 1
+            footer += f" · lignes {first}-{first + len(self.page.rows) - 1}"
+        if self._released:
+            footer += " · curseur fermé"
+        return view_layer.build_table_embed(self.page, title="Requête", footer=footer)
 
-def is_guild_owner(inter: discord.Interaction) -> bool:
-    return inter.guild is not None and inter.user.id == inter.guild.owner_id
+    async def load(self, page: int):
+        self.page = await self.cursor.fetch(page)
+        self.prev_btn.disabled = not self.page.has_prev
+        self.first_btn.disabled = not self.page.has_prev
+        self.next_btn.disabled = not self.page.has_next
+
+    async def release(self):
+        if self._released:
+            return
+        self._released = True
+        for child in self.children:
+            child.disabled = True
+        try:
+            await self.cursor.close()
+        finally:
+            _QUERY_SLOTS.release()
 
+    async def on_timeout(self):  # noqa: D401
+        await self.release()
+        if self.message:
+            try:
+                await self.message.edit(embed=self.build_embed(), view=self)
+            except Exception:  # noqa: BLE001
+                pass
 
-def owner_only():
-    def predicate(inter: discord.Interaction):
-        if not is_guild_owner(inter):
-            raise app_commands.CheckFailure("Réservé au propriétaire du serveur.")
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.defer(ephemeral=True)
+            return False
         return True
-    return app_commands.check(predicate)
+
+    async def _goto(self, interaction: discord.Interaction, page: int):
+        try:
+            await self.load(page)
+        except Exception as e:  # noqa: BLE001
+            # Transaction avortée (timeout, erreur SQL) : le curseur n'est plus utilisable
+            await self.release()
+            self.stop()
+            await interaction.response.edit_message(content=f"Erreur : {e}", embed=self.build_embed(), view=self)
+            return
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="<<", style=discord.ButtonStyle.secondary)
+    async def first_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
+        await self._goto(interaction, 0)
+
+    @discord.ui.button(label="<", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
+        await self._goto(interaction, max(self.page.page - 1, 0) if self.page else 0)
+
+    @discord.ui.button(label=">", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
+        await self._goto(interaction, self.page.page + 1 if self.page else 0)
+
+    @discord.ui.button(label="Plan", style=discord.ButtonStyle.primary)
+    async def plan_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
+        try:
+            plan = await self.cursor.explain()
+        except Exception as e:  # noqa: BLE001
+            await interaction.response.send_message(f"EXPLAIN impossible : {e}", ephemeral=True)
+            return
+        await interaction.response.send_message(view_layer.build_plan_text(plan), ephemeral=True)
+
+    @discord.ui.button(label="Fermer", style=discord.ButtonStyle.danger)
+    async def close_btn(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore
+        await self.release()
+        self.stop()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
 
 
 def register(bot: discord.Client):
@@ -200,16 +371,130 @@ def register(bot: discord.Client):
     async def db_browse_error(interaction: discord.Interaction, error: app_commands.AppCommandError):  # type: ignore
         if isinstance(error, app_commands.CheckFailure):
             try:
+                text = str(error) or "Commande réservée au propriétaire du serveur."
                 if not interaction.response.is_done():
-                    await interaction.response.send_message("Commande réservée au propriétaire du serveur.", ephemeral=True)
+                    await interaction.response.send_message(text, ephemeral=True)
                 else:
-                    await interaction.followup.send("Commande réservée au propriétaire du serveur.", ephemeral=True)
+                    await interaction.followup.send(text, ephemeral=True)
             except Exception:  # noqa: BLE001
                 pass
-            logger.debug("dbbrowse refusé pour user %s (owner only)", interaction.user.id)
+            logger.debug("%s refusé pour user %s (%s)", interaction.command and interaction.command.name, interaction.user.id, error)
             return
         raise error
 
     bot.tree.add_command(db_browse)
 
+    @app_commands.command(name="dbexport", description="(Owner) Exporter une table en fichier compressé")
+    @app_commands.describe(
+        table="Table à exporter",
+        format="Format du fichier",
+        split="Découper en plusieurs fichiers au-delà de la limite de pièce jointe (sinon export tronqué)",
+    )
+    @app_commands.choices(format=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="JSON lines", value="jsonl"),
+    ])
+    @owner_only()
+    async def db_export(interaction: discord.Interaction, table: str, format: Optional[app_commands.Choice[str]] = None,
+                        split: bool = False):
+        pool = getattr(interaction.client, 'db_pool', None)
+        if pool is None:
+            await interaction.response.send_message("Pool DB indisponible", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        if table not in await db_layer.fetch_tables(pool):
+            await interaction.followup.send("Table inconnue.", ephemeral=True)
+            return
+        fmt = format.value if format else "csv"
+        limit = getattr(interaction.guild, 'filesize_limit', None) or DEFAULT_FILESIZE_LIMIT
+        try:
+            with workload("dbexport", "bulk"):
+                result = await table_export.export_table(pool, table, fmt, limit, split=split, max_parts=MAX_EXPORT_PARTS)
+        except Exception:  # noqa: BLE001
+            logger.exception("dbexport: échec export %s", table)
+            await interaction.followup.send("Erreur pendant l'export.", ephemeral=True)
+            return
+        try:
+            summary = (
+                f"Export `{table}` ({fmt}, gzip) : {result.rows} lignes en {result.seconds:.1f}s "
+                f"({result.rows_per_second:.0f} lignes/s), {result.size / 1024:.0f} Ko"
+            )
+            if len(result.parts) > 1:
+                summary += f", {len(result.parts)} parties"
+            if result.truncated:
+                summary += "\n⚠️ Export tronqué à la limite de taille" + (
+                    f" ({MAX_EXPORT_PARTS} parties max)." if split else " (relancer avec split pour découper)."
+                )
+            # Une partie par message : la limite de taille s'applique au total des pièces jointes
+            for i, part in enumerate(result.parts):
+                await interaction.followup.send(
+                    summary if i == 0 else None,
+                    file=discord.File(part.file, filename=result.filename(i)),
+                    ephemeral=True,
+                )
+        finally:
+            result.close()
+
+    @app_commands.command(name="dbquery", description="(Owner) Exécuter une requête SELECT en lecture seule")
+    @app_commands.describe(query="Requête SELECT / WITH … SELECT / VALUES", explain="Afficher aussi le plan d'exécution")
+    @app_owner_only()
+    async def db_query(interaction: discord.Interaction, query: str, explain: bool = False):
+        pool = getattr(interaction.client, 'db_pool', None)
+        if pool is None:
+            await interaction.response.send_message("Pool DB indisponible", ephemeral=True)
+            return
+        if _QUERY_SLOTS.locked():
+            await interaction.response.send_message(
+                "Trop de consoles SQL ouvertes, fermez-en une (ou attendez son expiration).", ephemeral=True
+            )
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await _QUERY_SLOTS.acquire()
+        cursor = db_layer.QueryCursor(
+            pool, query, 10,
+            timeout_ms=config.DBQUERY_TIMEOUT_MS,
+            # Filet de sécurité serveur : un peu au-delà de l'expiration de la vue
+            idle_timeout_ms=(config.DBQUERY_IDLE_TIMEOUT + 30) * 1000,
+            role=config.DBQUERY_ROLE,
+        )
+        view = QueryConsoleView(cursor, interaction.user.id)
+        try:
+            await cursor.open()
+            await view.load(0)
+            plan = await cursor.explain() if explain else None
+        except Exception as e:  # noqa: BLE001
+            await view.release()
+            view.stop()
+            logger.info("dbquery refusée/échouée pour %s: %s", interaction.user.id, e)
+            await interaction.followup.send(f"Erreur : {e}", ephemeral=True)
+            return
+        try:
+            view.message = await interaction.followup.send(embed=view.build_embed(), view=view, ephemeral=True)
+        except Exception:  # noqa: BLE001
+            # Vue jamais affichée : son expiration ne libérerait pas la connexion
+            await view.release()
+            raise
+        if plan:
+            await interaction.followup.send(view_layer.build_plan_text(plan), ephemeral=True)
+
+    db_query.error(db_browse_error)
+
+    bot.tree.add_command(db_query)
+
+    @db_export.autocomplete('table')
+    async def db_export_table_autocomplete(interaction: discord.Interaction, current: str):
+        pool = getattr(interaction.client, 'db_pool', None)
+        if pool is None:
+            return []
+        try:
+            tables = await db_layer.fetch_tables(pool)
+        except Exception:  # noqa: BLE001
+            return []
+        current = (current or "").lower()
+        return [app_commands.Choice(name=t, value=t) for t in tables if current in t.lower()][:25]
+
+    db_export.error(db_browse_error)
+
+    bot.tree.add_command(db_export)
+
 __all__ = ["register"]
\ No newline at end of file
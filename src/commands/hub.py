@@ -11,8 +11,11 @@ import logging
 from core.voice_hubs.manager import VoiceHubsManager
 from db import voice_hubs as db_voice_hubs
 from core.permissions import require_perms, ADMINISTRATOR
-from views import hub as hub_view
-from views.voice_hubs import build_control_view, build_control_embed
+from core import member_cache
+from core.lazy import lazy_import
+
+hub_view = lazy_import("views.hub")
+voice_hubs_view = lazy_import("views.voice_hubs")
 
 logger = logging.getLogger(__name__)
 
@@ -139,7 +142,7 @@ async def hub_panel(interaction: discord.Interaction):
         await interaction.response.send_message("Commande uniquement disponible dans un serveur.", ephemeral=True)
         return
 
-    member = interaction.guild.get_member(interaction.user.id)
+    member = member_cache.from_interaction(interaction)
     if not isinstance(member, discord.Member):
         await interaction.response.send_message("Impossible de récupérer votre profil membre.", ephemeral=True)
         return
@@ -159,8 +162,8 @@ async def hub_panel(interaction: discord.Interaction):
         await interaction.response.send_message("Ce salon ne vous appartient pas.", ephemeral=True)
         return
 
-    embed = build_control_embed(meta, channel, member)
-    view = build_control_view(mgr, meta)
+    embed = voice_hubs_view.build_control_embed(meta, channel, member)
+    view = voice_hubs_view.build_control_view(mgr, meta)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 
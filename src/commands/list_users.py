@@ -2,64 +2,154 @@
 Commande slash `/list_users` avec pagination.
 
 Affiche la liste paginée des utilisateurs présents en base de données.
+La pagination se fait par clé sur `(updated_at, id)` (voir `db.list_users`) : la page voisine dans
+le sens de lecture est préchargée pendant que l'utilisateur lit la page courante. Le total est mis
+en cache et estimé sur les grosses tables. Option `recherche` : filtre par nom (index pg_trgm) ;
+option `ce_serveur` : uniquement les membres actuels du serveur (table `guild_member`).
 """
 from __future__ import annotations
 
+import asyncio
 import discord
 import logging
+from discord import app_commands
 from math import ceil
+from typing import Dict, Optional, Tuple
+from core.lazy import lazy_import
 from db import list_users as list_users_db
-from views import list_users as list_users_view
+
+list_users_view = lazy_import("views.list_users")
 
 logger = logging.getLogger(__name__)
 
 PAGE_SIZE = 20
 
+# ('first', None) | ('after', clé) | ('before', clé) | ('last', None)
+Cursor = Tuple[str, Optional[list_users_db.UserKey]]
+FIRST: Cursor = ('first', None)
+LAST: Cursor = ('last', None)
+
 def register(bot: discord.Client):
     @bot.tree.command(name="list_users", description="Liste paginée des utilisateurs BD")
-    async def list_users_cmd(interaction: discord.Interaction):
+    @app_commands.describe(
+        recherche="Filtrer par nom affiché ou nom d'utilisateur",
+        ce_serveur="Uniquement les membres actuels de ce serveur",
+    )
+    async def list_users_cmd(interaction: discord.Interaction, recherche: Optional[str] = None, ce_serveur: bool = False):
         if getattr(bot, "db_pool", None) is None:
             await interaction.response.send_message("DB non configurée", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True, thinking=True)
+        search = (recherche or "").strip() or None
+        guild_id = interaction.guild.id if ce_serveur and interaction.guild else None
         try:
-            total = await list_users_db.count_users(bot.db_pool)  # type: ignore[arg-type]
+            total, exact = await list_users_db.count_users(bot.db_pool, search, guild_id)  # type: ignore[arg-type]
         except Exception:  # noqa: BLE001
             logger.exception("Erreur count users")
             await interaction.followup.send("Erreur list", ephemeral=True)
             return
 
         class UsersPaginator(discord.ui.View):
-            def __init__(self, *, total: int, author: discord.abc.User):  # type: ignore[override]
+            def __init__(self, *, total: int, exact: bool, author: discord.abc.User, search: Optional[str],
+                         guild_id: Optional[int]):  # type: ignore[override]
                 super().__init__(timeout=180)
                 self.total = total
+                self.exact = exact
                 self.author = author
-                self.page = 0
-                self.pages = max(1, ceil(total / PAGE_SIZE))
+                self.search = search
+                self.guild_id = guild_id
+                self.start = 0  # rang (0-based) de la première ligne affichée
+                self.approx = False
+                self.rows: list = []
+                self.has_prev = False
+                self.has_next = False
                 self.message: discord.Message | None = None
-                self._refresh_buttons()
+                self._prefetched: Dict[Cursor, asyncio.Task] = {}
+
+            @property
+            def page(self) -> int:
+                # Arrondi supérieur : la dernière page (saut direct) peut chevaucher la précédente
+                return -(-self.start // PAGE_SIZE)
+
+            @property
+            def pages(self) -> int:
+                pages = max(1, ceil(self.total / PAGE_SIZE))
+                if not self.has_next and not self.approx:
+                    return self.page + 1
+                return max(pages, self.page + 1 + (1 if self.has_next else 0))
+
+            async def fetch_rows(self, cursor: Cursor):
+                kind, key = cursor
+                return await list_users_db.fetch_users_page(
+                    bot.db_pool, PAGE_SIZE,  # type: ignore[arg-type]
+                    after=key if kind == 'after' else None,
+                    before=key if kind == 'before' else None,
+                    last=kind == 'last',
+                    search=self.search,
+                    guild_id=self.guild_id,
+                )
+
+            async def load(self, cursor: Cursor, start: int, *, approx: bool = False):
+                task = self._prefetched.pop(cursor, None)
+                self._cancel_prefetch()
+                rows = None
+                if task is not None:
+                    try:
+                        rows = await task
+                    except Exception:  # noqa: BLE001
+                        rows = None
+                if rows is None:
+                    rows = await self.fetch_rows(cursor)
+                kind = cursor[0]
+                more = len(rows) > PAGE_SIZE
+                if kind in ('before', 'last'):
+                    # La ligne en trop est en tête : elle signale une page précédente
+                    rows = rows[-PAGE_SIZE:]
+                    self.has_prev, self.has_next = more, kind == 'before'
+                else:
+                    rows = rows[:PAGE_SIZE]
+                    self.has_prev, self.has_next = kind == 'after', more
+                if not self.has_prev:
+                    start, approx = 0, False
+                self.rows, self.start, self.approx = list(rows), max(start, 0), approx
+                self._prefetch_neighbor(backwards=kind in ('before', 'last'))
+
+            def _prefetch_neighbor(self, *, backwards: bool):
+                """Précharge la page suivante dans le sens de lecture."""
+                if not self.rows:
+                    return
+                if backwards and self.has_prev:
+                    cursor: Cursor = ('before', list_users_db.row_key(self.rows[0]))
+                elif not backwards and self.has_next:
+                    cursor = ('after', list_users_db.row_key(self.rows[-1]))
+                else:
+                    return
+                self._prefetched[cursor] = asyncio.create_task(self.fetch_rows(cursor))
 
-            async def fetch_rows(self, page: int):
-                offset = page * PAGE_SIZE
-                return await list_users_db.fetch_users_page(bot.db_pool, offset, PAGE_SIZE)  # type: ignore[arg-type]
+            def _cancel_prefetch(self):
+                for task in self._prefetched.values():
+                    task.cancel()
+                self._prefetched.clear()
 
             def _refresh_buttons(self):
                 first_btn = self.children[0]
                 prev_btn = self.children[1]
                 next_btn = self.children[2]
                 last_btn = self.children[3]
-                first_btn.disabled = prev_btn.disabled = (self.page <= 0)
-                next_btn.disabled = last_btn.disabled = (self.page >= self.pages - 1)
+                first_btn.disabled = prev_btn.disabled = not self.has_prev
+                next_btn.disabled = last_btn.disabled = not self.has_next
 
-            async def build_embed(self):
-                rows = await self.fetch_rows(self.page)
-                if not rows:
-                    return list_users_view.build_empty_embed(self.total)
-                return list_users_view.build_users_embed(self.total, self.page, self.pages, PAGE_SIZE, rows)
+            def build_embed(self):
+                if not self.rows:
+                    return list_users_view.build_empty_embed(self.total, exact=self.exact, search=self.search)
+                return list_users_view.build_users_embed(
+                    self.total, self.page, self.pages, PAGE_SIZE, self.rows,
+                    exact=self.exact, search=self.search, approx_page=self.approx, start=self.start,
+                )
 
             async def update_message(self, interaction: discord.Interaction):
                 self._refresh_buttons()
-                embed = await self.build_embed()
+                embed = self.build_embed()
                 if self.message is None:
                     self.message = await interaction.followup.send(embed=embed, view=self, ephemeral=True)
                 else:
@@ -72,6 +162,7 @@ def register(bot: discord.Client):
                 return True
 
             async def on_timeout(self):  # noqa: D401
+                self._cancel_prefetch()
                 for child in self.children:
                     if isinstance(child, discord.ui.Button):
                         child.disabled = True
@@ -83,28 +174,30 @@ def register(bot: discord.Client):
 
             @discord.ui.button(label="≪", style=discord.ButtonStyle.secondary)
             async def first(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
-                self.page = 0
+                await self.load(FIRST, 0)
                 await self.update_message(interaction)
 
             @discord.ui.button(label="‹", style=discord.ButtonStyle.secondary)
             async def prev(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
-                if self.page > 0:
-                    self.page -= 1
+                if self.has_prev and self.rows:
+                    await self.load(('before', list_users_db.row_key(self.rows[0])), self.start - PAGE_SIZE, approx=self.approx)
                 await self.update_message(interaction)
 
             @discord.ui.button(label="›", style=discord.ButtonStyle.secondary)
             async def next(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
-                if self.page < self.pages - 1:
-                    self.page += 1
+                if self.has_next and self.rows:
+                    await self.load(('after', list_users_db.row_key(self.rows[-1])), self.start + len(self.rows), approx=self.approx)
                 await self.update_message(interaction)
 
             @discord.ui.button(label="≫", style=discord.ButtonStyle.secondary)
             async def last(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
-                self.page = self.pages - 1
+                # Saut direct (tri inversé) ; le rang affiché découle du total, approximatif s'il est estimé
+                await self.load(LAST, self.total - PAGE_SIZE, approx=not self.exact)
                 await self.update_message(interaction)
 
             @discord.ui.button(label="Fermer", style=discord.ButtonStyle.danger)
             async def close(self, interaction: discord.Interaction, button: discord.ui.Button):  # type: ignore[override]
+                self._cancel_prefetch()
                 for child in self.children:
                     if isinstance(child, discord.ui.Button):
                         child.disabled = True
@@ -114,11 +207,12 @@ def register(bot: discord.Client):
                     await interaction.response.send_message("Fermé", ephemeral=True)
                 self.stop()
 
-        paginator = UsersPaginator(total=total, author=interaction.user)
+        paginator = UsersPaginator(total=total, exact=exact, author=interaction.user, search=search, guild_id=guild_id)
         try:
+            await paginator.load(FIRST, 0)
             await paginator.update_message(interaction)
         except Exception:  # noqa: BLE001
             logger.exception("Erreur list_users")
             await interaction.followup.send("Erreur list", ephemeral=True)
 
-__all__ = ["register"]
\ No newline at end of file
+__all__ = ["register"]
@@ -0,0 +1,52 @@
+"""
+Commande slash `/name_history`.
+
+Affiche les derniers changements de nom (username global, pseudo par serveur) d'un utilisateur,
+lus dans la table partitionnée `discord_user_name_history`. Accessible aux administrateurs,
+uniquement pour les membres du serveur courant : l'historique global d'un utilisateur n'est pas
+consultable depuis un serveur qu'il ne partage pas.
+"""
+from __future__ import annotations
+
+import discord
+import logging
+from discord import app_commands
+from core.permissions import require_perms, ADMINISTRATOR
+from core.lazy import lazy_import
+
+name_history_db = lazy_import("db.name_history")
+name_history_view = lazy_import("views.name_history")
+
+logger = logging.getLogger(__name__)
+
+def register(bot: discord.Client):
+    @bot.tree.command(name="name_history", description="Historique des noms d'un utilisateur (admin)")
+    @app_commands.describe(membre="Membre du serveur concerné")
+    @require_perms(ADMINISTRATOR, message="Admin requis (bit 8).")
+    async def name_history_cmd(interaction: discord.Interaction, membre: discord.Member):
+        if getattr(bot, "db_pool", None) is None:
+            await interaction.response.send_message("DB non configurée", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        # Les renommages encore en tampon doivent apparaître
+        history = getattr(bot, "name_history", None)
+        try:
+            if history is not None:
+                await history.flush()
+            # Pseudos des autres serveurs non affichés
+            rows = await name_history_db.fetch_history(bot.db_pool, membre.id, membre.guild.id)
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur historique des noms")
+            await interaction.followup.send("Erreur historique", ephemeral=True)
+            return
+        await interaction.followup.send(embed=name_history_view.build_history_embed(membre, rows), ephemeral=True)
+
+    @name_history_cmd.error
+    async def name_history_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+        # Utilisateur hors du serveur : Discord ne fournit pas de membre à convertir
+        if isinstance(error, app_commands.TransformerError):
+            await interaction.response.send_message("Membre introuvable sur ce serveur.", ephemeral=True)
+            return
+        raise error
+
+__all__ = ["register"]
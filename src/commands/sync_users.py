@@ -3,17 +3,119 @@ Commande slash `/sync_users`.
 
 Synchronise les membres du serveur Discord dans la base de données.
 Accessible uniquement aux administrateurs.
+Réconcilie aussi `guild_member` : les membres absents de la liste sont marqués partis.
+
+Les membres sont parcourus en lots de `CHUNK_SIZE` (cache du client, ou `async for` sur
+`guild.fetch_members` si le cache est incomplet) ; chaque lot est écrit pendant que le suivant
+est collecté (file bornée à `PIPELINE_DEPTH` lots) : la mémoire reste constante quelle que soit
+la taille du serveur. La réponse éphémère affiche la progression.
 """
 from __future__ import annotations
 
+import asyncio
 import discord
 import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional
+from core.db import workload
 from core.permissions import require_perms, ADMINISTRATOR
-from views import sync_users as sync_view
-from db import sync_users as sync_db
+from core.lazy import lazy_import
+
+sync_view = lazy_import("views.sync_users")
+sync_db = lazy_import("db.sync_users")
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1000
+PIPELINE_DEPTH = 2
+PROGRESS_INTERVAL = 2.0
+# Sous cette fraction de `member_count` vue, la liste est jugée incomplète : aucun départ n'est marqué
+MIN_SEEN_RATIO = 0.9
+
+
+def _member_row(m: discord.Member) -> sync_db.MemberRow:
+    return (m.id, m.display_name, m.name, m.joined_at)
+
+
+async def iter_member_chunks(
+    guild: discord.Guild, size: int = CHUNK_SIZE, stats: Optional[Dict[str, int]] = None
+) -> AsyncIterator[List[sync_db.MemberRow]]:
+    """Lots de membres humains, depuis le cache s'il est complet, sinon depuis l'API.
+
+    `stats['seen']` compte tous les membres parcourus, bots compris.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault('seen', 0)
+    chunk: List[sync_db.MemberRow] = []
+    if guild.chunked or len(guild.members) >= (guild.member_count or 0):
+        for m in guild.members:
+            stats['seen'] += 1
+            if m.bot:
+                continue
+            chunk.append(_member_row(m))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+                await asyncio.sleep(0)  # laisse respirer la boucle sur les gros serveurs
+    else:
+        async for m in guild.fetch_members(limit=None):
+            stats['seen'] += 1
+            if m.bot:
+                continue
+            chunk.append(_member_row(m))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+@workload("sync_users", "bulk")
+async def sync_guild_members(pool, guild: discord.Guild, progress=None, *, member_writer=None):
+    """Synchronise un serveur en pipeline collecte/écriture. Retourne (membres écrits, départs)."""
+    if member_writer is not None:
+        # Les événements join/leave en attente passent avant la réconciliation
+        await member_writer.flush()
+    queue: asyncio.Queue[Optional[List[sync_db.MemberRow]]] = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+    async with sync_db.MemberSyncWriter(pool, guild.id) as writer:
+
+        async def _consume():
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    return
+                await writer.write_chunk(chunk)
+                if progress is not None:
+                    await progress(writer.written)
+
+        consumer = asyncio.create_task(_consume())
+        stats: Dict[str, int] = {}
+        try:
+            async for chunk in iter_member_chunks(guild, stats=stats):
+                # put() bloque si l'écriture a PIPELINE_DEPTH lots de retard ; échec d'écriture -> arrêt
+                put = asyncio.create_task(queue.put(chunk))
+                done, _ = await asyncio.wait({put, consumer}, return_when=asyncio.FIRST_COMPLETED)
+                if consumer in done:
+                    put.cancel()
+                    consumer.result()
+                    raise RuntimeError("Ecriture interrompue")
+            await queue.put(None)
+            await consumer
+        except BaseException:
+            consumer.cancel()
+            # La connexion ne doit plus être utilisée par l'écrivain quand elle retourne au pool
+            await asyncio.gather(consumer, return_exceptions=True)
+            raise
+        if guild.member_count and stats.get('seen', 0) < guild.member_count * MIN_SEEN_RATIO:
+            logger.warning(
+                "Sync guild %s: liste incomplète (%s/%s), départs non marqués",
+                guild.id, stats.get('seen', 0), guild.member_count,
+            )
+            return writer.written, 0
+        left = await writer.finish()
+        return writer.written, left
+
+
 def register(bot: discord.Client):
     @bot.tree.command(name="sync_users", description="Synchronise les membres dans la base (admin)")
     @require_perms(ADMINISTRATOR, message="Admin requis (bit 8).")
@@ -26,18 +128,30 @@ def register(bot: discord.Client):
         if guild is None:
             await interaction.followup.send("Guild introuvable", ephemeral=True)
             return
+        started = time.monotonic()
+        last_edit = 0.0
+
+        async def _progress(written: int):
+            nonlocal last_edit
+            now = time.monotonic()
+            if now - last_edit < PROGRESS_INTERVAL:
+                return
+            last_edit = now
+            try:
+                await interaction.edit_original_response(
+                    content=sync_view.build_progress(written, guild.member_count, now - started)
+                )
+            except Exception:  # noqa: BLE001
+                pass
+
         try:
-            members = guild.members
-            if not members:
-                members = await guild.fetch_members(limit=None).flatten()
-        except Exception:  # noqa: BLE001
-            members = guild.members
-        rows = ((m.id, m.display_name, m.name) for m in members if not m.bot)
-        try:
-            count = await sync_db.bulk_upsert_users(bot.db_pool, rows)  # type: ignore[arg-type]
-            await interaction.followup.send(sync_view.build_success(count), ephemeral=True)
+            count, left = await sync_guild_members(
+                bot.db_pool, guild, _progress, member_writer=getattr(bot, "member_writer", None)  # type: ignore[arg-type]
+            )
+            logger.info("Sync users guild %s: %s membres, %s départs en %.1fs", guild.id, count, left, time.monotonic() - started)
+            await interaction.edit_original_response(content=sync_view.build_success(count, left))
         except Exception:  # noqa: BLE001
             logger.exception("Erreur sync users")
-            await interaction.followup.send(sync_view.build_error(), ephemeral=True)
+            await interaction.edit_original_response(content=sync_view.build_error())
 
-__all__ = ["register"]
\ No newline at end of file
+__all__ = ["register", "sync_guild_members", "iter_member_chunks"]
@@ -0,0 +1,67 @@
+"""
+Commande slash `/traces` (propriétaire du serveur).
+
+Consulte le tampon des traces récentes (`core.tracing`) : liste des dernières interactions et
+événements avec leur durée et le temps passé en base / en REST, ou décomposition complète d'une
+trace par son identifiant (celui qui apparaît dans les logs `Trace lente` et le champ `trace_id`).
+Seules les traces de ce serveur sont visibles ; celles sans serveur (événements globaux, messages
+privés) ne le sont que pour le propriétaire de l'application.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+from core import config, tracing
+from core.permissions import is_app_owner, owner_only
+
+MAX_MESSAGE = 1900
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= MAX_MESSAGE else text[:MAX_MESSAGE] + "\n…"
+
+
+def _summary_line(trace: tracing.Trace) -> str:
+    totals = trace.totals()
+    parts = [f"{trace.id}", f"{trace.duration * 1000:6.0f}ms", trace.name]
+    for key in ("db", "http"):
+        if key in totals:
+            parts.append(f"{key} {totals[key] * 1000:.0f}ms")
+    if trace.error:
+        parts.append("[erreur]")
+    return "  ".join(parts)
+
+
+def register(bot: discord.Client):
+    @bot.tree.command(name="traces", description="Traces récentes des interactions et événements")
+    @app_commands.describe(
+        trace_id="Identifiant d'une trace à détailler",
+        lentes="Uniquement les traces au-delà du seuil TRACE_SLOW_MS",
+    )
+    @owner_only()
+    async def traces(interaction: discord.Interaction, trace_id: Optional[str] = None, lentes: bool = False):
+        if not config.TRACING:
+            await interaction.response.send_message("Traçage désactivé (TRACING=false)", ephemeral=True)
+            return
+        guild_id = interaction.guild.id if interaction.guild else None
+        include_global = await is_app_owner(interaction.client, interaction.user)
+        if trace_id:
+            trace = tracing.find(trace_id.strip())
+            if trace is None or not tracing.visible(trace, guild_id, include_global=include_global):
+                await interaction.response.send_message("Trace introuvable (expirée du tampon ?)", ephemeral=True)
+                return
+            await interaction.response.send_message(f"```\n{_clip(trace.format())}\n```", ephemeral=True)
+            return
+        found = tracing.recent(guild_id=guild_id, include_global=include_global, slow_only=lentes)
+        if not found:
+            await interaction.response.send_message("Aucune trace enregistrée", ephemeral=True)
+            return
+        header = f"{len(found)} traces (seuil lent {config.TRACE_SLOW_MS}ms, tampon {len(tracing.RECENT)}/{config.TRACE_BUFFER_SIZE})"
+        body = "\n".join(_summary_line(t) for t in found)
+        await interaction.response.send_message(f"{header}\n```\n{_clip(body)}\n```", ephemeral=True)
+
+
+__all__ = ["register"]
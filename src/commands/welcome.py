@@ -14,8 +14,10 @@ import discord
 from discord import app_commands
 
 from core.permissions import require_perms, ADMINISTRATOR
-from db import welcome as db
-from views.welcome import build_welcome_embed
+from core.lazy import lazy_import
+
+db = lazy_import("db.welcome")
+welcome_view = lazy_import("views.welcome")
 
 logger = logging.getLogger(__name__)
 
@@ -104,8 +106,7 @@ async def send_cmd(inter: discord.Interaction, membre: discord.Member):
             return
 
     try:
-        embed = await build_welcome_embed(membre)
-        await channel.send(embed=embed)
+        await channel.send(**await welcome_view.build_welcome_payload(membre))
         await inter.followup.send(
             f"Message de bienvenue envoyé dans {channel.mention} pour {membre.mention}.",
             ephemeral=True,
@@ -114,8 +115,7 @@ async def send_cmd(inter: discord.Interaction, membre: discord.Member):
         # Essaye dernier recours: envoyer dans le salon de la commande si différent
         if isinstance(inter.channel, discord.TextChannel) and inter.channel.id != getattr(channel, 'id', 0):
             try:
-                embed = await build_welcome_embed(membre)
-                await inter.channel.send(embed=embed)
+                await inter.channel.send(**await welcome_view.build_welcome_payload(membre))
                 await inter.followup.send(
                     f"Permissions insuffisantes dans {getattr(channel, 'mention', '#?')}, envoyé ici à la place.",
                     ephemeral=True,
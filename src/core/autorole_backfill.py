@@ -0,0 +1,242 @@
+"""
+Moteur de jobs `/autorole backfill` : ajout ou retrait massif des rôles d'un groupe.
+
+Principes :
+- Les membres du cache (`guild.members`) sont parcourus par ID croissant, par pages de `PAGE_SIZE`.
+- Après chaque page, le dernier ID traité et les compteurs sont enregistrés en base
+  (checkpoint) : un job `running` reprend là où il s'était arrêté après un redémarrage.
+- Chaque rôle ajouté ou retiré est une requête REST (PUT/DELETE par rôle, sans réécrire la liste
+  complète des rôles du membre depuis le cache) et consomme un jeton d'un budget de débit partagé
+  par tous les jobs, pour rester sous les rate limits REST de Discord.
+- Débit et ETA sont calculés sur l'exécution courante (pas depuis la création du job).
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import discord
+
+from core import config, member_cache
+from core.db import workload
+from db import autorole as db
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+# Intervalle minimal entre deux logs de progression d'un même job
+LOG_INTERVAL = 30.0
+
+
+class RateBudget:
+    """Seau à jetons : au plus `rate` opérations par seconde, rafale limitée à `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = max(0.1, float(rate))
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, cost: float = 1):
+        # Un coût supérieur à la rafale est plafonné (sinon il ne serait jamais servi)
+        cost = min(float(cost), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+@dataclass
+class BackfillProgress:
+    """Progression d'un job pour l'exécution en cours."""
+    job_id: int
+    group_id: int
+    started_at: float
+    processed_at_start: int
+    processed: int = 0
+    changed: int = 0
+    failed: int = 0
+    total: int = 0
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        done = self.processed - self.processed_at_start
+        return done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        remaining = max(0, self.total - self.processed)
+        if remaining == 0:
+            return 0.0
+        r = self.rate()
+        return remaining / r if r > 0 else None
+
+
+class BackfillEngine:
+    """Exécute et reprend les jobs de backfill (une tâche asyncio par job)."""
+
+    def __init__(self, bot: discord.Client, pool, rate: Optional[float] = None):
+        self.bot = bot
+        self.pool = pool
+        self.budget = RateBudget(rate if rate is not None else config.AUTOROLE_BACKFILL_RATE)
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.progress: Dict[int, BackfillProgress] = {}
+
+    def is_running(self, job_id: int) -> bool:
+        task = self.tasks.get(job_id)
+        return task is not None and not task.done()
+
+    def progress_for_group(self, group_id: int) -> Optional[BackfillProgress]:
+        for prog in self.progress.values():
+            if prog.group_id == group_id and self.is_running(prog.job_id):
+                return prog
+        return None
+
+    def start(self, job) -> None:
+        job_id = int(job['id'])
+        if self.is_running(job_id):
+            return
+        self.tasks[job_id] = asyncio.create_task(self._run(job), name=f"autorole-backfill-{job_id}")
+
+    async def resume_all(self) -> int:
+        """Relance les jobs `running` des serveurs connus (appelé après ready)."""
+        resumed = 0
+        for job in await db.list_running_backfill_jobs(self.pool):
+            if self.is_running(int(job['id'])) or self.bot.get_guild(int(job['guild_id'])) is None:
+                continue
+            self.start(job)
+            resumed += 1
+        return resumed
+
+    async def cancel(self, job_id: int):
+        await db.set_backfill_status(self.pool, job_id, 'cancelled')
+        task = self.tasks.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def _run(self, job):
+        job_id = int(job['id'])
+        try:
+            await self._run_job(job)
+        except asyncio.CancelledError:
+            logger.info("Backfill %s interrompu", job_id)
+            raise
+        except Exception:  # noqa: BLE001
+            logger.exception("Backfill %s en échec", job_id)
+            try:
+                await db.set_backfill_status(self.pool, job_id, 'failed')
+            except Exception:  # noqa: BLE001
+                pass
+        finally:
+            self.tasks.pop(job_id, None)
+
+    @workload("autorole_backfill", "bulk")
+    async def _run_job(self, job):
+        job_id = int(job['id'])
+        guild = self.bot.get_guild(int(job['guild_id']))
+        if guild is None or guild.me is None:
+            return
+        top = guild.me.top_role
+        roles = [r for r in (guild.get_role(int(rid)) for rid in job['role_ids']) if r is not None and r < top]
+        if not roles:
+            logger.warning("Backfill %s: aucun rôle gérable, job en échec", job_id)
+            await db.set_backfill_status(self.pool, job_id, 'failed')
+            return
+        adding = job['action'] == 'add'
+        filter_role = guild.get_role(int(job['filter_role_id'])) if job['filter_role_id'] else None
+        group_role_ids: set[int] = set()
+        if job['only_without_group']:
+            group_role_ids = {int(it['role_id']) for it in await db.list_items(self.pool, int(job['group_id']))}
+
+        # Cache partiel (MEMBER_CACHE / CHUNK_GUILDS_AT_STARTUP) : chunk à la demande de ce serveur
+        await member_cache.ensure_chunked(guild)
+        members = sorted(guild.members, key=lambda m: m.id)
+        ids = [m.id for m in members]
+        start = bisect.bisect_right(ids, int(job['last_member_id'] or 0))
+        prog = BackfillProgress(
+            job_id=job_id,
+            group_id=int(job['group_id']),
+            started_at=time.monotonic(),
+            processed_at_start=int(job['processed']),
+            processed=int(job['processed']),
+            changed=int(job['changed']),
+            failed=int(job['failed']),
+            total=int(job['processed']) + (len(members) - start),
+        )
+        self.progress[job_id] = prog
+        logger.info("Backfill %s démarré (guild %s, %s membres restants)", job_id, guild.id, len(members) - start)
+        reason = f"autorole backfill #{job_id}"
+        last_log = time.monotonic()
+
+        for page_start in range(start, len(members), PAGE_SIZE):
+            page = members[page_start:page_start + PAGE_SIZE]
+            for m in page:
+                prog.processed += 1
+                if m.bot:
+                    continue
+                if filter_role is not None and filter_role not in m.roles:
+                    continue
+                if group_role_ids and any(r.id in group_role_ids for r in m.roles):
+                    continue
+                if adding:
+                    delta = [r for r in roles if r not in m.roles]
+                else:
+                    delta = [r for r in roles if r in m.roles]
+                if not delta:
+                    continue
+                # Une requête par rôle : les rôles modifiés entre-temps par d'autres ne sont pas écrasés
+                for _ in delta:
+                    await self.budget.acquire()
+                try:
+                    if adding:
+                        await m.add_roles(*delta, reason=reason)
+                    else:
+                        await m.remove_roles(*delta, reason=reason)
+                    prog.changed += 1
+                except discord.Forbidden:
+                    logger.warning("Backfill %s: permissions insuffisantes, job en échec", job_id)
+                    await db.set_backfill_status(self.pool, job_id, 'failed')
+                    return
+                except discord.HTTPException:
+                    # Membre parti entre-temps, etc. : on continue
+                    prog.failed += 1
+            status = await db.checkpoint_backfill_job(
+                self.pool, job_id, page[-1].id, prog.processed, prog.changed, prog.failed, prog.total
+            )
+            if status != 'running':
+                logger.info("Backfill %s arrêté (statut: %s)", job_id, status)
+                return
+            if time.monotonic() - last_log >= LOG_INTERVAL:
+                last_log = time.monotonic()
+                eta = prog.eta()
+                logger.info(
+                    "Backfill %s: %s/%s membres, %s modifiés, %.1f membres/s, ETA %s",
+                    job_id, prog.processed, prog.total, prog.changed, prog.rate(),
+                    f"{eta:.0f}s" if eta is not None else "?",
+                )
+        await db.set_backfill_status(self.pool, job_id, 'done')
+        logger.info("Backfill %s terminé: %s membres parcourus, %s modifiés, %s échecs", job_id, prog.processed, prog.changed, prog.failed)
+
+
+def get_backfill_engine(bot: discord.Client) -> Optional[BackfillEngine]:
+    """Retourne (et crée si nécessaire) le moteur attaché au bot ; None sans base."""
+    engine = getattr(bot, 'autorole_backfill', None)
+    if engine is None:
+        pool = getattr(bot, 'db_pool', None)
+        if pool is None:
+            return None
+        engine = BackfillEngine(bot, pool)
+        bot.autorole_backfill = engine  # type: ignore[attr-defined]
+    return engine
+
+
+__all__ = ["BackfillEngine", "BackfillProgress", "RateBudget", "get_backfill_engine", "PAGE_SIZE"]
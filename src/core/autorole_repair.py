@@ -0,0 +1,213 @@
+"""
+Balayage de réparation des panneaux autorole.
+
+Un groupe est marqué `broken` quand `/autorole link` échoue, et un panneau devient mort
+quand son salon ou son message est supprimé. Le sweeper :
+- parcourt les groupes liés ou cassés par lots (keyset sur id) ;
+- vérifie les salons via le cache du client (aucun appel REST) ;
+- en mode `deep` uniquement, vérifie l'existence du message (`fetch_message`) ;
+- republie les panneaux réparables sous une limite de concurrence, ou marque le groupe cassé ;
+- produit un rapport par serveur.
+
+Au démarrage, un passage léger (cache uniquement) est lancé après ready, puis
+périodiquement selon `AUTOROLE_REPAIR_INTERVAL`.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import discord
+
+from core import config
+from db import autorole as db
+from views import autorole as ui
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+
+@dataclass
+class RepairReport:
+    """Compteurs de réparation pour un serveur."""
+    checked: int = 0
+    ok: int = 0
+    reposted: int = 0
+    marked_broken: int = 0
+    unrepairable: int = 0
+    failed: int = 0
+
+    @property
+    def clean(self) -> bool:
+        return self.checked == self.ok
+
+
+class PanelRepairSweeper:
+    def __init__(self, bot: discord.Client, pool, concurrency: Optional[int] = None):
+        self.bot = bot
+        self.pool = pool
+        self.semaphore = asyncio.Semaphore(concurrency or config.AUTOROLE_REPAIR_CONCURRENCY)
+        self._lock = asyncio.Lock()
+
+    async def sweep(self, *, guild_id: Optional[int] = None, deep: bool = False) -> Dict[int, RepairReport]:
+        """Exécute un passage complet (ou limité à `guild_id`). Un seul passage à la fois."""
+        async with self._lock:
+            reports: Dict[int, RepairReport] = defaultdict(RepairReport)
+            after_id = 0
+            while True:
+                groups = await db.list_panel_groups(self.pool, after_id, BATCH_SIZE, guild_id)
+                if not groups:
+                    break
+                after_id = int(groups[-1]['id'])
+                to_repost: list[tuple[discord.Guild, discord.TextChannel, object]] = []
+                checks = []
+                for g in groups:
+                    guild = self.bot.get_guild(int(g['guild_id']))
+                    if guild is None:
+                        # Serveur quitté ou indisponible : rien à décider ici
+                        continue
+                    report = reports[guild.id]
+                    report.checked += 1
+                    channel = guild.get_channel(int(g['channel_id'])) if g['channel_id'] else None
+                    if not isinstance(channel, discord.TextChannel):
+                        if g['channel_id'] is None:
+                            report.unrepairable += 1
+                        else:
+                            await self._mark_broken(g, report)
+                        continue
+                    if g['broken'] or not g['linked_message_id']:
+                        to_repost.append((guild, channel, g))
+                    elif deep:
+                        checks.append(self._check_message(guild, channel, g, report, to_repost))
+                    else:
+                        report.ok += 1
+                if checks:
+                    await asyncio.gather(*checks)
+                if to_repost:
+                    await self._repost_batch(to_repost, reports)
+                if len(groups) < BATCH_SIZE:
+                    break
+            return dict(reports)
+
+    async def _check_message(self, guild, channel: discord.TextChannel, g, report: RepairReport, to_repost: list):
+        async with self.semaphore:
+            try:
+                await channel.fetch_message(int(g['linked_message_id']))
+                report.ok += 1
+            except discord.NotFound:
+                to_repost.append((guild, channel, g))
+            except discord.HTTPException:
+                # Accès refusé / erreur transitoire : on ne conclut pas
+                report.failed += 1
+
+    async def _mark_broken(self, g, report: RepairReport):
+        try:
+            self._discard_reaction_entry(int(g['id']))
+            if g['broken']:
+                report.unrepairable += 1
+                return
+            await db.update_group(self.pool, int(g['id']), broken=True)
+            report.marked_broken += 1
+        except Exception:  # noqa: BLE001
+            logger.exception("Réparation autorole: échec marquage groupe %s", g['id'])
+            report.failed += 1
+
+    def _discard_reaction_entry(self, group_id: int):
+        rt = getattr(self.bot, 'autorole_runtime', None)
+        index = getattr(rt, 'reaction_index', None)
+        if index is not None:
+            index.discard_group(group_id)
+
+    async def _repost_batch(self, to_repost: list, reports: Dict[int, RepairReport]):
+        items_rows = await db.list_items_for_groups(self.pool, [int(g['id']) for _, _, g in to_repost])
+        items_by_group: Dict[int, list] = defaultdict(list)
+        for it in items_rows:
+            items_by_group[int(it['group_id'])].append(it)
+
+        async def _one(guild: discord.Guild, channel: discord.TextChannel, g):
+            report = reports[guild.id]
+            items = items_by_group.get(int(g['id']), [])
+            if not items:
+                report.unrepairable += 1
+                return
+            async with self.semaphore:
+                try:
+                    await self._repost(guild, channel, g, items)
+                    report.reposted += 1
+                except discord.Forbidden:
+                    await self._mark_broken(g, report)
+                except Exception:  # noqa: BLE001
+                    logger.exception("Réparation autorole: échec republication groupe %s", g['id'])
+                    report.failed += 1
+
+        await asyncio.gather(*(_one(guild, channel, g) for guild, channel, g in to_repost))
+
+    async def _repost(self, guild: discord.Guild, channel: discord.TextChannel, g, items):
+        try:
+            mode = str(g['mode'] or 'component')
+        except Exception:
+            mode = 'component'
+        if mode == 'reaction':
+            msg = await channel.send(embed=ui.build_reaction_embed(str(g['name']), items, guild))
+            for it in items:
+                emoji = ui.parse_emoji(it['emoji'])
+                if emoji:
+                    try:
+                        await msg.add_reaction(emoji)
+                    except Exception:  # noqa: BLE001
+                        pass
+        else:
+            embed = ui.build_group_embed(str(g['name']), bool(g['multi']), int(g['max']), page=0, pages=1)
+            msg = await channel.send(embed=embed, view=ui.build_panel_view(g, items, guild))
+        await db.update_group(self.pool, int(g['id']), linked_message_id=msg.id, channel_id=channel.id, broken=False)
+        if mode == 'reaction':
+            rt = getattr(self.bot, 'autorole_runtime', None)
+            index = getattr(rt, 'reaction_index', None)
+            if index is not None:
+                await index.refresh_group(self.pool, int(g['id']))
+        logger.info("Panneau autorole republié: groupe %s (guild %s, salon %s)", g['id'], guild.id, channel.id)
+
+
+def log_reports(reports: Dict[int, RepairReport]):
+    dirty = {gid: r for gid, r in reports.items() if not r.clean}
+    logger.info("Réparation autorole: %s serveurs vérifiés, %s avec anomalies", len(reports), len(dirty))
+    for gid, r in dirty.items():
+        logger.info("Réparation autorole guild %s: %s", gid, r)
+
+
+def get_repair_sweeper(bot: discord.Client) -> Optional[PanelRepairSweeper]:
+    sweeper = getattr(bot, 'autorole_repair', None)
+    if sweeper is None:
+        pool = getattr(bot, 'db_pool', None)
+        if pool is None:
+            return None
+        sweeper = PanelRepairSweeper(bot, pool)
+        bot.autorole_repair = sweeper  # type: ignore[attr-defined]
+    return sweeper
+
+
+def start_repair_loop(bot: discord.Client) -> Optional[asyncio.Task]:
+    """Planifie le passage léger après ready puis les passages périodiques."""
+    sweeper = get_repair_sweeper(bot)
+    if sweeper is None:
+        return None
+
+    async def _loop():
+        await bot.wait_until_ready()
+        while True:
+            try:
+                log_reports(await sweeper.sweep())
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec réparation panneaux autorole")
+            if config.AUTOROLE_REPAIR_INTERVAL <= 0:
+                return
+            await asyncio.sleep(config.AUTOROLE_REPAIR_INTERVAL)
+
+    return bot.loop.create_task(_loop())
+
+
+__all__ = ["PanelRepairSweeper", "RepairReport", "get_repair_sweeper", "start_repair_loop", "log_reports"]
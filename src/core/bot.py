@@ -15,10 +15,12 @@ import logging
 import discord
 from discord import app_commands
 
-from core import config, db
+from core import config, db, metrics, tracing
 
 logger = logging.getLogger(__name__)
 
+NAME_HISTORY_MAINTENANCE_INTERVAL = 6 * 3600
+
 class Bot(discord.Client):
     """
     Client Discord étendu, encapsulant l'état applicatif.
@@ -30,74 +32,194 @@ class Bot(discord.Client):
 
 
     def __init__(self):
-        super().__init__(intents=config.INTENTS)
+        super().__init__(
+            intents=config.INTENTS,
+            member_cache_flags=config.MEMBER_CACHE_FLAGS,
+            chunk_guilds_at_startup=config.CHUNK_GUILDS_AT_STARTUP,
+            http_trace=metrics.http_trace_config(),
+        )
         self.tree = app_commands.CommandTree(self)
         self.db_pool = None  # Sera peuplé si DATABASE_URL défini
+        self.user_writer: db.UserUpsertBatcher | None = None  # Upserts discord_user groupés (événements)
+        self.member_writer = None  # Arrivées/départs guild_member groupés (db.guild_members.MemberEventSink)
+        self.name_history = None  # Historique des noms via COPY (db.name_history.NameHistoryBuffer)
         self._autorole_views_registered = False
+        self.startup_report = None  # Rapport des phases de démarrage (core.startup.StartupReport)
+        self.feature_report = []  # Durée d'import/register par module de commandes (commands.ModuleLoad)
+        self.metrics_server: metrics.MetricsServer | None = None
+        self.loop_monitor = None  # Retard de boucle / étapes bloquantes (core.loop_monitor.LoopMonitor)
+
+    def dispatch(self, event_name: str, /, *args, **kwargs):
+        # Comptage synchrone des événements gateway : aucun handler (ni tâche) pour socket_event_type
+        if event_name == "socket_event_type":
+            metrics.GATEWAY_EVENTS.inc(type=args[0])
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def _run_event(self, coro, event_name: str, *args, **kwargs):
+        # Trace par handler (span si déjà dans la trace d'une interaction) ; les traces
+        # d'événements rapides et sans appel DB/REST ne sont pas gardées
+        async with tracing.trace_block(f"event:{event_name}", guild_id=tracing.event_guild_id(args), keep_empty=False):
+            with metrics.EVENT_HANDLER_SECONDS.time(event=event_name):
+                await super()._run_event(coro, event_name, *args, **kwargs)
 
     async def setup_hook(self):
         """
         Initialise les sous-systèmes avant la mise en ligne.
 
-        Séquence :
-        1. Connexion et migration DB (si configurée)
-        2. Chargement des fonctionnalités dépendantes de la DB
-        3. Enregistrement des commandes et événements globaux
+        Le démarrage est un graphe de phases (`core.startup`) : une fois le pool créé, les schémas
+        des fonctionnalités sont vérifiés en parallèle, pendant l'import des commandes et le
+        chargement des voice hubs. Le sync de l'arbre attend les commandes. La durée de chaque
+        phase est journalisée dans un rapport de démarrage (`self.startup_report`).
         """
-        # Initialisation DB et schémas
+        from core.startup import StartupGraph  # type: ignore
+        from core.loop_monitor import start_loop_monitor  # type: ignore
+
+        # Démarrée avant les phases : les blocages du démarrage sont aussi détectés
         try:
-            if config.DATABASE_URL:
-                self.db_pool = await db.get_pool(config.DATABASE_URL)
-                await db.ensure_schema(self.db_pool)
-                # Autorole schema
-                try:
-                    from db import autorole as autorole_db  # import local pour éviter cycles
-                    await autorole_db.ensure_schema(self.db_pool)
-                    logger.info("Schéma autorole vérifié")
-                except Exception:  # noqa: BLE001
-                    logger.exception("Erreur init schéma autorole")
-                # Welcome schema
-                try:
-                    from db import welcome as welcome_db  # type: ignore
-                    await welcome_db.ensure_schema(self.db_pool)
-                    logger.info("Schéma welcome vérifié")
-                except Exception:  # noqa: BLE001
-                    logger.exception("Erreur init schéma welcome")
-                logger.info("DB prête")
+            self.loop_monitor = start_loop_monitor()
         except Exception:  # noqa: BLE001
-            logger.exception("Erreur init DB")
-        # Features dépendantes DB
-        if self.db_pool is not None:
-            try:
-                from core.voice_hubs.manager import setup_voice_hubs_manager  # type: ignore
-                await setup_voice_hubs_manager(self, self.db_pool)
-                logger.info("VoiceHubs manager initialisé")
-            except Exception:  # noqa: BLE001
-                logger.exception("Erreur init VoiceHubs manager")
-        # Chargement commandes dynamiques
+            logger.exception("Erreur démarrage surveillance de la boucle")
+        # Avant le pool : les connexions ouvertes ensuite journalisent leurs requêtes dans la trace
         try:
-            from commands import load_all_commands  # type: ignore
-            await load_all_commands(self)
-            # S'assure que le runtime autorole est initialisé (les vues seront enregistrées après ready)
-            try:
-                from commands.autorole import ensure_autorole_runtime  # type: ignore
-                ensure_autorole_runtime(self)
-            except Exception:  # noqa: BLE001
-                logger.exception("Erreur init runtime autorole")
+            tracing.install(self)
         except Exception:  # noqa: BLE001
-            logger.exception("Erreur chargement commandes dynamiques")
-        # Events généraux
-        try:
+            logger.exception("Erreur installation du traçage")
+
+        from commands import feature_enabled  # type: ignore
+
+        graph = StartupGraph()
+        has_db = lambda: self.db_pool is not None  # noqa: E731
+
+        # Endpoint /metrics (scrape local), indépendant du reste
+        @graph.phase("metrics", when=lambda: config.METRICS_PORT > 0)
+        async def _metrics():
+            self.metrics_server = metrics.MetricsServer(config.METRICS_HOST, config.METRICS_PORT)
+            await self.metrics_server.start()
+            return f"{config.METRICS_HOST}:{self.metrics_server.port}"
+
+        @graph.phase("db.pool", when=lambda: bool(config.DATABASE_URL))
+        async def _pool():
+            self.db_pool = await db.get_pool(config.DATABASE_URL)
+            return f"{self.db_pool.get_size()} connexions ouvertes"
+
+        @graph.phase("db.discord_user", after=["db.pool"], when=has_db)
+        async def _core_schema():
+            with db.workload(query_class="bulk"):
+                await db.ensure_schema(self.db_pool)
+            self.user_writer = db.UserUpsertBatcher(self.db_pool)
+            self.user_writer.start()
+
+        @graph.phase("db.autorole", after=["db.pool"], when=has_db)
+        async def _autorole_schema():
+            from db import autorole as autorole_db  # import local pour éviter cycles
+            with db.workload(query_class="bulk"):
+                await autorole_db.ensure_schema(self.db_pool)
+
+        # Appartenance aux serveurs (guild_member)
+        @graph.phase("db.guild_member", after=["db.pool"], when=has_db)
+        async def _guild_member_schema():
+            from db import guild_members as guild_members_db  # type: ignore
+            with db.workload(query_class="bulk"):
+                await guild_members_db.ensure_schema(self.db_pool)
+            self.member_writer = guild_members_db.MemberEventSink(self.db_pool)
+            self.member_writer.start()
+
+        # Historique des noms (table partitionnée par mois + rétention)
+        @graph.phase("db.name_history", after=["db.pool"], when=has_db)
+        async def _name_history_schema():
+            from db import name_history as name_history_db  # type: ignore
+            with db.workload(query_class="bulk"):
+                await name_history_db.ensure_schema(self.db_pool)
+                # Maintenance des partitions (DDL) : la tâche hérite de la classe "bulk"
+                self.loop.create_task(name_history_db.run_retention(
+                    self.db_pool, config.NAME_HISTORY_RETENTION_MONTHS, NAME_HISTORY_MAINTENANCE_INTERVAL
+                ))
+            self.name_history = name_history_db.NameHistoryBuffer(self.db_pool)
+            self.name_history.start()
+
+        # Statistiques de resynchronisation des membres
+        @graph.phase("db.member_resync", after=["db.pool"], when=has_db)
+        async def _member_resync_schema():
+            from db import member_resync as member_resync_db  # type: ignore
+            with db.workload(query_class="bulk"):
+                await member_resync_db.ensure_schema(self.db_pool)
+
+        # État du sync des commandes slash
+        @graph.phase("db.command_sync", after=["db.pool"], when=has_db)
+        async def _command_sync_schema():
+            from db import command_sync as command_sync_db  # type: ignore
+            with db.workload(query_class="bulk"):
+                await command_sync_db.ensure_schema(self.db_pool)
+
+        @graph.phase("db.welcome", after=["db.pool"], when=has_db)
+        async def _welcome_schema():
+            from db import welcome as welcome_db  # type: ignore
+            with db.workload(query_class="bulk"):
+                await welcome_db.ensure_schema(self.db_pool)
+            configured = await welcome_db.warm_cache(self.db_pool)
+            return f"{configured} serveurs en cache"
+
+        # Rôle lecture seule endossé par /dbquery
+        @graph.phase("db.dbquery_role", after=["db.pool"], when=lambda: has_db() and feature_enabled("dbbrowse"))
+        async def _dbquery_role():
+            from db import dbbrowse as dbbrowse_db  # type: ignore
+            with db.workload(query_class="bulk"):
+                ok = await dbbrowse_db.ensure_query_role(self.db_pool, config.DBQUERY_ROLE)
+            return config.DBQUERY_ROLE if ok else "non créé (/dbquery refusera les requêtes)"
+
+        # Features dépendantes DB
+        @graph.phase("voice_hubs", after=["db.pool"], when=lambda: has_db() and feature_enabled("hub"))
+        async def _voice_hubs():
+            if not config.MEMBER_CACHE_FLAGS.voice:
+                logger.warning("MEMBER_CACHE sans 'voice' : les voice hubs ne voient pas les membres des salons")
+            from core.voice_hubs.manager import setup_voice_hubs_manager  # type: ignore
+            await setup_voice_hubs_manager(self, self.db_pool)
+
+        @graph.phase("member_resync", after=["db.discord_user", "db.member_resync"], when=has_db)
+        async def _member_resync():
+            from core.member_resync import start_member_resync  # type: ignore
+            if start_member_resync(self) is None:
+                return "désactivée"
+            return f"{config.MEMBER_RESYNC_INTERVAL}s par passage"
+
+        # Chargement commandes dynamiques (indépendant de la DB : les commandes lisent bot.db_pool à l'exécution)
+        @graph.phase("commands")
+        async def _commands():
+            from commands import load_all_commands  # type: ignore
+            loads = await load_all_commands(self)
+            loaded = sum(1 for m in loads if m.status == "chargé")
+            return f"{loaded}/{len(loads)} modules, {len(self.tree.get_commands())} commandes"
+
+        # Runtime autorole (les vues seront enregistrées après ready)
+        @graph.phase("autorole.runtime", after=["commands", "db.autorole"], when=lambda: feature_enabled("autorole"))
+        async def _autorole_runtime():
+            from commands.autorole import ensure_autorole_runtime, load_reaction_index  # type: ignore
+            ensure_autorole_runtime(self)
+            indexed = await load_reaction_index(self)
+            from core.autorole_repair import start_repair_loop  # type: ignore
+            start_repair_loop(self)
+            return f"{indexed} panneaux réaction"
+
+        # Events généraux (utilisent les écrivains groupés s'ils existent)
+        @graph.phase("events", after=["db.discord_user", "db.guild_member", "db.name_history", "db.welcome"])
+        async def _events():
             from events.members import setup as setup_members  # type: ignore
             setup_members(self)
-        except Exception:  # noqa: BLE001
-            logger.exception("Erreur setup events")
-        # Sync final
-        try:
-            await self.tree.sync()
-            logger.info("Slash commands synchronisées")
-        except Exception:  # noqa: BLE001
-            logger.exception("Erreur sync slash commands")
+
+        # Sync final, uniquement si l'arbre a changé depuis le dernier sync réussi
+        @graph.phase("tree.sync", after=["commands", "db.command_sync"])
+        async def _tree_sync():
+            from core.command_sync import sync_if_changed  # type: ignore
+            result = await sync_if_changed(self, self.tree, force=config.FORCE_COMMAND_SYNC)
+            return "synchronisé" if result.synced else "inchangé"
+
+        # Seules les créations de schéma et d'index sont en classe "bulk" (timeout long) : les écrivains
+        # et tâches de fond lancés par les phases restent en classe "default"
+        self.startup_report = await graph.run()
+        logger.info("%s", self.startup_report.format())
+        if config.TRACING:
+            # Après les phases : les modules db.* importés au démarrage sont chargés
+            logger.info("Helpers DB tracés: %s", tracing.instrument_db_modules())
 
     async def on_ready(self):
         """
@@ -105,8 +227,10 @@ class Bot(discord.Client):
         S'assure que les vues autorole persistantes sont bien enregistrées.
         """
         logger.info("Connecté: %s (%s)", self.user, getattr(self.user, 'id', '?'))
+        from commands import feature_enabled  # type: ignore
+        autorole_enabled = feature_enabled("autorole")
         # Filet de sécurité: s'assurer que les vues autorole persistantes sont bien enregistrées
-        if not self._autorole_views_registered:
+        if autorole_enabled and not self._autorole_views_registered:
             try:
                 from commands.autorole import ensure_autorole_views  # type: ignore
                 added = await ensure_autorole_views(self)
@@ -114,13 +238,47 @@ class Bot(discord.Client):
                 logger.info("Vues autorole persistantes enregistrées (on_ready)")
             except Exception:
                 logger.exception("Erreur enregistrement vues autorole (on_ready)")
+        # Reprise des jobs de backfill autorole interrompus (idempotent si déjà en cours)
+        if autorole_enabled:
+            try:
+                from commands.autorole import resume_backfill_jobs  # type: ignore
+                resumed = await resume_backfill_jobs(self)
+                if resumed:
+                    logger.info("Jobs backfill autorole repris: %s", resumed)
+            except Exception:
+                logger.exception("Erreur reprise backfill autorole")
 
     async def close(self):  # type: ignore[override]
         """
         Fermeture propre du bot.
-        Ajoute la fermeture du pool asyncpg si présent.
+        Vide les écrivains groupés puis ferme le pool asyncpg si présent.
         Les commandes sont déjà synchronisées par discord.Client.close.
         """
+        try:
+            if self.user_writer is not None:
+                await self.user_writer.close()
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur flush upserts utilisateurs")
+        try:
+            if self.member_writer is not None:
+                await self.member_writer.close()
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur flush événements membres")
+        try:
+            if self.name_history is not None:
+                await self.name_history.close()
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur flush historique des noms")
+        try:
+            if self.loop_monitor is not None:
+                await self.loop_monitor.stop()
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur arrêt surveillance de la boucle")
+        try:
+            if self.metrics_server is not None:
+                await self.metrics_server.close()
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur fermeture serveur de métriques")
         try:
             if self.db_pool is not None:
                 await self.db_pool.close()  # type: ignore[union-attr]
@@ -0,0 +1,136 @@
+"""
+Synchronisation des commandes slash uniquement quand l'arbre a changé.
+
+`tree.sync()` est un appel REST global limité par Discord : le lancer à chaque démarrage ajoute
+plusieurs secondes au redémarrage et expose aux 429 pendant une boucle de crash ou un déploiement.
+
+Après `load_all_commands`, chaque commande est sérialisée avec la charge utile exacte envoyée par
+`tree.sync()` (`to_dict`), puis hachée (sha256 du JSON trié). L'empreinte de l'arbre est comparée
+à celle du dernier sync réussi, stockée dans Postgres (`command_sync_state`) ou, sans base, dans
+le fichier `COMMAND_SYNC_STATE_FILE`. Le sync n'a lieu que si elle diffère, si aucun état n'existe
+ou si `FORCE_COMMAND_SYNC` est actif. Les commandes ajoutées, modifiées et supprimées sont journalisées.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import discord
+from discord import app_commands
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncResult:
+    synced: bool
+    tree_hash: str
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+
+def _digest(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def serialize_tree(tree: app_commands.CommandTree) -> Dict[str, str]:
+    """Empreinte par commande globale, clé `type:nom` (slash et menus contextuels peuvent partager un nom)."""
+    hashes: Dict[str, str] = {}
+    for cmd in tree.get_commands():
+        payload = cmd.to_dict(tree)
+        hashes[f"{payload.get('type', 1)}:{cmd.name}"] = _digest(payload)
+    return hashes
+
+
+def tree_hash(commands: Dict[str, str]) -> str:
+    return _digest(commands)
+
+
+def diff_commands(old: Dict[str, str], new: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    added = sorted(k for k in new if k not in old)
+    removed = sorted(k for k in old if k not in new)
+    changed = sorted(k for k in new if k in old and old[k] != new[k])
+    return added, changed, removed
+
+
+def _state_path(application_id: int) -> str:
+    base = config.COMMAND_SYNC_STATE_FILE
+    root, ext = os.path.splitext(base)
+    return f"{root}.{application_id}{ext or '.json'}"
+
+
+async def _load_state(bot: discord.Client, application_id: int) -> Optional[Tuple[str, Dict[str, str]]]:
+    pool = getattr(bot, 'db_pool', None)
+    if pool is not None:
+        from db import command_sync as sync_db  # type: ignore
+        return await sync_db.load_state(pool, application_id)
+    try:
+        with open(_state_path(application_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["tree_hash"], data["commands"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError):
+        logger.warning("État de sync des commandes illisible (%s), sync forcé", _state_path(application_id))
+        return None
+
+
+async def _save_state(bot: discord.Client, application_id: int, digest: str, commands: Dict[str, str]):
+    pool = getattr(bot, 'db_pool', None)
+    if pool is not None:
+        from db import command_sync as sync_db  # type: ignore
+        await sync_db.save_state(pool, application_id, digest, commands)
+        return
+    path = _state_path(application_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"tree_hash": digest, "commands": commands}, f, sort_keys=True)
+    os.replace(tmp, path)
+
+
+async def sync_if_changed(bot: discord.Client, tree: app_commands.CommandTree, *, force: bool = False) -> SyncResult:
+    """Synchronise l'arbre global si son empreinte diffère du dernier sync réussi."""
+    commands = serialize_tree(tree)
+    digest = tree_hash(commands)
+    application_id = bot.application_id or 0
+    previous = None
+    try:
+        previous = await _load_state(bot, application_id)
+    except Exception:  # noqa: BLE001
+        logger.exception("Lecture de l'état de sync des commandes impossible, sync forcé")
+    old_commands = previous[1] if previous else {}
+    added, changed, removed = diff_commands(old_commands, commands)
+    result = SyncResult(synced=False, tree_hash=digest, added=added, changed=changed, removed=removed)
+    if previous is not None and previous[0] == digest and not force:
+        logger.info("Slash commands inchangées (%s commandes, empreinte %s), sync ignoré", len(commands), digest[:12])
+        return result
+    if previous is not None:
+        logger.info(
+            "Slash commands modifiées%s : ajoutées=%s modifiées=%s supprimées=%s",
+            " (sync forcé)" if force else "", added or "-", changed or "-", removed or "-",
+        )
+    else:
+        logger.info("Aucun état de sync des commandes connu, sync complet (%s commandes)", len(commands))
+    started = time.perf_counter()
+    await tree.sync()
+    result.synced = True
+    result.duration = time.perf_counter() - started
+    logger.info("Slash commands synchronisées en %.2fs (empreinte %s)", result.duration, digest[:12])
+    try:
+        await _save_state(bot, application_id, digest, commands)
+    except Exception:  # noqa: BLE001
+        # Le prochain démarrage resynchronisera : coûteux mais correct
+        logger.exception("Enregistrement de l'état de sync des commandes impossible")
+    return result
+
+
+__all__ = ["SyncResult", "serialize_tree", "tree_hash", "diff_commands", "sync_if_changed"]
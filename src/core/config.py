@@ -12,6 +12,7 @@ from __future__ import annotations
 
 import os
 import logging
+import tempfile
 from dotenv import load_dotenv
 import discord
 
@@ -27,9 +28,135 @@ INTENTS.members = True
 _PRESENCES_ENV = (os.getenv("ENABLE_PRESENCES", "false") or "false").strip().lower()
 INTENTS.presences = _PRESENCES_ENV in {"1", "true", "yes", "on"}
 
+# Politique de cache des membres : "all" (tous ceux que les intents permettent), "none",
+# ou une liste parmi "voice" (membres en vocal, requis par les voice hubs) et "joined"
+# (membres chargés par chunk ou vus depuis le démarrage).
+_MEMBER_CACHE_ENV = {v.strip().lower() for v in (os.getenv("MEMBER_CACHE", "all") or "all").split(",") if v.strip()}
+if "all" in _MEMBER_CACHE_ENV:
+    MEMBER_CACHE_FLAGS = discord.MemberCacheFlags.from_intents(INTENTS)
+else:
+    MEMBER_CACHE_FLAGS = discord.MemberCacheFlags.none()
+    MEMBER_CACHE_FLAGS.voice = "voice" in _MEMBER_CACHE_ENV and INTENTS.voice_states
+    MEMBER_CACHE_FLAGS.joined = "joined" in _MEMBER_CACHE_ENV and INTENTS.members
+# Chunk de tous les serveurs avant `on_ready` (sans cache "joined", le chunk serait perdu)
+_CHUNK_ENV = (os.getenv("CHUNK_GUILDS_AT_STARTUP", "true") or "true").strip().lower()
+CHUNK_GUILDS_AT_STARTUP = _CHUNK_ENV in {"1", "true", "yes", "on"} and MEMBER_CACHE_FLAGS.joined
+# LRU par serveur des membres récupérés hors cache client (entrées, durée de vie en secondes)
+MEMBER_LRU_SIZE = max(0, int(os.getenv("MEMBER_LRU_SIZE", "1000") or 0))
+MEMBER_LRU_TTL = float(os.getenv("MEMBER_LRU_TTL", "300") or 300)
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool asyncpg : tailles, connexions ouvertes au démarrage, recyclage des connexions inactives (s)
+DB_POOL_MIN_SIZE = max(0, int(os.getenv("DB_POOL_MIN_SIZE", "2") or 0))
+DB_POOL_MAX_SIZE = max(1, DB_POOL_MIN_SIZE, int(os.getenv("DB_POOL_MAX_SIZE", "10") or 10))
+DB_POOL_WARMUP = min(DB_POOL_MAX_SIZE, max(0, int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_MIN_SIZE)) or 0)))
+DB_POOL_MAX_INACTIVE = float(os.getenv("DB_POOL_MAX_INACTIVE", "300") or 0)
+DB_POOL_MAX_QUERIES = max(1, int(os.getenv("DB_POOL_MAX_QUERIES", "50000") or 50000))
+# Attente d'une connexion au-delà de laquelle un avertissement est journalisé (ms)
+DB_POOL_WAIT_WARN_MS = max(0, int(os.getenv("DB_POOL_WAIT_WARN_MS", "500") or 0))
+
+
+def _int_map(value):
+    """`"a:1,b:2"` -> {"a": 1, "b": 2} (entrées invalides ignorées)."""
+    out = {}
+    for item in (value or "").split(","):
+        name, _, number = item.partition(":")
+        if name.strip() and number.strip().isdigit():
+            out[name.strip().lower()] = int(number)
+    return out
+
+
+# Connexions réservées par fonctionnalité (`core.db.workload`) : jamais prises par les autres usages
+DB_POOL_RESERVED = _int_map(os.getenv("DB_POOL_RESERVED", "voice_hubs:2,autorole:1"))
+# statement_timeout (ms) par classe de requêtes ; "default" s'applique à toute connexion
+DB_STATEMENT_TIMEOUTS = {
+    "default": 30000, "interactive": 5000, "browse": 15000, "bulk": 600000,
+    **_int_map(os.getenv("DB_STATEMENT_TIMEOUTS")),
+}
+# Préparation des requêtes nommées (core.statements) dès l'ouverture de chaque connexion
+_PREPARE_ENV = (os.getenv("DB_PREPARE_ON_CONNECT", "true") or "true").strip().lower()
+DB_PREPARE_ON_CONNECT = _PREPARE_ENV in {"1", "true", "yes", "on"}
+
+# Budget de modifications de rôles/seconde pour les jobs `/autorole backfill`
+AUTOROLE_BACKFILL_RATE = float(os.getenv("AUTOROLE_BACKFILL_RATE", "5") or 5)
+
+# Réparation des panneaux autorole : intervalle (secondes, 0 = uniquement au démarrage) et envois simultanés
+AUTOROLE_REPAIR_INTERVAL = int(os.getenv("AUTOROLE_REPAIR_INTERVAL", "3600") or 0)
+AUTOROLE_REPAIR_CONCURRENCY = max(1, int(os.getenv("AUTOROLE_REPAIR_CONCURRENCY", "4") or 4))
+
+# Agrégation des messages de bienvenue lors d'un afflux : au-delà de THRESHOLD arrivées sur
+# WINDOW secondes (0 = désactivé), les membres sont regroupés (MAX_MEMBERS par embed) toutes les FLUSH secondes
+WELCOME_BURST_THRESHOLD = int(os.getenv("WELCOME_BURST_THRESHOLD", "10") or 0)
+WELCOME_BURST_WINDOW = float(os.getenv("WELCOME_BURST_WINDOW", "10") or 10)
+WELCOME_BURST_FLUSH = float(os.getenv("WELCOME_BURST_FLUSH", "5") or 5)
+WELCOME_BURST_MAX_MEMBERS = max(1, int(os.getenv("WELCOME_BURST_MAX_MEMBERS", "25") or 25))
+
+# Carte de bienvenue rendue en PNG (nécessite Pillow)
+_WELCOME_CARD_ENV = (os.getenv("WELCOME_CARD_ENABLED", "false") or "false").strip().lower()
+WELCOME_CARD_ENABLED = _WELCOME_CARD_ENV in {"1", "true", "yes", "on"}
+WELCOME_CARD_FONT = os.getenv("WELCOME_CARD_FONT") or None
+WELCOME_CARD_WORKERS = max(1, int(os.getenv("WELCOME_CARD_WORKERS", "2") or 2))
+WELCOME_CARD_AVATAR_CACHE_MB = max(1, int(os.getenv("WELCOME_CARD_AVATAR_CACHE_MB", "32") or 32))
+
+# `/dbbrowse` : budget mémoire du cache de pages partagé (Mo) et TTL des métadonnées (secondes)
+DBBROWSE_CACHE_MB = max(1, int(os.getenv("DBBROWSE_CACHE_MB", "16") or 16))
+DBBROWSE_META_TTL = float(os.getenv("DBBROWSE_META_TTL", "60") or 60)
+
+# `/dbquery` : durée max d'une instruction (ms), consoles ouvertes simultanément (connexions réservées)
+# et inactivité (s) avant fermeture du curseur
+DBQUERY_TIMEOUT_MS = max(100, int(os.getenv("DBQUERY_TIMEOUT_MS", "5000") or 5000))
+DBQUERY_MAX_SESSIONS = max(1, int(os.getenv("DBQUERY_MAX_SESSIONS", "1") or 1))
+DBQUERY_IDLE_TIMEOUT = max(30, int(os.getenv("DBQUERY_IDLE_TIMEOUT", "120") or 120))
+# Rôle Postgres (sans login, lecture seule) endossé par `SET LOCAL ROLE` pendant `/dbquery`
+DBQUERY_ROLE = (os.getenv("DBQUERY_ROLE", "dbquery_readonly") or "dbquery_readonly").strip()
+
+
+# Historique des noms : nombre de mois conservés (partitions mensuelles, 0 = illimité)
+NAME_HISTORY_RETENTION_MONTHS = max(0, int(os.getenv("NAME_HISTORY_RETENTION_MONTHS", "12") or 0))
+
+# Resynchronisation périodique des membres : durée d'un passage sur tous les serveurs (s, 0 = désactivée),
+# budget base (lignes lues+écrites / s) et fraction de temps CPU consacrée au calcul des empreintes
+MEMBER_RESYNC_INTERVAL = int(os.getenv("MEMBER_RESYNC_INTERVAL", "21600") or 0)
+MEMBER_RESYNC_ROWS_PER_SEC = max(1.0, float(os.getenv("MEMBER_RESYNC_ROWS_PER_SEC", "2000") or 2000))
+MEMBER_RESYNC_DUTY = float(os.getenv("MEMBER_RESYNC_DUTY", "0.25") or 0.25)
+
+# Sync des commandes slash au démarrage : uniquement si l'empreinte de l'arbre a changé, sauf FORCE_COMMAND_SYNC.
+# Sans base de données, l'empreinte du dernier sync est conservée dans COMMAND_SYNC_STATE_FILE
+_FORCE_COMMAND_SYNC_ENV = (os.getenv("FORCE_COMMAND_SYNC", "false") or "false").strip().lower()
+FORCE_COMMAND_SYNC = _FORCE_COMMAND_SYNC_ENV in {"1", "true", "yes", "on"}
+COMMAND_SYNC_STATE_FILE = os.getenv("COMMAND_SYNC_STATE_FILE") or os.path.join(
+    tempfile.gettempdir(), "discord_command_sync.json"
+)
+
+# Manifeste des fonctionnalités : modules de `commands/` chargés (noms séparés par des virgules).
+# FEATURES vide ou "all" = tous ; FEATURES_DISABLED retire des modules de la sélection.
+def _name_set(value):
+    return {v.strip().lower() for v in (value or "").split(",") if v.strip()}
+
+_FEATURES_ENV = _name_set(os.getenv("FEATURES"))
+FEATURES = None if not _FEATURES_ENV or "all" in _FEATURES_ENV else _FEATURES_ENV
+FEATURES_DISABLED = _name_set(os.getenv("FEATURES_DISABLED"))
+
+# Endpoint HTTP de métriques au format Prometheus (`GET /metrics`) ; 0 = désactivé
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1") or "127.0.0.1"
+
+# Surveillance de la boucle asyncio : retard mesuré toutes les LOOP_LAG_INTERVAL secondes,
+# pile journalisée quand une étape bloque la boucle plus de LOOP_SLOW_STEP_MS millisecondes
+_LOOP_MONITOR_ENV = (os.getenv("LOOP_MONITOR", "true") or "true").strip().lower()
+LOOP_MONITOR = _LOOP_MONITOR_ENV in {"1", "true", "yes", "on"}
+LOOP_LAG_INTERVAL = max(0.05, float(os.getenv("LOOP_LAG_INTERVAL", "0.5") or 0.5))
+LOOP_SLOW_STEP_MS = max(10, int(os.getenv("LOOP_SLOW_STEP_MS", "250") or 250))
+
+# Traçage par interaction / événement (core.tracing) : TRACE_BUFFER_SIZE traces récentes gardées
+# pour `/traces`, décomposition journalisée au-delà de TRACE_SLOW_MS millisecondes
+_TRACING_ENV = (os.getenv("TRACING", "true") or "true").strip().lower()
+TRACING = _TRACING_ENV in {"1", "true", "yes", "on"}
+TRACE_SLOW_MS = max(1, int(os.getenv("TRACE_SLOW_MS", "1000") or 1000))
+TRACE_BUFFER_SIZE = max(1, int(os.getenv("TRACE_BUFFER_SIZE", "200") or 200))
+TRACE_MAX_SPANS = max(1, int(os.getenv("TRACE_MAX_SPANS", "200") or 200))
 
 # Avertit si le token du bot est absent
 if not BOT_TOKEN:
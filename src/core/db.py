@@ -2,20 +2,35 @@
 Abstraction pour PostgreSQL via asyncpg.
 
 Principes :
-- Un pool global unique, créé à la demande (`get_pool`)
-- Fonctions utilitaires atomiques (pas d'ORM) pour garder le contrôle
+- Un pool global unique, créé à la demande (`get_pool`) ; l'attente de chaque `acquire` est mesurée (`core.metrics`)
+  et, dans une trace (`core.tracing`), chaque acquisition et chaque requête devient un span
+- Taille, préchauffage et recyclage configurables (`DB_POOL_*`) ; connexions réservées par
+  fonctionnalité et statement_timeout par classe de requêtes, choisis par `workload(...)`
+- Fonctions utilitaires atomiques (pas d'ORM) pour garder le contrôle ; les requêtes fixes sont
+  des requêtes nommées préparées par connexion (`core.statements`)
 - Schéma minimal centré sur la table `discord_user` (upsert des membres)
+- `UserUpsertBatcher` : écrivain groupé pour les upserts à fort débit (événements gateway)
 """
 from __future__ import annotations
 
+import asyncio
 import asyncpg
+import functools
 import logging
-from typing import Iterable, Sequence, Tuple
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from core import config, metrics, statements, tracing
 
 logger = logging.getLogger(__name__)
 
 _pool = None
 
+# Appelés (dans l'ordre) à l'ouverture de chaque connexion du pool global
+CONNECTION_INIT_HOOKS = [tracing.init_connection, statements.prepare_connection]
+
 
 # Schéma principal minimal pour les utilisateurs Discord
 CREATE_TABLE_SQL = """
@@ -26,6 +41,14 @@ CREATE TABLE IF NOT EXISTS discord_user (
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 CREATE INDEX IF NOT EXISTS idx_discord_user_updated_at ON discord_user(updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_discord_user_updated_id ON discord_user(updated_at DESC, id DESC);
+"""
+
+# Recherche par nom (`/list_users`) : index trigram, si l'extension pg_trgm peut être installée
+CREATE_SEARCH_INDEXES_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_discord_user_display_trgm ON discord_user USING gin (display_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_discord_user_username_trgm ON discord_user USING gin (username gin_trgm_ops);
 """
 
 
@@ -35,18 +58,239 @@ INSERT INTO discord_user(id, display_name, username, updated_at)
 VALUES($1, $2, $3, NOW())
 ON CONFLICT (id) DO UPDATE SET display_name = EXCLUDED.display_name, username = EXCLUDED.username, updated_at = NOW();
 """
+UPSERT_USER = statements.define("core.upsert_user", UPSERT_USER_SQL)
+
+
+@dataclass(frozen=True)
+class Workload:
+    feature: Optional[str] = None  # budget de connexions réservées (`DB_POOL_RESERVED`)
+    query_class: str = "default"  # statement_timeout appliqué (`DB_STATEMENT_TIMEOUTS`)
+
+
+_WORKLOAD: ContextVar[Workload] = ContextVar("db_workload", default=Workload())
+
+
+class workload:
+    """
+    Attribue les acquisitions du bloc (`with`) ou de la coroutine décorée à une fonctionnalité
+    et/ou une classe de requêtes ; les tâches créées dans le bloc en héritent (contextvar).
+    Les champs non précisés sont repris du contexte englobant.
+    """
+
+    def __init__(self, feature: Optional[str] = None, query_class: Optional[str] = None):
+        self.feature = feature
+        self.query_class = query_class
+        self._token = None
+
+    def __enter__(self):
+        current = _WORKLOAD.get()
+        self._token = _WORKLOAD.set(Workload(self.feature or current.feature, self.query_class or current.query_class))
+        return self
+
+    def __exit__(self, *exc):
+        _WORKLOAD.reset(self._token)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with workload(self.feature, self.query_class):
+                return await func(*args, **kwargs)
+        return wrapper
+
+
+class PoolBudgets:
+    """
+    Répartition des connexions : chaque fonctionnalité de `reserved` dispose de ses connexions
+    réservées puis du partage commun ; les autres usages n'ont que le partage commun
+    (`max_size` moins les réserves). Une fonctionnalité réservée n'attend donc jamais derrière
+    un job de masse tant qu'elle reste dans sa réserve.
+    """
+
+    def __init__(self, max_size: int, reserved: Dict[str, int]):
+        self.reserved_sizes = {name: n for name, n in reserved.items() if n > 0}
+        total = sum(self.reserved_sizes.values())
+        if total >= max_size:
+            logger.warning("Réserves du pool (%s) >= taille max (%s) : partage commun limité à 1", total, max_size)
+        self.shared_size = max(1, max_size - total)
+        self.shared = asyncio.Semaphore(self.shared_size)
+        self.reserved = {name: asyncio.Semaphore(n) for name, n in self.reserved_sizes.items()}
+
+    async def take(self, feature: Optional[str]) -> asyncio.Semaphore:
+        own = self.reserved.get(feature) if feature else None
+        if own is not None and not own.locked():
+            await own.acquire()
+            return own
+        if own is None or not self.shared.locked():
+            await self.shared.acquire()
+            return self.shared
+        await own.acquire()
+        return own
+
+    def usage(self) -> Dict[str, Tuple[int, int]]:
+        """budget -> (connexions prises, taille) ; "shared" pour le partage commun."""
+        out = {"shared": (self.shared_size - self.shared._value, self.shared_size)}  # type: ignore[attr-defined]
+        for name, sem in self.reserved.items():
+            out[name] = (self.reserved_sizes[name] - sem._value, self.reserved_sizes[name])  # type: ignore[attr-defined]
+        return out
+
+
+def _observe_acquire(started: float, wl: Workload):
+    elapsed = time.perf_counter() - started
+    metrics.DB_ACQUIRE_SECONDS.observe(elapsed, feature=wl.feature or "shared")
+    tracing.record_span("db.acquire", started, elapsed, wl.feature)
+    if config.DB_POOL_WAIT_WARN_MS and elapsed * 1000 >= config.DB_POOL_WAIT_WARN_MS:
+        usage = _pool.budgets.usage() if _pool is not None and _pool.budgets is not None else {}
+        logger.warning(
+            "Attente connexion DB %.0fms (fonctionnalité %s, classe %s, budgets %s)",
+            elapsed * 1000, wl.feature or "-", wl.query_class,
+            ", ".join(f"{k} {u}/{n}" for k, (u, n) in usage.items()) or "-",
+        )
+
+
+async def _init_connection(conn):
+    for hook in CONNECTION_INIT_HOOKS:
+        result = hook(conn)
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class _TimedAcquire:
+    """Acquisition budgétée et chronométrée (`await pool.acquire()` ou `async with`)."""
+
+    __slots__ = ("_pool", "_timeout", "_conn")
+
+    def __init__(self, pool: "InstrumentedPool", timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    async def _acquire(self):
+        started = time.perf_counter()
+        wl = _WORKLOAD.get()
+        conn = await self._pool._acquire_for(wl, self._timeout)
+        _observe_acquire(started, wl)
+        return conn
+
+    async def __aenter__(self):
+        self._conn = await self._acquire()
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn)
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+
+class InstrumentedPool(asyncpg.Pool):
+    """
+    `asyncpg.Pool` dont chaque `acquire` (y compris via `pool.fetch`/`execute`) est chronométré,
+    soumis aux budgets de connexions (`PoolBudgets`) et au statement_timeout de la classe de
+    requêtes courante (`SET` annulé par le `RESET ALL` d'asyncpg au retour dans le pool).
+    """
+
+    def __init__(self, *args, budgets: Optional[PoolBudgets] = None,
+                 statement_timeouts: Optional[Dict[str, int]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budgets = budgets
+        self.statement_timeouts = statement_timeouts or {}
+        self._slots: Dict[int, asyncio.Semaphore] = {}
+
+    def acquire(self, *, timeout=None):  # type: ignore[override]
+        return _TimedAcquire(self, timeout)
+
+    async def _acquire_for(self, wl: Workload, timeout):
+        slot = None
+        if self.budgets is not None:
+            take = self.budgets.take(wl.feature)
+            slot = await (asyncio.wait_for(take, timeout) if timeout is not None else take)
+        try:
+            conn = await super().acquire(timeout=timeout)
+            timeout_ms = self.statement_timeouts.get(wl.query_class)
+            if wl.query_class != "default" and timeout_ms is not None:
+                try:
+                    await conn.execute(f"SET statement_timeout = {int(timeout_ms)}")
+                except BaseException:
+                    await super().release(conn)
+                    raise
+        except BaseException:
+            if slot is not None:
+                slot.release()
+            raise
+        if slot is not None:
+            self._slots[id(conn)] = slot
+        return conn
+
+    async def release(self, connection, *, timeout=None):  # type: ignore[override]
+        slot = self._slots.pop(id(connection), None)
+        try:
+            await super().release(connection, timeout=timeout)
+        finally:
+            if slot is not None:
+                slot.release()
+
+
+def create_pool(dsn: str, *, min_size: int, max_size: int, max_queries: int = 50000,
+                max_inactive_connection_lifetime: float = 300.0, **connect_kwargs) -> InstrumentedPool:
+    """Équivalent de `asyncpg.create_pool` (mêmes valeurs par défaut) produisant un `InstrumentedPool`."""
+    return InstrumentedPool(
+        dsn,
+        connection_class=asyncpg.Connection,
+        record_class=asyncpg.Record,
+        min_size=min_size, max_size=max_size,
+        max_queries=max_queries, loop=None, setup=None, init=connect_kwargs.pop("init", None),
+        max_inactive_connection_lifetime=max_inactive_connection_lifetime,
+        **connect_kwargs,
+    )
+
+
+async def warm_pool(pool: InstrumentedPool, count: int) -> int:
+    """Ouvre et valide `count` connexions en parallèle (hors budgets) ; retourne le nombre prêt."""
+    if count <= 0:
+        return 0
+
+    async def _one():
+        conn = await asyncpg.Pool.acquire(pool)
+        try:
+            await conn.fetchval("SELECT 1")
+        finally:
+            await asyncpg.Pool.release(pool, conn)
+
+    results = await asyncio.gather(*(_one() for _ in range(count)), return_exceptions=True)
+    failed = [r for r in results if isinstance(r, BaseException)]
+    if failed:
+        logger.warning("Préchauffage pool: %s connexions en échec (%s)", len(failed), failed[0])
+    return count - len(failed)
 
 
 async def get_pool(dsn: str):
     """
-    Retourne (et crée si nécessaire) le pool asyncpg.
+    Retourne (et crée si nécessaire) le pool asyncpg, dimensionné par `DB_POOL_*`.
     Args :
         dsn : URL de connexion Postgres
     """
     global _pool
     if _pool is None:
-        _pool = await asyncpg.create_pool(dsn, min_size=1, max_size=5)
-        logger.info("Pool asyncpg initialisé")
+        started = time.perf_counter()
+        _pool = await create_pool(
+            dsn,
+            min_size=config.DB_POOL_MIN_SIZE, max_size=config.DB_POOL_MAX_SIZE,
+            max_queries=config.DB_POOL_MAX_QUERIES,
+            max_inactive_connection_lifetime=config.DB_POOL_MAX_INACTIVE,
+            init=_init_connection,
+            server_settings={"statement_timeout": str(config.DB_STATEMENT_TIMEOUTS["default"])},
+            budgets=PoolBudgets(config.DB_POOL_MAX_SIZE, config.DB_POOL_RESERVED),
+            statement_timeouts=config.DB_STATEMENT_TIMEOUTS,
+        )
+        warmed = await warm_pool(_pool, config.DB_POOL_WARMUP)
+        metrics.watch_pool(_pool)
+        logger.info(
+            "Pool asyncpg initialisé (%s-%s connexions, %s préchauffées en %.2fs, réserves %s)",
+            config.DB_POOL_MIN_SIZE, config.DB_POOL_MAX_SIZE, warmed, time.perf_counter() - started,
+            config.DB_POOL_RESERVED or "aucune",
+        )
     return _pool
 
 
@@ -56,6 +300,11 @@ async def ensure_schema(pool: asyncpg.Pool):
     """
     async with pool.acquire() as conn:
         await conn.execute(CREATE_TABLE_SQL)
+        try:
+            await conn.execute(CREATE_SEARCH_INDEXES_SQL)
+        except asyncpg.PostgresError as e:
+            # Droits insuffisants pour CREATE EXTENSION : la recherche fonctionne sans index
+            logger.warning("Index trigram indisponibles (pg_trgm): %s", e)
         logger.info("Schéma vérifié (discord_user)")
 
 
@@ -64,12 +313,13 @@ async def upsert_user(pool: asyncpg.Pool, user_id: int, display_name: str, usern
     Insère ou met à jour un utilisateur Discord par son ID.
     """
     async with pool.acquire() as conn:
-        await conn.execute(UPSERT_USER_SQL, user_id, display_name, username)
+        await UPSERT_USER.execute(conn, user_id, display_name, username)
 
 
 async def bulk_upsert_users(pool: asyncpg.Pool, rows: Iterable[Tuple[int, str, str]]):
     """
-    Effectue plusieurs upserts séquentiels dans une transaction.
+    Effectue plusieurs upserts (un seul `executemany`) dans une transaction.
+    Pour de gros volumes, appeler par lots (voir `db.sync_users.MemberSyncWriter`).
     Returns : nombre de lignes traitées
     """
     rows_list: Sequence[Tuple[int, str, str]] = list(rows)
@@ -77,6 +327,76 @@ async def bulk_upsert_users(pool: asyncpg.Pool, rows: Iterable[Tuple[int, str, s
         return 0
     async with pool.acquire() as conn:
         async with conn.transaction():
-            for uid, display_name, username in rows_list:
-                await conn.execute(UPSERT_USER_SQL, uid, display_name, username)
+            await UPSERT_USER.executemany(conn, rows_list)
     return len(rows_list)
+
+
+class UserUpsertBatcher:
+    """
+    Regroupe les upserts `discord_user` émis par les événements (join, renommages).
+
+    `submit` est synchrone et ne prend aucune connexion : les lignes sont dédupliquées
+    par ID (la dernière valeur gagne) puis écrites par un seul `executemany` à chaque
+    flush (toutes les `interval` secondes, ou dès `max_batch` lignes en attente).
+    En cas d'échec, les lignes sont remises en file sans écraser des valeurs plus récentes.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, *, max_batch: int = 500, interval: float = 1.0):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.interval = interval
+        self._pending: Dict[int, Tuple[int, str, str]] = {}
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="user-upsert-batcher")
+
+    def submit(self, user_id: int, display_name: str, username: str):
+        self._pending[user_id] = (user_id, display_name, username)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec flush upserts utilisateurs")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            rows = list(self._pending.values())
+            self._pending = {}
+            try:
+                async with self.pool.acquire() as conn:
+                    await UPSERT_USER.executemany(conn, rows)
+            except Exception:
+                for row in rows:
+                    self._pending.setdefault(row[0], row)
+                raise
+            logger.debug("Upserts utilisateurs groupés: %s", len(rows))
+            return len(rows)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,34 @@
+"""
+Import différé de modules.
+
+`lazy_import("views.welcome")` retourne un module dont le code n'est exécuté qu'au premier accès
+à un attribut (`importlib.util.LazyLoader`). Les modules de commandes l'utilisent pour leurs
+dépendances `views`/`db` utilisées uniquement dans les callbacks : enregistrer une commande ne
+charge plus tout ce qu'elle utilisera, seule la première invocation paie l'import.
+
+À réserver aux modules sans effet de bord à l'import et non utilisés au niveau module
+(décorateurs, classes de base, alias de types évalués).
+"""
+from __future__ import annotations
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"Module introuvable: {name}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+__all__ = ["lazy_import"]
@@ -3,63 +3,198 @@ Configuration centralisée du logging pour le bot Discord.
 
 Objectifs :
 - Un seul setup idempotent (évite la duplication des handlers)
-- Déduplication des messages identiques (utile en cas de retries)
-- Format uniforme configurable via variables d'environnement
+- Aucune écriture depuis la boucle asyncio : le logger racine n'a qu'un `QueueHandler`, les
+  handlers réels (console) tournent dans le thread d'un `QueueListener`
+- Déduplication sur fenêtre glissante : un message identique (logger, niveau, texte rendu) n'est
+  émis qu'une fois par `LOG_DEDUP_WINDOW` secondes, puis un résumé « supprimé N fois » est émis
+  à l'expiration de la fenêtre ; les fenêtres sont bornées à `LOG_DEDUP_MAX` entrées (les plus
+  anciennes sont résumées puis oubliées)
+- Format texte uniforme, ou JSON (une ligne par enregistrement) avec `LOG_FORMAT=json`
+
+Les variables sont lues ici (et non dans `core.config`) car le logging est initialisé avant.
 """
 from __future__ import annotations
 
+import atexit
+import json
 import logging
-import threading
+import logging.handlers
 import os
+import queue
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
 _INITIALIZED = False
-_SEEN_LOCK = threading.Lock()
-_SEEN_RECORDS = set()
+_LISTENER: Optional["_DedupQueueListener"] = None
 
 DEFAULT_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 DEFAULT_FORMAT = '[%(asctime)s] %(levelname)s %(name)s: %(message)s'
+LOG_FORMAT = (os.getenv("LOG_FORMAT", "text") or "text").strip().lower()
+DEDUP_WINDOW = float(os.getenv("LOG_DEDUP_WINDOW", "60") or 0)
+DEDUP_MAX = max(1, int(os.getenv("LOG_DEDUP_MAX", "5000") or 5000))
+
+# Attributs standard d'un LogRecord : tout le reste provient de `extra=` et est repris en JSON
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+DedupKey = Tuple[str, int, str]
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = record.stack_info
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class _DedupWindow:
+    """Fenêtres de déduplication, dans l'ordre d'ouverture (utilisé par le seul thread du listener)."""
+
+    def __init__(self, window: float, max_entries: int):
+        self.window = window
+        self.max_entries = max_entries
+        # clé -> [début de fenêtre, nb supprimés, dernier enregistrement supprimé]
+        self._entries: "OrderedDict[DedupKey, list]" = OrderedDict()
+
+    def _summary(self, key: DedupKey, entry: list, now: float) -> logging.LogRecord:
+        last: logging.LogRecord = entry[2]
+        attrs = dict(vars(last))
+        created = time.time()
+        attrs.update(
+            created=created, msecs=(created - int(created)) * 1000,
+            msg=f"{key[2]} (message identique supprimé {entry[1]} fois en {now - entry[0]:.0f}s)",
+            args=None, exc_info=None, exc_text=None, stack_info=None, suppressed=entry[1],
+        )
+        return logging.makeLogRecord(attrs)
+
+    def expire(self, now: Optional[float] = None) -> List[logging.LogRecord]:
+        now = time.monotonic() if now is None else now
+        out = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[0] < self.window and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            if entry[1]:
+                out.append(self._summary(key, entry, now))
+        return out
+
+    def process(self, record: logging.LogRecord) -> List[logging.LogRecord]:
+        """Enregistrements à émettre pour `record` : résumés expirés puis `record` s'il n'est pas un doublon."""
+        now = time.monotonic()
+        out = self.expire(now)
+        key = (record.name, record.levelno, record.getMessage())
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[1] += 1
+            entry[2] = record
+            return out
+        self._entries[key] = [now, 0, None]
+        if len(self._entries) > self.max_entries:
+            # Au-delà de la taille maximale, les fenêtres les plus anciennes sont closes
+            out.extend(self.expire(now))
+        out.append(record)
+        return out
 
+    def flush(self) -> List[logging.LogRecord]:
+        now = time.monotonic()
+        out = [self._summary(k, e, now) for k, e in self._entries.items() if e[1]]
+        self._entries.clear()
+        return out
 
-class _DeduplicateFilter(logging.Filter):
-    def filter(self, record: logging.LogRecord) -> bool:  # noqa: D401
-        # Déduplication basée sur le message rendu (args interpolés)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Côté appelant : rend seulement le message (%-format) puis met en file ; le formatage
+    (horodatage, traceback, JSON) et l'écriture ont lieu dans le thread du listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
         try:
-            rendered = record.getMessage()
+            message = record.getMessage()
         except Exception:  # noqa: BLE001
-            rendered = str(record.msg)
-        key = (record.name, record.levelno, rendered)
-        with _SEEN_LOCK:
-            if key in _SEEN_RECORDS:
-                return False
-            _SEEN_RECORDS.add(key)
-            # Limite la croissance mémoire (reset si trop gros)
-            if len(_SEEN_RECORDS) > 5000:
-                _SEEN_RECORDS.clear()
-        return True
+            message = str(record.msg)
+        record.msg = message
+        record.args = None
+        return record
+
+
+class _DedupQueueListener(logging.handlers.QueueListener):
+    def __init__(self, q: queue.Queue, *handlers: logging.Handler, dedup: Optional[_DedupWindow]):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self.dedup = dedup
+
+    def dequeue(self, block: bool):
+        # Réveil périodique pour émettre les résumés des fenêtres expirées sans nouveau message
+        while True:
+            try:
+                return self.queue.get(block=block, timeout=1.0 if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                if self.dedup is not None:
+                    for summary in self.dedup.expire():
+                        super().handle(summary)
+
+    def handle(self, record: logging.LogRecord):
+        if self.dedup is None:
+            super().handle(record)
+            return
+        for out in self.dedup.process(record):
+            super().handle(out)
+
+    def stop(self):
+        super().stop()
+        if self.dedup is not None:
+            for summary in self.dedup.flush():
+                super().handle(summary)
+
+
+def _make_formatter() -> logging.Formatter:
+    return _JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(DEFAULT_FORMAT)
+
+
+def _stop_listener():
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
 
 
 def setup_logging(force: bool = False) -> None:
-    global _INITIALIZED
+    global _INITIALIZED, _LISTENER
     if _INITIALIZED and not force:
         return
 
     root = logging.getLogger()
-    if force:
-        # Purge tous les handlers existants
-        for h in list(root.handlers):
-            root.removeHandler(h)
-    if not root.handlers:
-        handler = logging.StreamHandler()
-        handler.addFilter(_DeduplicateFilter())
-        handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
-        root.addHandler(handler)
-    else:
-        # Ajoute le filtre de déduplication à chaque handler existant
-        for h in root.handlers:
-            h.addFilter(_DeduplicateFilter())
-    # Uniformise le format et le niveau de log
-    for h in root.handlers:
-        h.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+    _stop_listener()
+    handlers = [h for h in root.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    if force or not handlers:
+        handlers = [logging.StreamHandler()]
+    # Uniformise le format ; les handlers existants passent derrière la file
+    for h in handlers:
+        h.setFormatter(_make_formatter())
+    dedup = _DedupWindow(DEDUP_WINDOW, DEDUP_MAX) if DEDUP_WINDOW > 0 else None
+    log_queue: queue.Queue = queue.Queue(-1)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    _LISTENER = _DedupQueueListener(log_queue, *handlers, dedup=dedup)
+    _LISTENER.start()
+    if not _INITIALIZED:
+        atexit.register(_stop_listener)
     root.setLevel(getattr(logging, DEFAULT_LEVEL, logging.INFO))
     _INITIALIZED = True
 
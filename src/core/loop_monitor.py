@@ -0,0 +1,130 @@
+"""
+Surveillance de la boucle asyncio : retard d'ordonnancement et étapes bloquantes.
+
+- `LoopLagSampler` : toutes les `interval` secondes, mesure l'écart entre le réveil prévu et le
+  réveil effectif d'un `asyncio.sleep` (temps pendant lequel la boucle n'a pas pu reprendre la main).
+- Détecteur d'étapes lentes : la boucle rafraîchit un battement toutes les `threshold / 4`
+  secondes ; un thread de garde qui constate un battement plus vieux que `threshold` journalise
+  la tâche en cours et la pile du thread de la boucle au moment du blocage (une seule fois par
+  blocage), puis la durée totale du blocage quand la boucle reprend.
+
+Métriques : `event_loop_lag_seconds` (histogramme), `event_loop_slow_steps_total{coro}` et
+`event_loop_blocked_seconds` (histogramme). Activé par `LOOP_MONITOR`.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from core import config, metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = metrics.histogram(
+    "event_loop_lag_seconds", "Retard d'ordonnancement de la boucle asyncio",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SLOW_STEPS = metrics.counter("event_loop_slow_steps_total", "Etapes ayant bloqué la boucle au-delà du seuil", ["coro"])
+BLOCKED_SECONDS = metrics.histogram(
+    "event_loop_blocked_seconds", "Durée des blocages de la boucle au-delà du seuil",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def _describe_task(task: Optional[asyncio.Task]) -> str:
+    if task is None:
+        return "<callback>"
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or repr(coro)
+
+
+class LoopMonitor:
+    def __init__(self, *, interval: float, threshold: float, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.interval = interval
+        self.threshold = threshold
+        self.loop = loop or asyncio.get_running_loop()
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._loop_thread_id = threading.get_ident()
+        self._beat_handle: Optional[asyncio.TimerHandle] = None
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- côté boucle ---
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        self._beat_handle = self.loop.call_later(self.threshold / 4, self._heartbeat)
+
+    async def _sample(self):
+        while True:
+            expected = self.loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self.loop.time() - expected)
+            LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    # --- thread de garde ---
+    def _watch(self):
+        stalled_since: Optional[float] = None
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._beat
+            now = time.monotonic()
+            if now - beat > self.threshold:
+                if stalled_since != beat:
+                    stalled_since = beat
+                    self._report_stall(now - beat)
+            elif stalled_since is not None:
+                # Blocage terminé : durée jusqu'au premier battement suivant
+                BLOCKED_SECONDS.observe(beat - stalled_since)
+                logger.warning("Boucle asyncio débloquée après %.2fs", beat - stalled_since)
+                stalled_since = None
+
+    def _report_stall(self, elapsed: float):
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        name = _describe_task(task)
+        SLOW_STEPS.inc(coro=name)
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<pile indisponible>"
+        logger.warning("Boucle asyncio bloquée depuis %.2fs (seuil %.2fs) par %s\n%s", elapsed, self.threshold, name, stack)
+
+    def start(self):
+        self._heartbeat()
+        self._sampler = self.loop.create_task(self._sample(), name="loop-lag-sampler")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Surveillance de la boucle active (échantillon %.2fs, seuil étape lente %.0fms)",
+                    self.interval, self.threshold * 1000)
+
+    async def stop(self):
+        self._stop.set()
+        if self._beat_handle is not None:
+            self._beat_handle.cancel()
+        if self._sampler is not None:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """Démarre la surveillance si `LOOP_MONITOR` est actif (à appeler depuis la boucle)."""
+    if not config.LOOP_MONITOR:
+        return None
+    monitor = LoopMonitor(interval=config.LOOP_LAG_INTERVAL, threshold=config.LOOP_SLOW_STEP_MS / 1000)
+    monitor.start()
+    return monitor
+
+
+__all__ = ["LoopMonitor", "start_loop_monitor", "LOOP_LAG_SECONDS", "SLOW_STEPS", "BLOCKED_SECONDS"]
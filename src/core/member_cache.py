@@ -0,0 +1,140 @@
+"""
+Accès aux membres quand le cache du client est partiel.
+
+Avec `MEMBER_CACHE` restreint ou `CHUNK_GUILDS_AT_STARTUP=false`, `guild.get_member` ne connaît
+plus tout le monde. Les chemins qui ont besoin d'un membre passent par ce module :
+- `from_interaction` : le membre joint à l'interaction (données complètes, rôles compris) ;
+- `cached` : cache du client puis LRU des membres récemment vus (synchrone, sans réseau) ;
+- `resolve` : idem puis `guild.fetch_member` ; les absents sont aussi mémorisés (pas de
+  refetch en boucle d'un ancien membre d'une liste blanche) ;
+- `ensure_chunked` : chunk à la demande d'un serveur pour les traitements qui parcourent tous
+  les membres (backfill autorole), un seul à la fois par serveur.
+
+Le LRU est par serveur (`MEMBER_LRU_SIZE` entrées) avec une durée de vie `MEMBER_LRU_TTL` : les
+membres hors cache client ne reçoivent pas les mises à jour gateway.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import discord
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class MemberLRU:
+    """LRU par serveur de `discord.Member` (ou None pour un non-membre), avec expiration."""
+
+    def __init__(self, per_guild: int, ttl: float):
+        self.per_guild = per_guild
+        self.ttl = ttl
+        self._guilds: Dict[int, "OrderedDict[int, Tuple[float, Optional[discord.Member]]]"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, guild_id: int, user_id: int):
+        """Le membre mémorisé, None pour un non-membre connu, `_MISSING` sinon."""
+        entries = self._guilds.get(guild_id)
+        entry = entries.get(user_id) if entries is not None else None
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del entries[user_id]  # type: ignore[union-attr]
+            self.misses += 1
+            return _MISSING
+        entries.move_to_end(user_id)  # type: ignore[union-attr]
+        self.hits += 1
+        return entry[1]
+
+    def put(self, guild_id: int, user_id: int, member: Optional[discord.Member]):
+        if self.per_guild <= 0:
+            return
+        entries = self._guilds.setdefault(guild_id, OrderedDict())
+        entries[user_id] = (time.monotonic() + self.ttl, member)
+        entries.move_to_end(user_id)
+        while len(entries) > self.per_guild:
+            entries.popitem(last=False)
+
+    def forget(self, guild_id: int, user_id: Optional[int] = None):
+        if user_id is None:
+            self._guilds.pop(guild_id, None)
+        elif guild_id in self._guilds:
+            self._guilds[guild_id].pop(user_id, None)
+
+    def __len__(self) -> int:
+        return sum(len(e) for e in self._guilds.values())
+
+
+MEMBERS = MemberLRU(config.MEMBER_LRU_SIZE, config.MEMBER_LRU_TTL)
+_CHUNK_LOCKS: Dict[int, asyncio.Lock] = {}
+
+
+def remember(member: discord.Member):
+    MEMBERS.put(member.guild.id, member.id, member)
+
+
+def cached(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    found = MEMBERS.get(guild.id, user_id)
+    return None if found is _MISSING else found  # type: ignore[return-value]
+
+
+def from_interaction(interaction: discord.Interaction) -> Optional[discord.Member]:
+    """Membre auteur de l'interaction (joint par Discord, même hors cache)."""
+    if interaction.guild is None:
+        return None
+    if isinstance(interaction.user, discord.Member):
+        if interaction.guild.get_member(interaction.user.id) is None:
+            remember(interaction.user)
+        return interaction.user
+    return cached(interaction.guild, interaction.user.id)
+
+
+async def resolve(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    """Cache client, LRU, puis `fetch_member` (None si l'utilisateur n'est pas membre).
+
+    Une erreur REST transitoire (429, 5xx, accès refusé) retourne aussi None, sans mémoriser
+    l'absence : l'appel suivant retente `fetch_member`."""
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    found = MEMBERS.get(guild.id, user_id)
+    if found is not _MISSING:
+        return found  # type: ignore[return-value]
+    try:
+        member = await guild.fetch_member(user_id)
+    except discord.NotFound:
+        member = None
+    except discord.HTTPException as e:
+        logger.warning("fetch_member %s (guild %s) en échec: %s", user_id, guild.id, e)
+        return None
+    MEMBERS.put(guild.id, user_id, member)
+    return member
+
+
+async def ensure_chunked(guild: discord.Guild) -> bool:
+    """Charge tous les membres du serveur dans le cache client si ce n'est pas déjà fait."""
+    if guild.chunked:
+        return True
+    if not guild._state._intents.members:  # type: ignore[attr-defined]
+        return False
+    lock = _CHUNK_LOCKS.setdefault(guild.id, asyncio.Lock())
+    async with lock:
+        if not guild.chunked:
+            started = time.perf_counter()
+            await guild.chunk(cache=True)
+            logger.info("Chunk à la demande guild %s: %s membres en %.1fs",
+                        guild.id, len(guild.members), time.perf_counter() - started)
+    return guild.chunked
+
+
+__all__ = ["MemberLRU", "MEMBERS", "remember", "cached", "from_interaction", "resolve", "ensure_chunked"]
@@ -0,0 +1,167 @@
+"""
+Resynchronisation périodique des membres de tous les serveurs vers `discord_user`.
+
+Rattrape les renommages manqués pendant une indisponibilité sans attendre un `/sync_users` :
+- un serveur à la fois, espacés de `MEMBER_RESYNC_INTERVAL / nb_serveurs` secondes avec une
+  gigue de ±50 % ; les serveurs jamais (ou le plus anciennement) traités passent en premier ;
+- seuls les serveurs dont le cache de membres est complet (`guild.chunked`) sont traités :
+  aucun appel REST en tâche de fond ;
+- une empreinte du serveur (somme des md5 `display_name`/`username` des membres, indépendante
+  de l'ordre) est comparée à celle du dernier passage : inchangée -> aucune lecture en base ;
+- sinon, par lots, les empreintes stockées sont lues (`md5` calculé par Postgres) et seules
+  les lignes différentes ou absentes sont écrites (un `executemany` par lot) ;
+- budget : lignes lues+écrites limitées à `MEMBER_RESYNC_ROWS_PER_SEC` (seau à jetons) et
+  temps CPU limité à la fraction `MEMBER_RESYNC_DUTY` (pause proportionnelle après chaque lot) ;
+- durée, membres et lignes modifiées sont enregistrés par serveur (`member_resync_stats`).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import discord
+
+from core import config
+from core import db as core_db
+from core.autorole_backfill import RateBudget
+from db import member_resync as db
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+@dataclass
+class ResyncStats:
+    guild_id: int
+    members: int = 0
+    changed: int = 0
+    duration: float = 0.0
+    skipped: bool = False
+
+
+def _chunks(members: List[discord.Member], size: int) -> Iterator[List[discord.Member]]:
+    for i in range(0, len(members), size):
+        yield members[i:i + size]
+
+
+class MemberResyncScheduler:
+    def __init__(self, bot: discord.Client, pool, *, interval: Optional[float] = None,
+                 rows_per_sec: Optional[float] = None, duty: Optional[float] = None):
+        self.bot = bot
+        self.pool = pool
+        self.interval = config.MEMBER_RESYNC_INTERVAL if interval is None else interval
+        self.budget = RateBudget(rows_per_sec or config.MEMBER_RESYNC_ROWS_PER_SEC,
+                                 burst=max(CHUNK_SIZE, rows_per_sec or config.MEMBER_RESYNC_ROWS_PER_SEC))
+        self.duty = min(1.0, max(0.01, duty or config.MEMBER_RESYNC_DUTY))
+        self.last_stats: Dict[int, ResyncStats] = {}
+
+    async def _pace(self, started: float):
+        """Pause proportionnelle au travail effectué pour respecter la fraction CPU `duty`."""
+        busy = time.perf_counter() - started
+        if self.duty < 1.0:
+            await asyncio.sleep(busy * (1 - self.duty) / self.duty)
+        else:
+            await asyncio.sleep(0)
+
+    async def _digest(self, members: List[discord.Member]) -> str:
+        total = 0
+        for chunk in _chunks(members, CHUNK_SIZE):
+            started = time.perf_counter()
+            for m in chunk:
+                total = (total + int(db.name_hash(m.display_name, m.name), 16)) & ((1 << 128) - 1)
+            await self._pace(started)
+        return f"{len(members)}:{total:032x}"
+
+    @core_db.workload("member_resync", "bulk")
+    async def resync_guild(self, guild: discord.Guild) -> ResyncStats:
+        stats = ResyncStats(guild_id=guild.id)
+        started = time.perf_counter()
+        if not guild.chunked:
+            stats.skipped = True
+            return stats
+        members = [m for m in guild.members if not m.bot]
+        stats.members = len(members)
+        snapshot = await self._digest(members)
+        if snapshot == await db.get_snapshot_hash(self.pool, guild.id):
+            stats.skipped = True
+        else:
+            for chunk in _chunks(members, CHUNK_SIZE):
+                await self.budget.acquire(len(chunk))
+                stored = await db.fetch_name_hashes(self.pool, [m.id for m in chunk])
+                work = time.perf_counter()
+                diff = [
+                    (m.id, m.display_name, m.name) for m in chunk
+                    if stored.get(m.id) != db.name_hash(m.display_name, m.name)
+                ]
+                await self._pace(work)
+                if diff:
+                    await self.budget.acquire(len(diff))
+                    await core_db.bulk_upsert_users(self.pool, diff)
+                    stats.changed += len(diff)
+        stats.duration = time.perf_counter() - started
+        await db.record_run(
+            self.pool, guild.id, snapshot_hash=snapshot, members=stats.members, rows_changed=stats.changed,
+            duration_ms=int(stats.duration * 1000), skipped=stats.skipped,
+        )
+        self.last_stats[guild.id] = stats
+        if stats.changed:
+            logger.info("Resync membres guild %s: %s/%s lignes mises à jour en %.1fs",
+                        guild.id, stats.changed, stats.members, stats.duration)
+        else:
+            logger.debug("Resync membres guild %s: aucun changement (%s membres, %.1fs, empreinte %s)",
+                         guild.id, stats.members, stats.duration, "identique" if stats.skipped else "modifiée")
+        return stats
+
+    async def _ordered_guild_ids(self) -> List[int]:
+        last_runs = {int(r["guild_id"]): r["last_run_at"] for r in await db.list_last_runs(self.pool)}
+        never = datetime.min.replace(tzinfo=timezone.utc)
+        return sorted((g.id for g in self.bot.guilds), key=lambda gid: last_runs.get(gid, never))
+
+    async def run_pass(self) -> List[ResyncStats]:
+        """Un passage complet, un serveur à la fois, étalé sur l'intervalle."""
+        guild_ids = await self._ordered_guild_ids()
+        if not guild_ids:
+            await asyncio.sleep(self.interval)
+            return []
+        spacing = self.interval / len(guild_ids)
+        results = []
+        for gid in guild_ids:
+            await asyncio.sleep(spacing * random.uniform(0.5, 1.5))
+            guild = self.bot.get_guild(gid)
+            if guild is None:
+                continue
+            try:
+                results.append(await self.resync_guild(guild))
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec resync membres guild %s", gid)
+        changed = sum(r.changed for r in results)
+        logger.info("Resync membres: passage terminé (%s serveurs, %s lignes mises à jour)", len(results), changed)
+        return results
+
+    async def run_forever(self):
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            try:
+                await self.run_pass()
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec passage resync membres")
+                await asyncio.sleep(self.interval)
+
+
+def start_member_resync(bot: discord.Client) -> Optional[asyncio.Task]:
+    """Lance le planificateur si une DB est configurée et `MEMBER_RESYNC_INTERVAL` > 0."""
+    pool = getattr(bot, 'db_pool', None)
+    if pool is None or config.MEMBER_RESYNC_INTERVAL <= 0:
+        return None
+    scheduler = MemberResyncScheduler(bot, pool)
+    bot.member_resync = scheduler  # type: ignore[attr-defined]
+    return bot.loop.create_task(scheduler.run_forever())
+
+
+__all__ = ["MemberResyncScheduler", "ResyncStats", "start_member_resync"]
@@ -0,0 +1,384 @@
+"""
+Métriques du bot au format texte Prometheus, servies par un petit serveur HTTP intégré.
+
+Aucune dépendance externe : compteurs, jauges et histogrammes sont tenus en mémoire dans
+`REGISTRY` et rendus à la demande sur `GET /metrics` (`METRICS_PORT`, 0 = désactivé). Le serveur
+écoute par défaut sur 127.0.0.1 pour un scrape local.
+
+Métriques exposées :
+- discord_gateway_events_total{type} : événements gateway reçus, par type (`socket_event_type`) ;
+- discord_event_handler_seconds{event} : durée des handlers d'événements du client ;
+- discord_http_request_seconds{method,route,status} : requêtes REST (routes normalisées, IDs -> `:id`) ;
+- discord_http_ratelimited_total{route,scope} : réponses 429 ;
+- voice_hubs_operation_seconds{op} : opérations de `VoiceHubsManager` ;
+- autorole_interaction_seconds{op} : traitement des interactions autorole ;
+- db_pool_acquire_seconds{feature} : attente d'une connexion du pool asyncpg, par budget ;
+- db_pool_connections{state} : connexions `in_use` / `idle` / `max` (lues au scrape) ;
+- db_pool_budget_connections{budget,state} : occupation des réserves par fonctionnalité et du partage commun.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels attendus {self.labelnames}, reçus {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Jauge fixée par `set`, ou calculée au scrape par `callback` (-> [(labels, valeur)])."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[Dict[str, object], float]]]] = None):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                values = {self._key(labels): v for labels, v in self.callback()}
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec collecte de la jauge %s", self.name)
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # clé -> (compte par bucket (non cumulé, +Inf en dernier), somme)
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1][0] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    """Chronomètre utilisable en `with` / `async with` (la durée est observée même sur exception)."""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+def timed(histogram: Histogram, **labels):
+    """Décorateur de coroutine : observe sa durée dans `histogram`."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames, callback))  # type: ignore[return-value]
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+
+GATEWAY_EVENTS = counter("discord_gateway_events_total", "Evénements gateway reçus par type", ["type"])
+EVENT_HANDLER_SECONDS = histogram("discord_event_handler_seconds", "Durée des handlers d'événements", ["event"])
+HTTP_REQUEST_SECONDS = histogram(
+    "discord_http_request_seconds", "Durée des requêtes REST Discord", ["method", "route", "status"]
+)
+HTTP_RATELIMITED = counter("discord_http_ratelimited_total", "Réponses 429 de l'API Discord", ["route", "scope"])
+VOICE_HUBS_SECONDS = histogram("voice_hubs_operation_seconds", "Durée des opérations VoiceHubsManager", ["op"])
+AUTOROLE_SECONDS = histogram("autorole_interaction_seconds", "Durée de traitement des interactions autorole", ["op"])
+DB_ACQUIRE_SECONDS = histogram(
+    "db_pool_acquire_seconds", "Attente d'une connexion du pool asyncpg (budget compris)", ["feature"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+_pool_ref: List[object] = []
+
+
+def _pool_connections():
+    if not _pool_ref:
+        return []
+    pool = _pool_ref[0]
+    size, idle = pool.get_size(), pool.get_idle_size()  # type: ignore[attr-defined]
+    return [({"state": "in_use"}, size - idle), ({"state": "idle"}, idle), ({"state": "max"}, pool.get_max_size())]  # type: ignore[attr-defined]
+
+
+DB_POOL_CONNECTIONS = gauge("db_pool_connections", "Connexions du pool asyncpg", ["state"], callback=_pool_connections)
+
+
+def _pool_budgets():
+    budgets = getattr(_pool_ref[0], "budgets", None) if _pool_ref else None
+    if budgets is None:
+        return []
+    out = []
+    for name, (used, size) in budgets.usage().items():
+        out.append(({"budget": name, "state": "in_use"}, used))
+        out.append(({"budget": name, "state": "size"}, size))
+    return out
+
+
+DB_POOL_BUDGET = gauge("db_pool_budget_connections", "Connexions par budget (réserves et partage commun)",
+                       ["budget", "state"], callback=_pool_budgets)
+
+
+def watch_pool(pool):
+    """Expose l'occupation de `pool` dans `db_pool_connections`."""
+    _pool_ref[:] = [pool]
+
+
+_SNOWFLAKE_RE = re.compile(r"/\d{15,21}(?=/|$)")
+_TOKEN_RE = re.compile(r"(/(?:webhooks|interactions)/:id)/[^/]+")
+
+
+def normalize_route(path: str) -> str:
+    """`/api/v10/channels/123/messages/456` -> `/channels/:id/messages/:id` (cardinalité bornée)."""
+    path = re.sub(r"^/api/v\d+", "", path)
+    path = _SNOWFLAKE_RE.sub("/:id", path)
+    return _TOKEN_RE.sub(r"\1/:token", path)
+
+
+def http_trace_config():
+    """`aiohttp.TraceConfig` à passer au client (`http_trace=`) : durée et 429 par route."""
+    import aiohttp
+
+    trace = aiohttp.TraceConfig()
+
+    async def _start(session, ctx, params):
+        ctx.started = time.perf_counter()
+
+    async def _end(session, ctx, params):
+        route = normalize_route(params.url.path)
+        status = params.response.status
+        elapsed = time.perf_counter() - ctx.started
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=params.method, route=route, status=status)
+        tracing.record_span(f"http {params.method} {route}", ctx.started, elapsed, str(status), status >= 400)
+        if status == 429:
+            scope = params.response.headers.get("X-RateLimit-Scope", "global" if params.response.headers.get("X-RateLimit-Global") else "user")
+            HTTP_RATELIMITED.inc(route=route, scope=scope)
+
+    async def _error(session, ctx, params):
+        route = normalize_route(params.url.path)
+        elapsed = time.perf_counter() - ctx.started
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=params.method, route=route, status="error")
+        tracing.record_span(f"http {params.method} {route}", ctx.started, elapsed, type(params.exception).__name__, True)
+
+    trace.on_request_start.append(_start)
+    trace.on_request_end.append(_end)
+    trace.on_request_exception.append(_error)
+    return trace
+
+
+class MetricsServer:
+    """Serveur HTTP minimal : `GET /metrics` (texte Prometheus 0.0.4) et `GET /healthz`."""
+
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        logger.info("Métriques exposées sur http://%s:%s/metrics", self.host, self.port)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # En-têtes ignorés, lus jusqu'à la ligne vide
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+            parts = request_line.decode("latin-1").split()
+            method, path = (parts[0], parts[1].split("?", 1)[0]) if len(parts) >= 2 else ("", "")
+            if method != "GET":
+                status, body, ctype = "405 Method Not Allowed", b"", "text/plain"
+            elif path == "/metrics":
+                status, body, ctype = "200 OK", self.registry.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/healthz":
+                status, body, ctype = "200 OK", b"ok\n", "text/plain"
+            else:
+                status, body, ctype = "404 Not Found", b"", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception:  # noqa: BLE001
+            logger.exception("Erreur serveur de métriques")
+        finally:
+            writer.close()
+
+
+__all__ = [
+    "Counter", "Gauge", "Histogram", "Registry", "REGISTRY", "MetricsServer", "timed",
+    "counter", "gauge", "histogram", "watch_pool", "normalize_route", "http_trace_config",
+    "GATEWAY_EVENTS", "EVENT_HANDLER_SECONDS", "HTTP_REQUEST_SECONDS", "HTTP_RATELIMITED",
+    "VOICE_HUBS_SECONDS", "AUTOROLE_SECONDS", "DB_ACQUIRE_SECONDS", "DB_POOL_CONNECTIONS", "DB_POOL_BUDGET",
+]
@@ -7,13 +7,16 @@ Rappel :
 
 Exemple : Administrator = 0x00000008
 
-Ce module fournit le décorateur `require_perms` pour les commandes slash.
+Ce module fournit le décorateur `require_perms` pour les commandes slash, et les checks
+`owner_only` (propriétaire du serveur) et `app_owner_only` (propriétaire de l'application ou
+membre admin/développeur de son équipe).
 """
 from __future__ import annotations
 
 from typing import Callable, TypeVar, Awaitable, Any
 import functools
 import discord
+from discord import app_commands
 
 T = TypeVar("T", bound=Callable[..., Awaitable[Any]])
 
@@ -62,4 +65,42 @@ def require_perms(bits: int, *, ephemeral: bool = True, message: str | None = No
         return wrapper  # type: ignore[return-value]
     return decorator
 
-__all__ = ["require_perms", "ADMINISTRATOR"]
+def is_guild_owner(inter: discord.Interaction) -> bool:
+    return inter.guild is not None and inter.user.id == inter.guild.owner_id
+
+
+def owner_only():
+    """Check de commande slash : réservé au propriétaire du serveur."""
+    def predicate(inter: discord.Interaction):
+        if not is_guild_owner(inter):
+            raise app_commands.CheckFailure("Réservé au propriétaire du serveur.")
+        return True
+    return app_commands.check(predicate)
+
+
+async def application_owner_ids(client: discord.Client) -> frozenset[int]:
+    """Propriétaire de l'application, ou membres admin/développeurs de l'équipe qui la possède."""
+    app = client.application or await client.application_info()
+    if app.team is not None:
+        roles = (discord.TeamMemberRole.admin, discord.TeamMemberRole.developer)
+        return frozenset(m.id for m in app.team.members if m.role in roles)
+    return frozenset((app.owner.id,))
+
+
+async def is_app_owner(client: discord.Client, user: discord.abc.User) -> bool:
+    return user.id in await application_owner_ids(client)
+
+
+def app_owner_only():
+    """Check de commande slash : réservé au propriétaire de l'application (voir `application_owner_ids`)."""
+    async def predicate(inter: discord.Interaction):
+        if not await is_app_owner(inter.client, inter.user):
+            raise app_commands.CheckFailure("Réservé au propriétaire de l'application.")
+        return True
+    return app_commands.check(predicate)
+
+
+__all__ = [
+    "require_perms", "ADMINISTRATOR", "is_guild_owner", "owner_only",
+    "application_owner_ids", "is_app_owner", "app_owner_only",
+]
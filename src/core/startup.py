@@ -0,0 +1,160 @@
+"""
+Démarrage du bot sous forme de graphe de phases.
+
+Chaque phase déclare les phases dont elle dépend (`after`) et, optionnellement, une condition
+évaluée au moment de son lancement (`when`, ex. base configurée). Toutes les phases sont lancées
+ensemble : chacune attend ses dépendances puis s'exécute, si bien que les phases indépendantes
+(schémas des fonctionnalités, import des commandes, voice hubs) se chevauchent.
+
+Une phase en échec est journalisée sans interrompre le démarrage : les dépendances ne fixent que
+l'ordre, c'est `when` qui décide si une phase a lieu (comme les blocs try/except indépendants
+qu'elles remplacent). La durée de chaque phase est mesurée et résumée dans un rapport (`StartupReport`)
+avec le chemin critique, c'est-à-dire la chaîne de phases qui fixe le temps de démarrage.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+FAILED = "échec"
+SKIPPED = "ignorée"
+
+PhaseFunc = Callable[[], Awaitable[Optional[str]]]
+
+
+@dataclass
+class Phase:
+    name: str
+    func: PhaseFunc
+    after: Tuple[str, ...] = ()
+    when: Optional[Callable[[], bool]] = None
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    status: str = SKIPPED
+    start: float = 0.0  # décalage depuis le début du démarrage (s)
+    duration: float = 0.0
+    detail: Optional[str] = None
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+@dataclass
+class StartupReport:
+    total: float
+    phases: List[PhaseResult] = field(default_factory=list)
+    critical_path: List[str] = field(default_factory=list)
+
+    def failed(self) -> List[str]:
+        return [p.name for p in self.phases if p.status == FAILED]
+
+    def format(self) -> str:
+        width = max((len(p.name) for p in self.phases), default=0)
+        lines = [f"Démarrage en {self.total:.2f}s ; chemin critique : {' > '.join(self.critical_path) or '-'}"]
+        for p in sorted(self.phases, key=lambda r: (r.start, r.name)):
+            line = f"  {p.name:<{width}}  +{p.start:6.3f}s  {p.duration:6.3f}s  {p.status}"
+            if p.detail:
+                line += f" ({p.detail})"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class StartupGraph:
+    """Graphe de phases de démarrage (noms uniques, dépendances déclarées avant `run`)."""
+
+    def __init__(self):
+        self._phases: Dict[str, Phase] = {}
+
+    def add(self, name: str, func: PhaseFunc, *, after: Iterable[str] = (),
+            when: Optional[Callable[[], bool]] = None) -> "StartupGraph":
+        if name in self._phases:
+            raise ValueError(f"Phase déjà déclarée: {name}")
+        self._phases[name] = Phase(name, func, tuple(after), when)
+        return self
+
+    def phase(self, name: str, *, after: Iterable[str] = (), when: Optional[Callable[[], bool]] = None):
+        """Décorateur équivalent à `add`."""
+        def decorator(func: PhaseFunc) -> PhaseFunc:
+            self.add(name, func, after=after, when=when)
+            return func
+        return decorator
+
+    def _check(self):
+        for phase in self._phases.values():
+            for dep in phase.after:
+                if dep not in self._phases:
+                    raise ValueError(f"Phase {phase.name}: dépendance inconnue {dep}")
+        # Détection de cycle (parcours en profondeur)
+        state: Dict[str, int] = {}
+
+        def visit(name: str, stack: List[str]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError("Cycle de dépendances: " + " > ".join(stack + [name]))
+            state[name] = 1
+            for dep in self._phases[name].after:
+                visit(dep, stack + [name])
+            state[name] = 2
+
+        for name in self._phases:
+            visit(name, [])
+
+    async def run(self) -> StartupReport:
+        self._check()
+        origin = time.perf_counter()
+        results: Dict[str, PhaseResult] = {name: PhaseResult(name) for name in self._phases}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def _run(phase: Phase):
+            if phase.after:
+                await asyncio.gather(*(tasks[d] for d in phase.after))
+            result = results[phase.name]
+            result.start = time.perf_counter() - origin
+            if phase.when is not None and not phase.when():
+                return
+            started = time.perf_counter()
+            try:
+                result.detail = await phase.func()
+                result.status = OK
+            except Exception:  # noqa: BLE001
+                result.status = FAILED
+                logger.exception("Phase de démarrage en échec: %s", phase.name)
+            finally:
+                result.duration = time.perf_counter() - started
+
+        for phase in self._phases.values():
+            tasks[phase.name] = asyncio.create_task(_run(phase), name=f"startup:{phase.name}")
+        await asyncio.gather(*tasks.values())
+        report = StartupReport(
+            total=time.perf_counter() - origin,
+            phases=list(results.values()),
+            critical_path=self._critical_path(results),
+        )
+        return report
+
+    def _critical_path(self, results: Dict[str, PhaseResult]) -> List[str]:
+        """Remonte depuis la phase terminée en dernier, via la dépendance terminée en dernier."""
+        ran = [r for r in results.values() if r.status != SKIPPED]
+        if not ran:
+            return []
+        current: Optional[str] = max(ran, key=lambda r: r.end).name
+        path: List[str] = []
+        while current is not None:
+            path.append(current)
+            deps = self._phases[current].after
+            current = max(deps, key=lambda d: results[d].end) if deps else None
+        return list(reversed(path))
+
+
+__all__ = ["StartupGraph", "StartupReport", "PhaseResult", "OK", "FAILED", "SKIPPED"]
@@ -0,0 +1,164 @@
+"""
+Registre central des requêtes nommées, préparées par connexion.
+
+Les modules `db.*` (et `core.db`) déclarent leurs requêtes au chargement :
+
+    GET_GROUP = statements.define("autorole.get_group", "SELECT * FROM autorole_group WHERE ...")
+
+puis les exécutent par leur nom sur une connexion du pool (`await GET_GROUP.fetchrow(conn, ...)`).
+Chaque connexion garde ses `PreparedStatement` : la requête n'est analysée et planifiée qu'une
+fois par connexion, quelle que soit la pression sur le cache LRU d'asyncpg. Les requêtes
+`eager` déjà déclarées sont préparées dès l'ouverture de la connexion (hook `init` du pool,
+`DB_PREPARE_ON_CONNECT`) ; les autres, et celles déclarées plus tard (modules chargés à la
+demande), à leur première exécution sur la connexion.
+
+Après un changement de schéma (colonne ajoutée sous un `SELECT *`), la préparation périmée est
+refaite une fois, hors transaction. Métriques : `db_statement_seconds{statement}` (exécutions),
+`db_statement_prepare_seconds{statement}` (coût d'analyse/planification) et
+`db_statement_reprepare_total{statement}` ; chaque exécution est un span `db.stmt` des traces.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, Optional
+
+import asyncpg
+
+from core import config, metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_SECONDS = metrics.histogram(
+    "db_statement_seconds", "Durée d'exécution des requêtes nommées", ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+PREPARE_SECONDS = metrics.histogram(
+    "db_statement_prepare_seconds", "Durée de préparation (analyse, planification) des requêtes nommées", ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+REPREPARED = metrics.counter(
+    "db_statement_reprepare_total", "Préparations refaites après invalidation (changement de schéma)", ["statement"]
+)
+
+_STALE_ERRORS = (asyncpg.exceptions.InvalidCachedStatementError, asyncpg.exceptions.OutdatedSchemaCacheError)
+
+# id(connexion brute) -> nom -> PreparedStatement (vidé à la fermeture de la connexion)
+_PREPARED: Dict[int, Dict[str, asyncpg.prepared_stmt.PreparedStatement]] = {}
+
+
+def _raw(conn) -> asyncpg.Connection:
+    # Le pool prête un `PoolConnectionProxy` ; les préparations sont rattachées à la connexion réelle
+    return getattr(conn, "_con", None) or conn
+
+
+def _forget_connection(conn):
+    _PREPARED.pop(id(conn), None)
+
+
+class Statement:
+    """Requête nommée ; les méthodes reprennent celles d'`asyncpg.Connection` (connexion en premier)."""
+
+    __slots__ = ("name", "sql", "eager")
+
+    def __init__(self, name: str, sql: str, eager: bool = True):
+        self.name = name
+        self.sql = sql
+        self.eager = eager
+
+    async def prepare(self, conn):
+        raw = _raw(conn)
+        prepared = _PREPARED.get(id(raw))
+        if prepared is None:
+            prepared = _PREPARED[id(raw)] = {}
+            raw.add_termination_listener(_forget_connection)
+        started = time.perf_counter()
+        stmt = await raw.prepare(self.sql)
+        PREPARE_SECONDS.observe(time.perf_counter() - started, statement=self.name)
+        prepared[self.name] = stmt
+        return stmt
+
+    async def _get(self, conn):
+        stmt = _PREPARED.get(id(_raw(conn)), {}).get(self.name)
+        return stmt if stmt is not None else await self.prepare(conn)
+
+    async def _run(self, conn, method: str, *args):
+        """Exécute `method` sur la préparation ; retourne (préparation utilisée, résultat)."""
+        stmt = await self._get(conn)
+        started = time.perf_counter()
+        try:
+            try:
+                return stmt, await getattr(stmt, method)(*args)
+            except _STALE_ERRORS:
+                _PREPARED.get(id(_raw(conn)), {}).pop(self.name, None)
+                if conn.is_in_transaction():
+                    raise
+                REPREPARED.inc(statement=self.name)
+                stmt = await self.prepare(conn)
+                return stmt, await getattr(stmt, method)(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            STATEMENT_SECONDS.observe(elapsed, statement=self.name)
+            tracing.record_span("db.stmt", started, elapsed, self.name)
+
+    async def fetch(self, conn, *args):
+        return (await self._run(conn, "fetch", *args))[1]
+
+    async def fetchrow(self, conn, *args):
+        return (await self._run(conn, "fetchrow", *args))[1]
+
+    async def fetchval(self, conn, *args):
+        return (await self._run(conn, "fetchval", *args))[1]
+
+    async def execute(self, conn, *args) -> str:
+        """Comme `Connection.execute` avec arguments : retourne le statut (`"DELETE 1"`...)."""
+        stmt, _ = await self._run(conn, "fetch", *args)
+        return stmt.get_statusmsg()
+
+    async def executemany(self, conn, args):
+        return (await self._run(conn, "executemany", args))[1]
+
+    def __repr__(self) -> str:
+        return f"<Statement {self.name}>"
+
+
+REGISTRY: Dict[str, Statement] = {}
+
+
+def define(name: str, sql: str, *, eager: bool = True) -> Statement:
+    """Déclare (ou retrouve, si identique) la requête `name`."""
+    existing = REGISTRY.get(name)
+    if existing is not None:
+        if existing.sql != sql:
+            raise ValueError(f"Requête nommée déjà déclarée avec un autre SQL: {name}")
+        return existing
+    stmt = REGISTRY[name] = Statement(name, sql, eager)
+    return stmt
+
+
+def get(name: str) -> Optional[Statement]:
+    return REGISTRY.get(name)
+
+
+async def prepare_connection(conn):
+    """Hook d'initialisation du pool : prépare les requêtes `eager` déclarées à ce stade.
+
+    Une requête dont la table n'existe pas encore (premier démarrage, schéma créé après le pool)
+    est ignorée ici et sera préparée à sa première exécution.
+    """
+    if not config.DB_PREPARE_ON_CONNECT:
+        return
+    skipped = 0
+    for stmt in list(REGISTRY.values()):
+        if not stmt.eager:
+            continue
+        try:
+            await stmt.prepare(conn)
+        except asyncpg.PostgresError:
+            skipped += 1
+    if skipped:
+        logger.debug("Requêtes nommées non préparées à la connexion: %s", skipped)
+
+
+__all__ = ["Statement", "define", "get", "prepare_connection", "REGISTRY",
+           "STATEMENT_SECONDS", "PREPARE_SECONDS", "REPREPARED"]
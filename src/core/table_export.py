@@ -0,0 +1,208 @@
+"""
+Export d'une table en fichier compressé (CSV ou JSON lines, gzip).
+
+Le flux `COPY ... TO STDOUT` est consommé morceau par morceau :
+- chaque morceau est compressé incrémentalement (`zlib`, conteneur gzip) vers un fichier
+  temporaire (`SpooledTemporaryFile` : mémoire jusqu'à `SPOOL_MEMORY`, disque au-delà) ;
+  le résultat complet n'est jamais en mémoire ;
+- les coupures se font en fin d'enregistrement : en CSV, un saut de ligne à l'intérieur d'un
+  champ entre guillemets n'en est pas une (parité des guillemets, `""` échappé compte double) ;
+  le nombre de lignes rapporté est celui des enregistrements ; quand une partie approche la limite de taille
+  d'une pièce jointe Discord, elle est fermée et une nouvelle partie commence (mode `split`),
+  sinon l'export s'arrête (COPY annulé) et le fichier est marqué tronqué ;
+- chaque partie est un fichier gzip autonome, lisible seule (les parties CSV répètent l'en-tête).
+"""
+from __future__ import annotations
+
+import logging
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import IO, List, Optional
+
+import asyncpg
+
+from db import dbbrowse as db_layer
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+SPOOL_MEMORY = 8 * 1024 * 1024
+# Marge sous la limite : le flush final du compresseur peut encore écrire quelques dizaines de Ko
+PART_SLACK = 256 * 1024
+
+
+class ExportLimitReached(Exception):
+    """Levée depuis le puits COPY pour interrompre l'export (limite de taille / de parties)."""
+
+
+@dataclass
+class ExportPart:
+    file: IO[bytes]
+    size: int = 0
+    rows: int = 0
+
+
+@dataclass
+class ExportResult:
+    table: str
+    fmt: str
+    parts: List[ExportPart] = field(default_factory=list)
+    rows: int = 0
+    raw_bytes: int = 0
+    seconds: float = 0.0
+    truncated: bool = False
+
+    @property
+    def size(self) -> int:
+        return sum(p.size for p in self.parts)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def filename(self, index: int) -> str:
+        base = f"{self.table}.{self.fmt}"
+        if len(self.parts) > 1:
+            base = f"{self.table}.part{index + 1:02d}.{self.fmt}"
+        return base + ".gz"
+
+    def close(self):
+        for p in self.parts:
+            try:
+                p.file.close()
+            except Exception:  # noqa: BLE001
+                pass
+
+
+class GzipPartWriter:
+    """Puits COPY : compression gzip incrémentale, découpage en parties alignées sur les enregistrements."""
+
+    def __init__(self, result: ExportResult, part_limit: int, *, split: bool, max_parts: int, skip_header: bool,
+                 quote: Optional[bytes] = None):
+        self.result = result
+        self.part_limit = max(part_limit - PART_SLACK, 64 * 1024)
+        self.split = split
+        self.max_parts = max_parts
+        self._skip_header = skip_header  # la ligne d'en-tête CSV n'est pas une ligne de données
+        self._header: bytes = b""
+        self._pending = b""
+        self._quote = quote  # guillemet CSV ; None : un saut de ligne termine toujours l'enregistrement
+        self._quoted = False  # fin de `_pending` à l'intérieur d'un champ entre guillemets
+        self._compressor = None
+        self._part: Optional[ExportPart] = None
+        self._new_part()
+
+    def _new_part(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 : en-tête gzip
+        self._part = ExportPart(file=tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY))
+        self.result.parts.append(self._part)
+        if self._header:
+            # Chaque partie CSV est lisible seule : l'en-tête y est répété
+            self._write(self._header)
+
+    def _write(self, data: bytes):
+        out = self._compressor.compress(data)
+        if out:
+            self._part.file.write(out)
+            self._part.size += len(out)
+
+    def _finish_part(self):
+        out = self._compressor.flush()
+        self._part.file.write(out)
+        self._part.size += len(out)
+        self._part.file.seek(0)
+
+    def _scan(self, data: bytes, start: int) -> tuple[int, int, int]:
+        """Parcourt `data[start:]` : (fin du premier enregistrement, fin du dernier, nombre d'enregistrements)."""
+        if self._quote is None:
+            n = data.count(b"\n", start)
+            return data.find(b"\n", start) + 1, data.rfind(b"\n") + 1, n
+        quote, quoted = self._quote, self._quoted
+        first = cut = n = 0
+        pos = start
+        while True:
+            nl = data.find(b"\n", pos)
+            if nl < 0:
+                break
+            if data.count(quote, pos, nl) % 2:
+                quoted = not quoted
+            if not quoted:
+                cut = nl + 1
+                first = first or cut
+                n += 1
+            pos = nl + 1
+        if data.count(quote, pos) % 2:
+            quoted = not quoted
+        self._quoted = quoted
+        return first, cut, n
+
+    async def __call__(self, chunk: bytes):
+        self.result.raw_bytes += len(chunk)
+        data = self._pending + chunk
+        first, cut, n = self._scan(data, len(self._pending))
+        self._pending = data[cut:]
+        lines = data[:cut]
+        if not lines:
+            return
+        if self._skip_header:
+            self._header, lines = lines[:first], lines[first:]
+            self._skip_header = False
+            self._write(self._header)
+            n -= 1
+        self._write(lines)
+        self._part.rows += n
+        self.result.rows += n
+        if self._part.size >= self.part_limit:
+            self._finish_part()
+            if not self.split or len(self.result.parts) >= self.max_parts:
+                self.result.truncated = True
+                self._part = None
+                raise ExportLimitReached()
+            self._new_part()
+
+    def close(self):
+        if self._part is None:
+            return
+        if self._pending:
+            self._write(self._pending)
+            self._part.rows += 1
+            self.result.rows += 1
+            self._pending = b""
+        self._finish_part()
+
+
+async def export_table(
+    pool: asyncpg.Pool,
+    table: str,
+    fmt: str,
+    part_limit: int,
+    *,
+    split: bool = False,
+    max_parts: int = 10,
+) -> ExportResult:
+    """Exporte `table` (nom déjà validé par l'appelant) ; fermer le résultat après envoi."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu: {fmt}")
+    result = ExportResult(table=table, fmt=fmt)
+    writer = GzipPartWriter(result, part_limit, split=split, max_parts=max_parts, skip_header=fmt == "csv",
+                            quote=b'"' if fmt == "csv" else None)
+    started = time.perf_counter()
+    try:
+        await db_layer.copy_table(pool, table, fmt, writer)
+        writer.close()
+    except ExportLimitReached:
+        logger.info("Export %s tronqué à %s lignes (%s parties)", table, result.rows, len(result.parts))
+    except BaseException:
+        result.close()
+        raise
+    result.seconds = time.perf_counter() - started
+    logger.info(
+        "Export %s (%s): %s lignes en %.1fs (%.0f lignes/s), %s octets bruts -> %s octets gzip",
+        table, fmt, result.rows, result.seconds, result.rows_per_second, result.raw_bytes, result.size,
+    )
+    return result
+
+
+__all__ = ["export_table", "ExportResult", "ExportPart", "GzipPartWriter", "FORMATS"]
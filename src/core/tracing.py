@@ -0,0 +1,357 @@
+"""
+Traçage léger par interaction et par événement gateway (contextvars).
+
+Une trace est ouverte :
+- pour chaque interaction (commande, composant, modal, autocomplétion) : le parser gateway
+  `INTERACTION_CREATE` est enveloppé, la trace est courante pendant qu'il crée les tâches des
+  handlers (qui héritent du contexte) et se termine quand ces tâches sont toutes finies ;
+- pour chaque événement gateway qui a un handler (`Bot._run_event`), hors interaction ; le serveur
+  de la trace est déduit des arguments de l'événement (`event_guild_id`).
+
+Dans une trace, des spans sont ajoutés par `span(...)` / `record_span(...)` : acquisition de
+connexion (`db.acquire`), requêtes asyncpg (`db.query`, via le query logger de chaque
+connexion), helpers des modules `db.*` et `core.db` (`db.<module>.<fonction>`), requêtes REST
+Discord (`http <méthode> <route>`). Hors trace, ces appels ne coûtent qu'une lecture de contextvar.
+
+Les traces terminées sont gardées dans un tampon circulaire (`TRACE_BUFFER_SIZE`) consultable
+par `/traces` ; au-delà de `TRACE_SLOW_MS`, la décomposition par span est journalisée. Chaque
+enregistrement de log porte `trace_id` (visible en `LOG_FORMAT=json`).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import secrets
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import Deque, Dict, List, Optional
+
+import discord
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+_CURRENT: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+# Tâches créées pendant l'appel synchrone d'un parser tracé (voir `_task_factory`)
+_COLLECTING: Optional[List[asyncio.Task]] = None
+
+INTERACTION_KINDS = {2: "cmd", 3: "component", 4: "autocomplete", 5: "modal"}
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # décalage depuis le début de la trace (s)
+    duration: float
+    detail: Optional[str] = None
+    error: bool = False
+
+
+@dataclass
+class Trace:
+    name: str
+    id: str = field(default_factory=lambda: secrets.token_hex(6))
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    origin: float = field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    guild_id: Optional[int] = None
+    user_id: Optional[int] = None
+    spans: List[Span] = field(default_factory=list)
+    error: bool = False
+    finished: bool = False
+
+    def add(self, name: str, started: float, duration: float, detail: Optional[str] = None, error: bool = False):
+        if not self.finished and len(self.spans) < config.TRACE_MAX_SPANS:
+            self.spans.append(Span(name, started - self.origin, duration, detail, error))
+
+    def totals(self) -> Dict[str, float]:
+        """Durée cumulée par catégorie (`db`, `http`, ...) ; les spans imbriqués se recouvrent."""
+        out: Dict[str, float] = {}
+        for s in self.spans:
+            category = s.name.split(".", 1)[0].split(" ", 1)[0]
+            out[category] = out.get(category, 0.0) + s.duration
+        return out
+
+    def format(self, limit: int = 30) -> str:
+        head = f"{self.id} {self.name} {self.duration * 1000:.0f}ms"
+        totals = ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in sorted(self.totals().items()))
+        lines = [head + (f" ({totals})" if totals else "")]
+        for s in sorted(self.spans, key=lambda s: s.start)[:limit]:
+            line = f"  +{s.start * 1000:6.1f}ms {s.duration * 1000:7.1f}ms  {s.name}"
+            if s.detail:
+                line += f"  {s.detail}"
+            if s.error:
+                line += "  [erreur]"
+            lines.append(line)
+        if len(self.spans) > limit:
+            lines.append(f"  … {len(self.spans) - limit} spans de plus")
+        return "\n".join(lines)
+
+
+RECENT: Deque[Trace] = deque(maxlen=config.TRACE_BUFFER_SIZE)
+
+
+def current() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+def record_span(name: str, started: float, duration: float, detail: Optional[str] = None, error: bool = False):
+    """Ajoute un span déjà mesuré (`started` en `time.perf_counter()`) à la trace courante."""
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.add(name, started, duration, detail, error)
+
+
+class span:
+    """Span autour d'un bloc (`with` / `async with`) ; sans trace courante, ne fait rien."""
+
+    __slots__ = ("name", "detail", "_trace", "_start")
+
+    def __init__(self, name: str, detail: Optional[str] = None):
+        self.name = name
+        self.detail = detail
+        self._trace: Optional[Trace] = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._trace = _CURRENT.get()
+        if self._trace is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if self._trace is not None:
+            self._trace.add(self.name, self._start, time.perf_counter() - self._start, self.detail, exc_type is not None)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+def _finish(trace: Trace, keep_empty: bool = True):
+    if trace.finished:
+        return
+    trace.duration = time.perf_counter() - trace.origin
+    trace.finished = True
+    slow = trace.duration * 1000 >= config.TRACE_SLOW_MS
+    if keep_empty or trace.spans or slow or trace.error:
+        RECENT.append(trace)
+    if slow:
+        logger.warning("Trace lente %s", trace.format(), extra={"trace_id": trace.id})
+
+
+class trace_block:
+    """Trace racine autour d'un bloc ; imbriquée dans une trace existante, devient un span.
+    Avec `keep_empty=False`, une trace rapide sans span n'est pas gardée dans le tampon."""
+
+    def __init__(self, name: str, *, guild_id: Optional[int] = None, user_id: Optional[int] = None,
+                 keep_empty: bool = True):
+        self.name = name
+        self.keep_empty = keep_empty
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self._trace: Optional[Trace] = None
+        self._token = None
+        self._span: Optional[span] = None
+
+    async def __aenter__(self):
+        if not config.TRACING:
+            return None
+        parent = _CURRENT.get()
+        if parent is not None:
+            self._span = span(self.name)
+            self._span.__enter__()
+            return parent
+        self._trace = Trace(self.name, guild_id=self.guild_id, user_id=self.user_id)
+        self._token = _CURRENT.set(self._trace)
+        return self._trace
+
+    async def __aexit__(self, exc_type, *exc):
+        if self._span is not None:
+            self._span.__exit__(exc_type, *exc)
+        elif self._trace is not None:
+            self._trace.error = exc_type is not None
+            _CURRENT.reset(self._token)
+            _finish(self._trace, self.keep_empty)
+        return False
+
+
+def _task_factory(loop, coro, **kwargs):
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    if _COLLECTING is not None:
+        _COLLECTING.append(task)
+    return task
+
+
+def _interaction_name(data: dict) -> str:
+    kind = INTERACTION_KINDS.get(data.get("type"), f"type{data.get('type')}")
+    inner = data.get("data") or {}
+    label = inner.get("name") or str(inner.get("custom_id", "?"))[:40]
+    return f"{kind}:{label}"
+
+
+def _wrap_interaction_parser(parser):
+    @functools.wraps(parser)
+    def traced(data):
+        global _COLLECTING
+        user = (data.get("member") or {}).get("user") or data.get("user") or {}
+        trace = Trace(
+            _interaction_name(data),
+            guild_id=int(data["guild_id"]) if data.get("guild_id") else None,
+            user_id=int(user["id"]) if user.get("id") else None,
+        )
+        token = _CURRENT.set(trace)
+        previous, _COLLECTING = _COLLECTING, []
+        try:
+            parser(data)
+            tasks = _COLLECTING
+        finally:
+            _COLLECTING = previous
+            _CURRENT.reset(token)
+        if not tasks:
+            return
+        pending = len(tasks)
+
+        def _done(task: asyncio.Task):
+            nonlocal pending
+            pending -= 1
+            if not task.cancelled() and task.exception() is not None:
+                trace.error = True
+            if pending == 0:
+                _finish(trace)
+
+        for task in tasks:
+            task.add_done_callback(_done)
+
+    return traced
+
+
+def _query_logger(record):
+    # Appelé via call_soon depuis la tâche qui a exécuté la requête : le contexte (donc la trace) est le sien
+    trace = _CURRENT.get()
+    if trace is not None:
+        query = " ".join(str(record.query).split())
+        trace.add("db.query", time.perf_counter() - record.elapsed, record.elapsed,
+                  query[:80], record.exception is not None)
+
+
+def init_connection(conn):
+    """Hook d'initialisation des connexions du pool : journalisation des requêtes dans la trace."""
+    if config.TRACING:
+        conn.add_query_logger(_query_logger)
+
+
+def instrument_module(module: ModuleType, prefix: str) -> int:
+    """Enveloppe les coroutines publiques définies dans `module` d'un span `<prefix>.<nom>`."""
+    count = 0
+    for name, func in list(vars(module).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(func) or getattr(func, "__module__", None) != module.__name__:
+            continue
+        if getattr(func, "__traced__", False):
+            continue
+
+        def _make(f, span_name):
+            @functools.wraps(f)
+            async def wrapper(*args, **kwargs):
+                if _CURRENT.get() is None:
+                    return await f(*args, **kwargs)
+                with span(span_name):
+                    return await f(*args, **kwargs)
+            wrapper.__traced__ = True  # type: ignore[attr-defined]
+            return wrapper
+
+        setattr(module, name, _make(func, f"{prefix}.{name}"))
+        count += 1
+    return count
+
+
+def instrument_db_modules() -> int:
+    """Instrumente `core.db` et les modules `db.*` déjà chargés (les modules encore différés par
+    `core.lazy` ne sont pas forcés : leurs requêtes restent visibles via `db.query`)."""
+    count = 0
+    for name, module in list(sys.modules.items()):
+        if not (name == "core.db" or name.startswith("db.")) or type(module) is not ModuleType:
+            continue
+        count += instrument_module(module, "db." + name.rsplit(".", 1)[-1] if name != "core.db" else "db.core")
+    return count
+
+
+def install(bot) -> bool:
+    """Active le traçage sur le client (à appeler depuis la boucle, dans `setup_hook`)."""
+    if not config.TRACING:
+        return False
+    loop = asyncio.get_running_loop()
+    if loop.get_task_factory() is None:
+        loop.set_task_factory(_task_factory)
+    else:
+        logger.warning("Task factory déjà définie : traces d'interaction désactivées")
+        return False
+    parsers = bot._connection.parsers
+    parsers["INTERACTION_CREATE"] = _wrap_interaction_parser(parsers["INTERACTION_CREATE"])
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        trace = _CURRENT.get()
+        if trace is not None and not hasattr(record, "trace_id"):
+            record.trace_id = trace.id
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+    return True
+
+
+def event_guild_id(args) -> Optional[int]:
+    """Serveur concerné par un événement gateway, d'après le premier argument qui en porte un."""
+    for arg in args:
+        if isinstance(arg, discord.Guild):
+            return arg.id
+        guild_id = getattr(arg, "guild_id", None)  # payloads `raw_*`
+        if isinstance(guild_id, int):
+            return guild_id
+        guild = getattr(arg, "guild", None)
+        if isinstance(guild, discord.Guild):
+            return guild.id
+    return None
+
+
+def visible(trace: Trace, guild_id: Optional[int], *, include_global: bool = False) -> bool:
+    """Trace du serveur `guild_id` ; celles sans serveur seulement avec `include_global`."""
+    if trace.guild_id is None:
+        return include_global
+    return guild_id is None or trace.guild_id == guild_id
+
+
+def recent(*, guild_id: Optional[int] = None, include_global: bool = False, slow_only: bool = False,
+           limit: int = 20) -> List[Trace]:
+    out = []
+    for trace in reversed(RECENT):
+        if not visible(trace, guild_id, include_global=include_global):
+            continue
+        if slow_only and trace.duration * 1000 < config.TRACE_SLOW_MS:
+            continue
+        out.append(trace)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def find(trace_id: str) -> Optional[Trace]:
+    return next((t for t in RECENT if t.id == trace_id), None)
+
+
+__all__ = [
+    "Trace", "Span", "span", "trace_block", "record_span", "current", "install", "init_connection",
+    "instrument_module", "instrument_db_modules", "event_guild_id", "visible", "recent", "find", "RECENT",
+]
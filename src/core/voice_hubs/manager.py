@@ -6,12 +6,17 @@ from typing import Dict, Set, Optional
 
 import discord
 
+from core import member_cache, metrics
+from core.db import workload
 from db import voice_hubs as db
 from .models import RoomMeta
 from views.voice_hubs import build_control_view, build_control_embed
 
 logger = logging.getLogger(__name__)
 
+# Chemins déclenchés par les membres : connexions réservées et timeout court
+_hot_path = workload("voice_hubs", "interactive")
+
 
 class VoiceHubsManager:
     """Coordonne la logique des voice hubs (migré depuis features.voice_hubs.runtime.manager).
@@ -47,6 +52,8 @@ class VoiceHubsManager:
             self.locks[hub_id] = lock
         return lock
 
+    @_hot_path
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="apply_room_permissions")
     async def apply_room_permissions(self, meta: RoomMeta, guild: discord.Guild):
         channel = guild.get_channel(meta.channel_id)
         if not isinstance(channel, discord.VoiceChannel):
@@ -95,7 +102,7 @@ class VoiceHubsManager:
             tracked_ids.add(meta.creator_id)
 
         async def set_member_overwrite(user_id: int, *, connect: Optional[bool] = None, view: Optional[bool] = None, speak: Optional[bool] = None):
-            member = guild.get_member(user_id)
+            member = await member_cache.resolve(guild, user_id)
             if not isinstance(member, discord.Member):
                 return
             overwrite = channel.overwrites_for(member)
@@ -144,6 +151,8 @@ class VoiceHubsManager:
                 except Exception:  # noqa: BLE001
                     logger.debug("Impossible de nettoyer les permissions résiduelles pour %s", target.id)
 
+    @_hot_path
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="transfer_room_ownership")
     async def transfer_room_ownership(self, meta: RoomMeta, new_owner_id: int, guild: discord.Guild):
         channel = guild.get_channel(meta.channel_id)
         if not isinstance(channel, discord.VoiceChannel):
@@ -175,7 +184,7 @@ class VoiceHubsManager:
             use_voice_activation=True,
         )
 
-        new_member = guild.get_member(new_owner_id)
+        new_member = await member_cache.resolve(guild, new_owner_id)
         if isinstance(new_member, discord.Member):
             try:
                 overwrite = discord.PermissionOverwrite.from_pair(allow_perms, discord.Permissions.none())
@@ -184,7 +193,7 @@ class VoiceHubsManager:
                 logger.exception("Impossible d'appliquer les permissions propriétaire pour %s", new_owner_id)
 
         if old_owner_id and old_owner_id != new_owner_id:
-            old_member = guild.get_member(old_owner_id)
+            old_member = await member_cache.resolve(guild, old_owner_id)
             if isinstance(old_member, discord.Member):
                 try:
                     overwrite = channel.overwrites_for(old_member)
@@ -223,6 +232,8 @@ class VoiceHubsManager:
             return True
         return False
 
+    @_hot_path
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="create_dynamic_room")
     async def create_dynamic_room(self, member: discord.Member, hub_channel: discord.VoiceChannel):
         hub_id = hub_channel.id
         lock = self.get_lock(hub_id)
@@ -333,6 +344,8 @@ class VoiceHubsManager:
             except Exception:
                 logger.debug("Impossible d'envoyer le panneau de contrôle en DM pour %s", creator.id, exc_info=True)
 
+    @_hot_path
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="delete_dynamic_room_if_empty")
     async def delete_dynamic_room_if_empty(self, channel: discord.VoiceChannel):
         if channel.id not in self.dynamic_rooms:
             return
@@ -348,6 +361,8 @@ class VoiceHubsManager:
             logger.exception("Echec suppression dynamic room")
 
     # Placeholder pour évolutions (permissions avancées, modes, etc.)
+    @_hot_path
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="handle_voice_state_update")
     async def handle_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         before_channel = before.channel
         after_channel = after.channel
@@ -357,6 +372,8 @@ class VoiceHubsManager:
             if await self.is_dynamic_room(before_channel.id):
                 await self.delete_dynamic_room_if_empty(before_channel)
 
+    @_hot_path
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="handle_channel_delete")
     async def handle_channel_delete(self, channel: discord.abc.GuildChannel):
         if isinstance(channel, discord.VoiceChannel):
             cid = channel.id
@@ -369,6 +386,7 @@ class VoiceHubsManager:
                 self.dynamic_rooms.discard(cid)
                 logger.info("Dynamic room supprimée manuellement %s -> purgée DB", cid)
 
+    @metrics.timed(metrics.VOICE_HUBS_SECONDS, op="cleanup_orphans")
     async def cleanup_orphans(self):
         existing_voice_ids = {ch.id for ch in self.bot.get_all_channels() if isinstance(ch, discord.VoiceChannel)}
         missing_hubs = [hid for hid in list(self.hubs) if hid not in existing_voice_ids]
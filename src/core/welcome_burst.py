@@ -0,0 +1,141 @@
+"""
+Détection d'afflux d'arrivées et agrégation des messages de bienvenue.
+
+Par serveur, les arrivées sont comptées sur une fenêtre glissante :
+- trafic normal : un embed par membre (comportement historique) ;
+- au-delà de `WELCOME_BURST_THRESHOLD` arrivées sur `WELCOME_BURST_WINDOW` secondes, le serveur
+  passe en mode afflux : les membres sont mis en attente et publiés toutes les
+  `WELCOME_BURST_FLUSH` secondes, `WELCOME_BURST_MAX_MEMBERS` par embed, les embeds étant groupés
+  par message dans les limites Discord (10 embeds, 6000 caractères) ; un envoi en échec remet
+  ses membres en attente pour le flush suivant ;
+- le mode afflux se termine au premier flush où la file est vide et le débit repassé sous le seuil.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import discord
+
+from core import config
+from views.welcome import build_welcome_payload, build_welcome_burst_embed
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10
+# Limite Discord sur la somme des textes (titres, descriptions, pieds...) des embeds d'un message
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+WelcomeChannel = Union[discord.TextChannel, discord.Thread]
+
+
+@dataclass
+class _GuildBurstState:
+    joins: Deque[float] = field(default_factory=deque)
+    bursting: bool = False
+    pending: List[discord.Member] = field(default_factory=list)
+    channel: Optional[WelcomeChannel] = None
+    task: Optional[asyncio.Task] = None
+
+
+class WelcomeBurstAggregator:
+    def __init__(
+        self,
+        *,
+        threshold: Optional[int] = None,
+        window: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        max_members: Optional[int] = None,
+    ):
+        self.threshold = config.WELCOME_BURST_THRESHOLD if threshold is None else threshold
+        self.window = window or config.WELCOME_BURST_WINDOW
+        self.flush_interval = flush_interval or config.WELCOME_BURST_FLUSH
+        self.max_members = max_members or config.WELCOME_BURST_MAX_MEMBERS
+        self._states: Dict[int, _GuildBurstState] = {}
+
+    def is_bursting(self, guild_id: int) -> bool:
+        state = self._states.get(guild_id)
+        return bool(state and state.bursting)
+
+    def _prune(self, state: _GuildBurstState, now: float):
+        cutoff = now - self.window
+        while state.joins and state.joins[0] < cutoff:
+            state.joins.popleft()
+
+    async def dispatch(self, member: discord.Member, channel: WelcomeChannel):
+        """Envoie (ou met en attente) le message de bienvenue d'un membre."""
+        if self.threshold <= 0:
+            await channel.send(**await build_welcome_payload(member))
+            return
+        state = self._states.setdefault(member.guild.id, _GuildBurstState())
+        now = time.monotonic()
+        state.joins.append(now)
+        self._prune(state, now)
+        if not state.bursting and len(state.joins) >= self.threshold:
+            state.bursting = True
+            logger.info("Afflux d'arrivées détecté sur %s (%s en %.0fs) -> bienvenue agrégée", member.guild.id, len(state.joins), self.window)
+            state.task = asyncio.create_task(self._flush_loop(member.guild.id, state), name=f"welcome-burst-{member.guild.id}")
+        if state.bursting:
+            state.pending.append(member)
+            state.channel = channel
+            return
+        await channel.send(**await build_welcome_payload(member))
+
+    async def _flush_loop(self, guild_id: int, state: _GuildBurstState):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self._flush(state)
+                self._prune(state, time.monotonic())
+                if not state.pending and len(state.joins) < self.threshold:
+                    state.bursting = False
+                    logger.info("Fin de l'afflux d'arrivées sur %s -> bienvenue individuelle", guild_id)
+                    return
+        finally:
+            state.task = None
+            if not state.bursting and not state.joins:
+                self._states.pop(guild_id, None)
+
+    async def _flush(self, state: _GuildBurstState):
+        if not state.pending or state.channel is None:
+            return
+        members, state.pending = state.pending, []
+        channel = state.channel
+        batches = [members[i:i + self.max_members] for i in range(0, len(members), self.max_members)]
+        embeds = [build_welcome_burst_embed(channel.guild, batch) for batch in batches]
+        messages = _pack_messages(embeds)
+        for start, end in messages:
+            try:
+                await channel.send(embeds=embeds[start:end])
+            except (discord.Forbidden, discord.NotFound):
+                logger.exception("Salon de bienvenue inaccessible, bienvenue agrégée abandonnée (%s membres)", len(members))
+                return
+            except Exception:  # noqa: BLE001
+                # Remis en tête de file (ce message et les suivants) pour le prochain flush
+                unsent = [m for batch in batches[start:] for m in batch]
+                state.pending[:0] = unsent
+                logger.exception("Echec envoi bienvenue agrégée, %s membres remis en attente", len(unsent))
+                return
+
+
+def _pack_messages(embeds: List[discord.Embed]) -> List[Tuple[int, int]]:
+    """Découpe `embeds` en messages (plages [début, fin)) : au plus 10 embeds et
+    `MAX_EMBED_CHARS_PER_MESSAGE` caractères cumulés (`len(embed)`) par message."""
+    messages: List[Tuple[int, int]] = []
+    start, total = 0, 0
+    for i, embed in enumerate(embeds):
+        size = len(embed)
+        if i > start and (i - start >= MAX_EMBEDS_PER_MESSAGE or total + size > MAX_EMBED_CHARS_PER_MESSAGE):
+            messages.append((start, i))
+            start, total = i, 0
+        total += size
+    if start < len(embeds):
+        messages.append((start, len(embeds)))
+    return messages
+
+
+__all__ = ["WelcomeBurstAggregator"]
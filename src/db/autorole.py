@@ -3,16 +3,21 @@ Couche base de données pour la fonctionnalité Autorole.
 
 Schéma :
 - autorole_group : id SERIAL, guild_id BIGINT, name TEXT (unique par serveur), multi BOOL, max INT,
-  feedback BOOL (envoi d'un message de confirmation),
+  feedback BOOL (envoi d'un message de confirmation), mode TEXT ('component' | 'reaction'),
   linked_message_id BIGINT NULL, channel_id BIGINT NULL, broken BOOL par défaut FALSE
 - autorole_item : id SERIAL, group_id INT FK, role_id BIGINT, emoji TEXT NULL, position INT
+- autorole_backfill_job : job d'ajout/retrait massif (action, role_ids, filtres, status) avec
+  checkpoint `last_member_id` (membres parcourus par ID croissant) et compteurs de progression
 Des index sont ajoutés pour optimiser les recherches.
+Les requêtes sont des requêtes nommées `autorole.*` (`core.statements`), préparées par connexion.
 """
 from __future__ import annotations
 
 import asyncpg
 from typing import Optional, Sequence
 
+from core import statements
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS autorole_group (
     id SERIAL PRIMARY KEY,
@@ -26,6 +31,7 @@ CREATE TABLE IF NOT EXISTS autorole_group (
     linked_message_id BIGINT NULL,
     channel_id BIGINT NULL,
     broken BOOLEAN NOT NULL DEFAULT FALSE,
+    mode TEXT NOT NULL DEFAULT 'component',
     UNIQUE(guild_id, name)
 );
 
@@ -41,6 +47,29 @@ CREATE TABLE IF NOT EXISTS autorole_item (
 
 CREATE INDEX IF NOT EXISTS idx_autorole_group_guild ON autorole_group(guild_id);
 CREATE INDEX IF NOT EXISTS idx_autorole_item_group ON autorole_item(group_id);
+
+CREATE TABLE IF NOT EXISTS autorole_backfill_job (
+    id SERIAL PRIMARY KEY,
+    guild_id BIGINT NOT NULL,
+    group_id INT NOT NULL REFERENCES autorole_group(id) ON DELETE CASCADE,
+    action TEXT NOT NULL,
+    role_ids BIGINT[] NOT NULL,
+    filter_role_id BIGINT NULL,
+    only_without_group BOOLEAN NOT NULL DEFAULT FALSE,
+    status TEXT NOT NULL DEFAULT 'running',
+    last_member_id BIGINT NOT NULL DEFAULT 0,
+    processed INT NOT NULL DEFAULT 0,
+    changed INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    total INT NOT NULL DEFAULT 0,
+    created_by BIGINT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Un seul job actif par groupe
+CREATE UNIQUE INDEX IF NOT EXISTS uq_autorole_backfill_running ON autorole_backfill_job(group_id) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_autorole_backfill_guild ON autorole_backfill_job(guild_id, created_at DESC);
 """
 
 async def ensure_schema(pool: asyncpg.Pool):
@@ -51,39 +80,41 @@ async def ensure_schema(pool: asyncpg.Pool):
             await conn.execute("ALTER TABLE autorole_group ADD COLUMN IF NOT EXISTS feedback BOOLEAN NOT NULL DEFAULT TRUE")
             await conn.execute("ALTER TABLE autorole_group ADD COLUMN IF NOT EXISTS button_label TEXT NULL")
             await conn.execute("ALTER TABLE autorole_group ADD COLUMN IF NOT EXISTS button_style INT NULL")
+            await conn.execute("ALTER TABLE autorole_group ADD COLUMN IF NOT EXISTS mode TEXT NOT NULL DEFAULT 'component'")
+            await conn.execute("ALTER TABLE autorole_backfill_job ADD COLUMN IF NOT EXISTS failed INT NOT NULL DEFAULT 0")
 
 # Groups
-async def create_group(pool: asyncpg.Pool, guild_id: int, name: str, multi: bool = True, max_value: int = 0, feedback: bool = True,
-                       button_label: Optional[str] = None, button_style: Optional[int] = None) -> asyncpg.Record:
-    q = """
+CREATE_GROUP = statements.define("autorole.create_group", """
     INSERT INTO autorole_group(guild_id, name, multi, max, feedback, button_label, button_style)
     VALUES($1,$2,$3,$4,$5,$6,$7)
         ON CONFLICT (guild_id, name) DO NOTHING
         RETURNING *
-    """
+    """)
+
+async def create_group(pool: asyncpg.Pool, guild_id: int, name: str, multi: bool = True, max_value: int = 0, feedback: bool = True,
+                       button_label: Optional[str] = None, button_style: Optional[int] = None) -> asyncpg.Record:
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, guild_id, name, multi, max_value, feedback, button_label, button_style)
+        return await CREATE_GROUP.fetchrow(conn, guild_id, name, multi, max_value, feedback, button_label, button_style)
+
+GET_GROUP = statements.define("autorole.get_group", "SELECT * FROM autorole_group WHERE guild_id=$1 AND name=$2")
 
 async def get_group(pool: asyncpg.Pool, guild_id: int, name: str) -> Optional[asyncpg.Record]:
-    q = "SELECT * FROM autorole_group WHERE guild_id=$1 AND name=$2"
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, guild_id, name)
+        return await GET_GROUP.fetchrow(conn, guild_id, name)
+
+GET_GROUP_BY_ID = statements.define("autorole.get_group_by_id", "SELECT * FROM autorole_group WHERE id=$1")
 
 async def get_group_by_id(pool: asyncpg.Pool, group_id: int) -> Optional[asyncpg.Record]:
-    q = "SELECT * FROM autorole_group WHERE id=$1"
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, group_id)
+        return await GET_GROUP_BY_ID.fetchrow(conn, group_id)
+
+LIST_GROUPS = statements.define("autorole.list_groups", "SELECT * FROM autorole_group WHERE guild_id=$1 ORDER BY name")
 
 async def list_groups(pool: asyncpg.Pool, guild_id: int) -> Sequence[asyncpg.Record]:
-    q = "SELECT * FROM autorole_group WHERE guild_id=$1 ORDER BY name"
     async with pool.acquire() as conn:
-        return await conn.fetch(q, guild_id)
+        return await LIST_GROUPS.fetch(conn, guild_id)
 
-async def update_group(pool: asyncpg.Pool, group_id: int, *, multi: Optional[bool] = None, max_value: Optional[int] = None,
-                       linked_message_id: Optional[int] = None, channel_id: Optional[int] = None, broken: Optional[bool] = None,
-                       feedback: Optional[bool] = None,
-                       button_label: Optional[str] = None, button_style: Optional[int] = None):
-    q = """
+UPDATE_GROUP = statements.define("autorole.update_group", """
         UPDATE autorole_group SET
             multi = COALESCE($2, multi),
             max = COALESCE($3, max),
@@ -92,48 +123,164 @@ async def update_group(pool: asyncpg.Pool, group_id: int, *, multi: Optional[boo
             broken = COALESCE($6, broken),
             feedback = COALESCE($7, feedback),
             button_label = COALESCE($8, button_label),
-            button_style = COALESCE($9, button_style)
+            button_style = COALESCE($9, button_style),
+            mode = COALESCE($10, mode)
         WHERE id=$1
         RETURNING *
-    """
+    """)
+
+async def update_group(pool: asyncpg.Pool, group_id: int, *, multi: Optional[bool] = None, max_value: Optional[int] = None,
+                       linked_message_id: Optional[int] = None, channel_id: Optional[int] = None, broken: Optional[bool] = None,
+                       feedback: Optional[bool] = None,
+                       button_label: Optional[str] = None, button_style: Optional[int] = None,
+                       mode: Optional[str] = None):
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, group_id, multi, max_value, linked_message_id, channel_id, broken, feedback, button_label, button_style)
+        return await UPDATE_GROUP.fetchrow(conn, group_id, multi, max_value, linked_message_id, channel_id, broken, feedback, button_label, button_style, mode)
+
+DELETE_GROUP = statements.define("autorole.delete_group", "DELETE FROM autorole_group WHERE guild_id=$1 AND name=$2")
 
 async def delete_group(pool: asyncpg.Pool, guild_id: int, name: str):
-    q = "DELETE FROM autorole_group WHERE guild_id=$1 AND name=$2"
     async with pool.acquire() as conn:
-        await conn.execute(q, guild_id, name)
+        await DELETE_GROUP.execute(conn, guild_id, name)
 
 # Items
+LIST_ITEMS = statements.define("autorole.list_items", "SELECT * FROM autorole_item WHERE group_id=$1 ORDER BY position")
+
 async def list_items(pool: asyncpg.Pool, group_id: int) -> Sequence[asyncpg.Record]:
-    q = "SELECT * FROM autorole_item WHERE group_id=$1 ORDER BY position"
     async with pool.acquire() as conn:
-        return await conn.fetch(q, group_id)
+        return await LIST_ITEMS.fetch(conn, group_id)
+
+NEXT_ITEM_POSITION = statements.define("autorole.next_item_position", "SELECT COALESCE(MAX(position),0)+1 FROM autorole_item WHERE group_id=$1")
+ADD_ITEM = statements.define("autorole.add_item", """
+                INSERT INTO autorole_item(group_id, role_id, emoji, position)
+                VALUES($1,$2,$3,$4)
+                RETURNING *
+            """)
 
 async def add_item(pool: asyncpg.Pool, group_id: int, role_id: int, emoji: Optional[str], position: Optional[int] = None) -> asyncpg.Record:
     async with pool.acquire() as conn:
         async with conn.transaction():
             pos = position
             if pos is None:
-                pos = await conn.fetchval("SELECT COALESCE(MAX(position),0)+1 FROM autorole_item WHERE group_id=$1", group_id) or 1
-            q = """
-                INSERT INTO autorole_item(group_id, role_id, emoji, position)
-                VALUES($1,$2,$3,$4)
-                RETURNING *
-            """
-            return await conn.fetchrow(q, group_id, role_id, emoji, pos)
+                pos = await NEXT_ITEM_POSITION.fetchval(conn, group_id) or 1
+            return await ADD_ITEM.fetchrow(conn, group_id, role_id, emoji, pos)
+
+REMOVE_ITEM_BY_ROLE = statements.define("autorole.remove_item_by_role", "DELETE FROM autorole_item WHERE group_id=$1 AND role_id=$2")
 
 async def remove_item_by_role(pool: asyncpg.Pool, group_id: int, role_id: int):
-    q = "DELETE FROM autorole_item WHERE group_id=$1 AND role_id=$2"
     async with pool.acquire() as conn:
-        await conn.execute(q, group_id, role_id)
+        await REMOVE_ITEM_BY_ROLE.execute(conn, group_id, role_id)
+
+REMOVE_ITEM_BY_EMOJI = statements.define("autorole.remove_item_by_emoji", "DELETE FROM autorole_item WHERE group_id=$1 AND emoji=$2")
 
 async def remove_item_by_emoji(pool: asyncpg.Pool, group_id: int, emoji: str):
-    q = "DELETE FROM autorole_item WHERE group_id=$1 AND emoji=$2"
     async with pool.acquire() as conn:
-        await conn.execute(q, group_id, emoji)
+        await REMOVE_ITEM_BY_EMOJI.execute(conn, group_id, emoji)
+
+GET_GROUP_BY_MESSAGE = statements.define("autorole.get_group_by_message", "SELECT * FROM autorole_group WHERE channel_id=$1 AND linked_message_id=$2")
 
 async def get_group_by_message(pool: asyncpg.Pool, channel_id: int, message_id: int) -> Optional[asyncpg.Record]:
-    q = "SELECT * FROM autorole_group WHERE channel_id=$1 AND linked_message_id=$2"
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, channel_id, message_id)
+        return await GET_GROUP_BY_MESSAGE.fetchrow(conn, channel_id, message_id)
+
+
+FETCH_REACTION_ROWS = statements.define("autorole.fetch_reaction_rows", """
+        SELECT g.id AS group_id, g.guild_id, g.channel_id, g.linked_message_id, g.multi, g.max,
+               i.role_id, i.emoji
+        FROM autorole_group g
+        JOIN autorole_item i ON i.group_id = g.id
+        WHERE g.mode = 'reaction'
+          AND g.linked_message_id IS NOT NULL AND g.channel_id IS NOT NULL
+          AND i.emoji IS NOT NULL
+          AND ($1::INT IS NULL OR g.id = $1)
+        ORDER BY g.id, i.position
+    """)
+
+async def fetch_reaction_rows(pool: asyncpg.Pool, group_id: Optional[int] = None) -> Sequence[asyncpg.Record]:
+    """Lignes (groupe x item) des groupes liés en mode réaction, pour l'index mémoire.
+
+    Sans `group_id`, retourne tous les groupes (construction de l'index au démarrage).
+    """
+    async with pool.acquire() as conn:
+        return await FETCH_REACTION_ROWS.fetch(conn, group_id)
+
+
+# Backfill jobs
+CREATE_BACKFILL_JOB = statements.define("autorole.create_backfill_job", """
+        INSERT INTO autorole_backfill_job(guild_id, group_id, action, role_ids, filter_role_id, only_without_group, total, created_by)
+        VALUES($1,$2,$3,$4,$5,$6,$7,$8)
+        ON CONFLICT (group_id) WHERE status = 'running' DO NOTHING
+        RETURNING *
+    """)
+
+async def create_backfill_job(pool: asyncpg.Pool, guild_id: int, group_id: int, action: str, role_ids: Sequence[int], *,
+                              filter_role_id: Optional[int] = None, only_without_group: bool = False,
+                              total: int = 0, created_by: Optional[int] = None) -> Optional[asyncpg.Record]:
+    """Crée un job `running`. Retourne None si un job est déjà actif pour le groupe."""
+    async with pool.acquire() as conn:
+        return await CREATE_BACKFILL_JOB.fetchrow(conn, guild_id, group_id, action, list(role_ids), filter_role_id, only_without_group, total, created_by)
+
+GET_RUNNING_BACKFILL_JOB = statements.define("autorole.get_running_backfill_job", "SELECT * FROM autorole_backfill_job WHERE group_id=$1 AND status='running'")
+
+async def get_running_backfill_job(pool: asyncpg.Pool, group_id: int) -> Optional[asyncpg.Record]:
+    async with pool.acquire() as conn:
+        return await GET_RUNNING_BACKFILL_JOB.fetchrow(conn, group_id)
+
+LIST_RUNNING_BACKFILL_JOBS = statements.define("autorole.list_running_backfill_jobs", "SELECT * FROM autorole_backfill_job WHERE status='running' ORDER BY id")
+
+async def list_running_backfill_jobs(pool: asyncpg.Pool) -> Sequence[asyncpg.Record]:
+    async with pool.acquire() as conn:
+        return await LIST_RUNNING_BACKFILL_JOBS.fetch(conn)
+
+LIST_BACKFILL_JOBS = statements.define("autorole.list_backfill_jobs", """
+        SELECT j.*, g.name AS group_name
+        FROM autorole_backfill_job j JOIN autorole_group g ON g.id = j.group_id
+        WHERE j.guild_id=$1
+        ORDER BY j.created_at DESC
+        LIMIT $2
+    """)
+
+async def list_backfill_jobs(pool: asyncpg.Pool, guild_id: int, limit: int = 5) -> Sequence[asyncpg.Record]:
+    async with pool.acquire() as conn:
+        return await LIST_BACKFILL_JOBS.fetch(conn, guild_id, limit)
+
+CHECKPOINT_BACKFILL_JOB = statements.define("autorole.checkpoint_backfill_job", """
+        UPDATE autorole_backfill_job SET
+            last_member_id = $2, processed = $3, changed = $4, failed = $5, total = $6, updated_at = NOW()
+        WHERE id=$1
+        RETURNING status
+    """)
+
+async def checkpoint_backfill_job(pool: asyncpg.Pool, job_id: int, last_member_id: int, processed: int, changed: int,
+                                  failed: int, total: int) -> Optional[str]:
+    """Enregistre la progression. Retourne le statut courant (None si le job a disparu)."""
+    async with pool.acquire() as conn:
+        return await CHECKPOINT_BACKFILL_JOB.fetchval(conn, job_id, last_member_id, processed, changed, failed, total)
+
+SET_BACKFILL_STATUS = statements.define("autorole.set_backfill_status", "UPDATE autorole_backfill_job SET status=$2, updated_at = NOW() WHERE id=$1")
+
+async def set_backfill_status(pool: asyncpg.Pool, job_id: int, status: str):
+    async with pool.acquire() as conn:
+        await SET_BACKFILL_STATUS.execute(conn, job_id, status)
+
+
+# Réparation des panneaux
+LIST_PANEL_GROUPS = statements.define("autorole.list_panel_groups", """
+        SELECT * FROM autorole_group
+        WHERE (linked_message_id IS NOT NULL OR broken)
+          AND id > $1
+          AND ($3::BIGINT IS NULL OR guild_id = $3)
+        ORDER BY id
+        LIMIT $2
+    """)
+
+async def list_panel_groups(pool: asyncpg.Pool, after_id: int, limit: int, guild_id: Optional[int] = None) -> Sequence[asyncpg.Record]:
+    """Page (keyset sur id) des groupes liés ou marqués cassés, éventuellement filtrée par serveur."""
+    async with pool.acquire() as conn:
+        return await LIST_PANEL_GROUPS.fetch(conn, after_id, limit, guild_id)
+
+LIST_ITEMS_FOR_GROUPS = statements.define("autorole.list_items_for_groups", "SELECT * FROM autorole_item WHERE group_id = ANY($1::INT[]) ORDER BY group_id, position")
+
+async def list_items_for_groups(pool: asyncpg.Pool, group_ids: Sequence[int]) -> Sequence[asyncpg.Record]:
+    async with pool.acquire() as conn:
+        return await LIST_ITEMS_FOR_GROUPS.fetch(conn, list(group_ids))
@@ -0,0 +1,53 @@
+"""
+Helpers base de données pour la synchronisation conditionnelle des commandes slash (`core.command_sync`).
+
+Schéma :
+- command_sync_state : application_id BIGINT PRIMARY KEY, tree_hash TEXT, commands JSONB
+  (empreinte par commande), synced_at TIMESTAMPTZ
+
+Une ligne par application : le même Postgres peut servir un bot de test et un bot de production.
+"""
+from __future__ import annotations
+
+import json
+from typing import Dict, Optional, Tuple
+
+import asyncpg
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_sync_state (
+    application_id BIGINT PRIMARY KEY,
+    tree_hash TEXT NOT NULL,
+    commands JSONB NOT NULL DEFAULT '{}'::jsonb,
+    synced_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+
+async def ensure_schema(pool: asyncpg.Pool):
+    async with pool.acquire() as conn:
+        await conn.execute(SCHEMA)
+
+
+async def load_state(pool: asyncpg.Pool, application_id: int) -> Optional[Tuple[str, Dict[str, str]]]:
+    """(empreinte de l'arbre, empreintes par commande) du dernier sync réussi, ou None."""
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT tree_hash, commands::text AS commands FROM command_sync_state WHERE application_id=$1",
+            application_id,
+        )
+    if row is None:
+        return None
+    return row["tree_hash"], json.loads(row["commands"])
+
+
+async def save_state(pool: asyncpg.Pool, application_id: int, tree_hash: str, commands: Dict[str, str]):
+    q = """INSERT INTO command_sync_state(application_id, tree_hash, commands, synced_at)
+           VALUES ($1, $2, $3::jsonb, NOW())
+           ON CONFLICT (application_id) DO UPDATE
+           SET tree_hash=EXCLUDED.tree_hash, commands=EXCLUDED.commands, synced_at=NOW()"""
+    async with pool.acquire() as conn:
+        await conn.execute(q, application_id, tree_hash, json.dumps(commands, sort_keys=True))
+
+
+__all__ = ["ensure_schema", "load_state", "save_state"]
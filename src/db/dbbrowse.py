@@ -1,10 +1,65 @@
 """
 Helpers base de données pour la commande `/dbbrowse`.
+
+Pagination par clé (keyset / seek) sur la clé primaire :
+- page suivante : `WHERE (pk) > (dernière clé) ORDER BY pk LIMIT n` ;
+- page précédente : `WHERE (pk) < (première clé) ORDER BY pk DESC LIMIT n` (remise dans l'ordre) ;
+- dernière page : `ORDER BY pk DESC LIMIT n`, sans parcourir les pages intermédiaires.
+Une table sans clé primaire est parcourue sur `ctid` (même principe). Le `ctid` n'est pas unique
+sur le parent d'une table partitionnée : sans clé primaire, seule la première page y est
+affichée (les partitions restent parcourables une à une).
+
+Le total affiché est l'estimation `pg_class.reltuples` ; le comptage exact (`COUNT(*)`) n'est
+exécuté que sur demande (`exact_count`).
+
+Caches (partagés entre toutes les sessions) :
+- liste des tables et métadonnées (colonnes, clé, estimation) : TTL `DBBROWSE_META_TTL` ;
+- pages : LRU borné à `DBBROWSE_CACHE_MB` (taille estimée des lignes), clé
+  (table, version de schéma, taille de page, curseur) ; une page voisine peut être préchargée
+  en arrière-plan (`prefetch_page`). `invalidate_table` purge la table (bouton Refresh).
 """
 from __future__ import annotations
+import asyncio
+import logging
+import sys
+import time
+import zlib
 import asyncpg
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import List, Any
+from typing import Awaitable, Callable, Dict, Hashable, List, Any, Optional, Tuple
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+CTID_KEY = "__ctid"
+
+Key = Tuple[Any, ...]
+Anchor = Tuple[Any, ...]  # ('first',) | ('last',) | ('after', key) | ('before', key)
+
+FIRST: Anchor = ('first',)
+LAST: Anchor = ('last',)
+
+
+@dataclass
+class TableMeta:
+    table: str
+    columns: List[str] = field(default_factory=list)
+    key_columns: List[str] = field(default_factory=list)  # vide -> pagination sur ctid
+    estimate: Optional[int] = None  # None : table jamais analysée
+    partitioned: bool = False  # parent d'une table partitionnée (relkind 'p')
+
+    @property
+    def seekable(self) -> bool:
+        """Pagination par clé possible : clé primaire, ou `ctid` hors parent partitionné."""
+        return bool(self.key_columns) or not self.partitioned
+
+    @property
+    def version(self) -> int:
+        """Empreinte du schéma : une colonne ajoutée/retirée rend les pages en cache inaccessibles."""
+        return zlib.crc32(repr((self.columns, self.key_columns)).encode())
+
 
 @dataclass
 class TablePage:
@@ -13,30 +68,460 @@ class TablePage:
     page_size: int = 10
     columns: List[str] = field(default_factory=list)
     rows: List[List[Any]] = field(default_factory=list)
-    total: int = 0
+    total: Optional[int] = 0  # None : inconnu (table jamais analysée)
+    total_exact: bool = False
+    page_approx: bool = False  # index calculé depuis l'estimation (saut en fin de table)
+    first_key: Optional[Key] = None
+    last_key: Optional[Key] = None
+    has_prev: bool = False
+    has_next: bool = False
+    note: Optional[str] = None
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _TtlCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data: Dict[Hashable, tuple[float, Any]] = {}
 
-async def fetch_tables(pool: asyncpg.Pool) -> list[str]:
+    def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+
+def _page_bytes(page: TablePage) -> int:
+    """Taille approximative d'une page en mémoire (cellules + surcoût des listes)."""
+    total = 256
+    for row in page.rows:
+        total += 64 + 8 * len(row)
+        for v in row:
+            total += sys.getsizeof(v)
+    return total
+
+
+class PageCache:
+    """Cache LRU de pages borné par un budget d'octets, avec chargements dédupliqués."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[TablePage, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._generations: Dict[str, int] = {}
+
+    def get(self, key: Hashable) -> Optional[TablePage]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        self._data.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, page: TablePage):
+        nbytes = _page_bytes(page)
+        if nbytes > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self._data[key] = (page, nbytes)
+        self.size += nbytes
+        while self.size > self.max_bytes and self._data:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.size -= evicted
+
+    def invalidate_table(self, table: str):
+        # Les chargements en vol démarrés avant l'invalidation ne seront pas stockés
+        self._generations[table] = self._generations.get(table, 0) + 1
+        for key in [k for k in self._data if k[0] == table]:
+            _, nbytes = self._data.pop(key)
+            self.size -= nbytes
+
+    def _start(self, key: Hashable, loader: Callable[[], Awaitable[TablePage]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+        generation = self._generations.get(key[0], 0)  # type: ignore[index]
+        task = asyncio.ensure_future(loader())
+        self._inflight[key] = task
+
+        def _done(t: asyncio.Task):
+            self._inflight.pop(key, None)
+            if t.cancelled():
+                return
+            if t.exception() is not None:
+                logger.debug("dbbrowse: chargement %s échoué: %r", key, t.exception())
+                return
+            if self._generations.get(key[0], 0) == generation:  # type: ignore[index]
+                self.put(key, t.result())
+
+        task.add_done_callback(_done)
+        return task
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[TablePage]]) -> TablePage:
+        page = self.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+        self.misses += 1
+        return await asyncio.shield(self._start(key, loader))
+
+    def prefetch(self, key: Hashable, loader: Callable[[], Awaitable[TablePage]]):
+        if key in self._data or key in self._inflight:
+            return
+        self._start(key, loader)
+
+
+_TABLES_CACHE = _TtlCache(config.DBBROWSE_META_TTL)
+_META_CACHE = _TtlCache(config.DBBROWSE_META_TTL)
+PAGE_CACHE = PageCache(config.DBBROWSE_CACHE_MB * 1024 * 1024)
+
+
+async def fetch_tables(pool: asyncpg.Pool, *, refresh: bool = False) -> list[str]:
+    cached = None if refresh else _TABLES_CACHE.get("tables")
+    if cached is not None:
+        return list(cached)
     q = """SELECT table_name FROM information_schema.tables
            WHERE table_schema='public' AND table_type='BASE TABLE'
            ORDER BY table_name"""
     async with pool.acquire() as conn:
         rows = await conn.fetch(q)
-    return [r[0] for r in rows]
+    tables = [r[0] for r in rows]
+    _TABLES_CACHE.put("tables", tables)
+    return list(tables)
+
 
-async def fetch_page(pool: asyncpg.Pool, table: str, page: int, page_size: int) -> TablePage:
+async def fetch_table_meta(pool: asyncpg.Pool, table: str, *, refresh: bool = False) -> TableMeta:
+    """Colonnes, clé primaire et estimation du nombre de lignes (catalogue uniquement, TTL)."""
+    cached = None if refresh else _META_CACHE.get(table)
+    if cached is not None:
+        return cached
+    regclass = f"public.{quote_ident(table)}"
     async with pool.acquire() as conn:
-        count_q = f'SELECT COUNT(*) FROM "{table}"'
-        total = await conn.fetchval(count_q) or 0
-        col_q = """SELECT column_name FROM information_schema.columns
-                  WHERE table_schema='public' AND table_name=$1 ORDER BY ordinal_position"""
-        col_rows = await conn.fetch(col_q, table)
-        columns = [r[0] for r in col_rows]
-        offset = page * page_size
-        data_q = f'SELECT * FROM "{table}" ORDER BY 1 OFFSET $1 LIMIT $2'
-        data_rows = await conn.fetch(data_q, offset, page_size)
-    page_obj = TablePage(table=table, page=page, page_size=page_size, columns=columns, total=total)
+        col_rows = await conn.fetch(
+            """SELECT column_name FROM information_schema.columns
+               WHERE table_schema='public' AND table_name=$1 ORDER BY ordinal_position""",
+            table,
+        )
+        pk_rows = await conn.fetch(
+            """SELECT a.attname
+               FROM pg_index i
+               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+               WHERE i.indrelid = to_regclass($1) AND i.indisprimary
+               ORDER BY array_position(i.indkey::int2[], a.attnum)""",
+            regclass,
+        )
+        rel = await conn.fetchrow(
+            "SELECT reltuples::bigint, relkind FROM pg_class WHERE oid = to_regclass($1)", regclass
+        )
+    reltuples = rel[0] if rel is not None else None
+    estimate = int(reltuples) if reltuples is not None and reltuples >= 0 else None
+    meta = TableMeta(
+        table=table,
+        columns=[r[0] for r in col_rows],
+        key_columns=[r[0] for r in pk_rows],
+        estimate=estimate,
+        partitioned=rel is not None and rel[1] == 'p',
+    )
+    _META_CACHE.put(table, meta)
+    return meta
+
+
+def invalidate_table(table: str):
+    """Purge les pages et métadonnées en cache d'une table."""
+    PAGE_CACHE.invalidate_table(table)
+    _META_CACHE.pop(table)
+
+
+async def exact_count(pool: asyncpg.Pool, table: str) -> int:
+    async with pool.acquire() as conn:
+        return int(await conn.fetchval(f'SELECT COUNT(*) FROM {quote_ident(table)}') or 0)
+
+
+async def copy_table(pool: asyncpg.Pool, table: str, fmt: str, output: Callable[[bytes], Awaitable[None]]) -> str:
+    """`COPY ... TO STDOUT` en flux vers `output` (CSV avec en-tête, ou une ligne JSON par enregistrement)."""
+    ident = quote_ident(table)
+    async with pool.acquire() as conn:
+        if fmt == "jsonl":
+            # QUOTE/DELIMITER sur des octets absents du JSON : les lignes sortent sans échappement CSV
+            return await conn.copy_from_query(
+                f"SELECT row_to_json(t)::text FROM {ident} t",
+                output=output, format="csv", quote="\x01", delimiter="\x02",
+            )
+        return await conn.copy_from_table(table, schema_name="public", output=output, format="csv", header=True)
+
+
+# Fonctions exécutables par PUBLIC qu'une requête libre pourrait détourner (réglages de session dont
+# les timeouts, signaux aux autres sessions, verrous, NOTIFY) : retirées à PUBLIC, rendues au compte
+# du bot. Nécessite d'être superutilisateur ; sinon seul le timeout client de `QueryCursor` s'applique.
+QUERY_REVOKED_FUNCTIONS = (
+    "set_config(text, text, boolean)",
+    "pg_cancel_backend(integer)",
+    "pg_terminate_backend(integer)",
+    "pg_terminate_backend(integer, bigint)",
+    "pg_notify(text, text)",
+    "pg_advisory_lock(bigint)",
+    "pg_advisory_xact_lock(bigint)",
+)
+
+
+async def ensure_query_role(pool: asyncpg.Pool, role: str) -> bool:
+    """Crée / met à jour le rôle de `/dbquery` : sans login ni privilège, `SELECT` sur le schéma
+    public (tables futures comprises). False si le compte du bot ne peut pas le gérer."""
+    ident = quote_ident(role)
+    async with pool.acquire() as conn:
+        try:
+            if not await conn.fetchval("SELECT 1 FROM pg_roles WHERE rolname = $1", role):
+                await conn.execute(
+                    f"CREATE ROLE {ident} NOLOGIN NOSUPERUSER NOCREATEDB NOCREATEROLE NOINHERIT NOBYPASSRLS"
+                )
+            await conn.execute(f"GRANT {ident} TO CURRENT_USER")
+            await conn.execute(f"GRANT USAGE ON SCHEMA public TO {ident}")
+            await conn.execute(f"GRANT SELECT ON ALL TABLES IN SCHEMA public TO {ident}")
+            await conn.execute(f"ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT SELECT ON TABLES TO {ident}")
+        except asyncpg.PostgresError as e:
+            logger.warning("Rôle %s de /dbquery non créé (à créer par un administrateur): %s", role, e)
+            return False
+        try:
+            async with conn.transaction():
+                for signature in QUERY_REVOKED_FUNCTIONS:
+                    fn = await conn.fetchval("SELECT to_regprocedure($1)::text", signature)
+                    if fn is None:  # absente de cette version de Postgres
+                        continue
+                    await conn.execute(f"REVOKE EXECUTE ON FUNCTION {fn} FROM PUBLIC")
+                    await conn.execute(f"GRANT EXECUTE ON FUNCTION {fn} TO CURRENT_USER")
+        except asyncpg.PostgresError as e:
+            logger.warning("Fonctions d'administration non révoquées pour /dbquery (superutilisateur requis): %s", e)
+    logger.info("Rôle /dbquery vérifié (%s)", role)
+    return True
+
+
+class QueryCursor:
+    """Requête libre en lecture seule, lue page par page via un curseur serveur.
+
+    La connexion reste réservée (transaction `READ ONLY`) tant que le curseur est ouvert ; la
+    requête s'exécute sous le rôle `role` (`SET LOCAL ROLE`, voir `ensure_query_role`).
+    `statement_timeout` borne chaque exécution, `idle_in_transaction_session_timeout` libère
+    la session côté serveur si le bot ne ferme jamais le curseur. La requête pouvant modifier ces
+    réglages (`set_config`), chaque appel a aussi un timeout côté client (annulation de la requête). Le curseur est `SCROLL` :
+    revenir en arrière repositionne le curseur (`MOVE ABSOLUTE`), seule la page affichée
+    est matérialisée côté bot. DECLARE n'accepte que SELECT / VALUES / TABLE / WITH … SELECT.
+    """
+
+    CURSOR_NAME = "dbquery_cursor"
+
+    def __init__(self, pool: asyncpg.Pool, query: str, page_size: int, *, timeout_ms: int, idle_timeout_ms: int,
+                 role: str):
+        self.pool = pool
+        self.role = role
+        self.query = query.strip().rstrip(";")
+        self.page_size = page_size
+        self.timeout_ms = int(timeout_ms)
+        self.idle_timeout_ms = int(idle_timeout_ms)
+        # Timeout client : un peu au-delà de statement_timeout, qui reste le garde-fou nominal
+        self.client_timeout = self.timeout_ms / 1000 + 1.0
+        self.columns: List[str] = []
+        self.last_ms: float = 0.0
+        self._conn: Optional[asyncpg.Connection] = None
+        self._tr = None
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        conn = await self.pool.acquire()
+        try:
+            self._tr = conn.transaction(readonly=True)
+            await self._tr.start()
+            timeout = self.client_timeout
+            await conn.execute(f"SET LOCAL statement_timeout = {self.timeout_ms}", timeout=timeout)
+            await conn.execute(f"SET LOCAL idle_in_transaction_session_timeout = {self.idle_timeout_ms}", timeout=timeout)
+            await conn.execute(f"SET LOCAL ROLE {quote_ident(self.role)}", timeout=timeout)
+            # Préparation d'abord : une chaîne contenant plusieurs instructions est refusée ici
+            stmt = await conn.prepare(self.query, timeout=timeout)
+            self.columns = [a.name for a in stmt.get_attributes()]
+            await conn.execute(f"DECLARE {self.CURSOR_NAME} SCROLL CURSOR FOR {self.query}", timeout=timeout)
+        except BaseException:
+            await self.pool.release(conn, timeout=5)
+            raise
+        self._conn = conn
+
+    async def fetch(self, page: int) -> TablePage:
+        if self._conn is None:
+            raise RuntimeError("Curseur fermé")
+        async with self._lock:
+            started = time.perf_counter()
+            await self._conn.execute(f"MOVE ABSOLUTE {page * self.page_size} IN {self.CURSOR_NAME}",
+                                     timeout=self.client_timeout)
+            rows = await self._conn.fetch(f"FETCH FORWARD {self.page_size + 1} FROM {self.CURSOR_NAME}",
+                                          timeout=self.client_timeout)
+            self.last_ms = (time.perf_counter() - started) * 1000
+        more = len(rows) > self.page_size
+        page_obj = TablePage(
+            table="requête", page=page, page_size=self.page_size, columns=list(self.columns),
+            total=None, has_prev=page > 0, has_next=more,
+        )
+        page_obj.rows = [list(r.values()) for r in rows[:self.page_size]]
+        if not more:
+            page_obj.total = page * self.page_size + len(page_obj.rows)
+            page_obj.total_exact = True
+        return page_obj
+
+    async def explain(self) -> str:
+        if self._conn is None:
+            raise RuntimeError("Curseur fermé")
+        async with self._lock:
+            rows = await self._conn.fetch(f"EXPLAIN {self.query}", timeout=self.client_timeout)
+        return "\n".join(r[0] for r in rows)
+
+    async def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            await self._tr.rollback()
+        except Exception:  # noqa: BLE001
+            pass
+        finally:
+            await self.pool.release(conn, timeout=5)
+
+
+def _key_sql(meta: TableMeta) -> tuple[List[str], List[str]]:
+    """Expressions de tri et noms des colonnes formant la clé de chaque ligne."""
+    if not meta.key_columns:
+        return ["ctid"], [CTID_KEY]
+    return [quote_ident(c) for c in meta.key_columns], list(meta.key_columns)
+
+
+async def fetch_page(
+    pool: asyncpg.Pool,
+    meta: TableMeta,
+    page_size: int,
+    *,
+    after: Optional[Key] = None,
+    before: Optional[Key] = None,
+    last: bool = False,
+    page: int = 0,
+) -> TablePage:
+    """Charge une page par clé : première page par défaut, sinon `after`, `before` ou `last`."""
+    table = quote_ident(meta.table)
+    if not meta.seekable:
+        return await _fetch_first_only(pool, meta, page_size)
+    order, key_names = _key_sql(meta)
+    ctid = not meta.key_columns
+    select = f"SELECT *, ctid::text AS {CTID_KEY} FROM {table}" if ctid else f"SELECT * FROM {table}"
+    cols = "ctid" if ctid else "(" + ", ".join(order) + ")"
+    n = len(key_names)
+    if after is not None or before is not None:
+        key = after if after is not None else before
+        op = ">" if after is not None else "<"
+        if ctid:
+            # Clé lue en `ctid::text` : pas de codec direct texte -> tid côté asyncpg
+            placeholders = "$1::text::tid"
+        else:
+            placeholders = "(" + ", ".join(f"${i + 1}" for i in range(n)) + ")"
+        where = f" WHERE {cols} {op} {placeholders}"
+        args: list[Any] = list(key)  # type: ignore[arg-type]
+    else:
+        where = ""
+        args = []
+    backwards = before is not None or last
+    direction = " DESC" if backwards else ""
+    order_by = ", ".join(f"{c}{direction}" for c in order)
+    q = f"{select}{where} ORDER BY {order_by} LIMIT ${len(args) + 1}"
+    async with pool.acquire() as conn:
+        data_rows = await conn.fetch(q, *args, page_size + 1)
+
+    more = len(data_rows) > page_size
+    data_rows = list(data_rows[:page_size])
+    if backwards:
+        data_rows.reverse()
+    page_obj = TablePage(
+        table=meta.table,
+        page=page,
+        page_size=page_size,
+        columns=list(meta.columns),
+        total=meta.estimate,
+    )
+    if backwards:
+        page_obj.has_prev = more
+        page_obj.has_next = not last
+    else:
+        page_obj.has_next = more
+        page_obj.has_prev = after is not None
     for r in data_rows:
-        page_obj.rows.append([r[c] for c in columns])
+        page_obj.rows.append([r[c] for c in meta.columns])
+    if data_rows:
+        page_obj.first_key = tuple(data_rows[0][c] for c in key_names)
+        page_obj.last_key = tuple(data_rows[-1][c] for c in key_names)
     return page_obj
 
-__all__ = ["fetch_tables", "fetch_page", "TablePage"]
+
+async def _fetch_first_only(pool: asyncpg.Pool, meta: TableMeta, page_size: int) -> TablePage:
+    """Parent partitionné sans clé primaire : aucune clé de parcours fiable, première page seule."""
+    async with pool.acquire() as conn:
+        data_rows = await conn.fetch(f"SELECT * FROM {quote_ident(meta.table)} LIMIT $1", page_size)
+    return TablePage(
+        table=meta.table,
+        page_size=page_size,
+        columns=list(meta.columns),
+        rows=[[r[c] for c in meta.columns] for r in data_rows],
+        total=meta.estimate,
+        note="Table partitionnée sans clé primaire : parcourir ses partitions",
+    )
+
+
+def _cache_key(meta: TableMeta, page_size: int, anchor: Anchor) -> Optional[Hashable]:
+    key = (meta.table, meta.version, page_size, anchor)
+    try:
+        hash(key)
+    except TypeError:  # curseur contenant un tableau Postgres : pas de mise en cache
+        return None
+    return key
+
+
+def _loader(pool: asyncpg.Pool, meta: TableMeta, page_size: int, anchor: Anchor):
+    kind = anchor[0]
+
+    def load():
+        return fetch_page(
+            pool, meta, page_size,
+            after=anchor[1] if kind == 'after' else None,
+            before=anchor[1] if kind == 'before' else None,
+            last=kind == 'last',
+        )
+    return load
+
+
+async def cached_page(pool: asyncpg.Pool, meta: TableMeta, page_size: int, anchor: Anchor) -> TablePage:
+    """Page partagée via `PAGE_CACHE` (ne pas la modifier : la copier avant d'ajuster l'affichage)."""
+    key = _cache_key(meta, page_size, anchor)
+    load = _loader(pool, meta, page_size, anchor)
+    if key is None:
+        return await load()
+    return await PAGE_CACHE.get_or_load(key, load)
+
+
+def prefetch_page(pool: asyncpg.Pool, meta: TableMeta, page_size: int, anchor: Anchor):
+    """Précharge une page en arrière-plan (sans effet si déjà en cache ou en cours)."""
+    key = _cache_key(meta, page_size, anchor)
+    if key is not None:
+        PAGE_CACHE.prefetch(key, _loader(pool, meta, page_size, anchor))
+
+__all__ = [
+    "fetch_tables", "fetch_table_meta", "fetch_page", "exact_count", "quote_ident", "TablePage", "TableMeta",
+    "Anchor", "FIRST", "LAST", "copy_table", "QueryCursor", "ensure_query_role", "PageCache", "PAGE_CACHE", "cached_page", "prefetch_page", "invalidate_table",
+]
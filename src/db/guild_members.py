@@ -0,0 +1,186 @@
+"""
+Appartenance des utilisateurs aux serveurs (arrivées / départs).
+
+Schéma :
+- guild_member : (guild_id, user_id) PRIMARY KEY, joined_at TIMESTAMPTZ NULL, left_at TIMESTAMPTZ NULL
+  (left_at NULL = membre actuel). La clé primaire sert les requêtes par serveur ;
+  `idx_guild_member_user` sert les requêtes par utilisateur.
+
+Écritures :
+- `MemberEventSink` : événements join/leave de la gateway, regroupés (le dernier événement
+  par couple serveur/utilisateur gagne) et écrits par `executemany` dans une transaction ;
+- réconciliation `/sync_users` (par lots, voir `db.sync_users.MemberSyncWriter`) : `upsert_present`
+  pour chaque lot de membres présents, puis `mark_absent_left` marque partis, en une seule
+  instruction (anti-jointure sur la table temporaire des présents), ceux qui n'ont pas été vus
+  et qui ont rejoint le serveur avant le début de la synchronisation.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_member (
+    guild_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    joined_at TIMESTAMPTZ NULL,
+    left_at TIMESTAMPTZ NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_guild_member_user ON guild_member(user_id);
+"""
+
+JOIN_SQL = """
+INSERT INTO guild_member(guild_id, user_id, joined_at, left_at)
+VALUES($1, $2, $3, NULL)
+ON CONFLICT (guild_id, user_id) DO UPDATE SET joined_at = COALESCE(EXCLUDED.joined_at, guild_member.joined_at), left_at = NULL
+"""
+
+LEAVE_SQL = """
+INSERT INTO guild_member(guild_id, user_id, joined_at, left_at)
+VALUES($1, $2, NULL, $3)
+ON CONFLICT (guild_id, user_id) DO UPDATE SET left_at = EXCLUDED.left_at
+WHERE guild_member.left_at IS NULL
+"""
+
+# Les lignes inchangées ne sont pas réécrites (pas de tuple mort à chaque synchronisation)
+PRESENT_UPSERT_SQL = """
+INSERT INTO guild_member(guild_id, user_id, joined_at, left_at)
+SELECT $1, m.user_id, m.joined_at, NULL
+FROM unnest($2::bigint[], $3::timestamptz[]) AS m(user_id, joined_at)
+ON CONFLICT (guild_id, user_id) DO UPDATE
+SET joined_at = COALESCE(EXCLUDED.joined_at, guild_member.joined_at), left_at = NULL
+WHERE guild_member.left_at IS NOT NULL
+   OR guild_member.joined_at IS DISTINCT FROM COALESCE(EXCLUDED.joined_at, guild_member.joined_at)
+"""
+
+# {present} : table (temporaire) des user_id vus pendant la synchronisation ; $2 : début de la
+# synchronisation (un membre arrivé après peut manquer à la liste déjà collectée)
+ABSENT_LEFT_SQL = """
+UPDATE guild_member gm SET left_at = NOW()
+WHERE gm.guild_id = $1 AND gm.left_at IS NULL
+  AND (gm.joined_at IS NULL OR gm.joined_at < $2)
+  AND NOT EXISTS (SELECT 1 FROM {present} p WHERE p.user_id = gm.user_id)
+"""
+
+MemberKey = Tuple[int, int]
+
+
+async def ensure_schema(pool: asyncpg.Pool):
+    async with pool.acquire() as conn:
+        await conn.execute(SCHEMA)
+
+
+async def upsert_present(
+    conn: asyncpg.Connection, guild_id: int, members: Sequence[Tuple[int, Optional[datetime]]]
+) -> int:
+    """Marque présents (et non partis) un lot de membres. Retourne le nombre de lignes modifiées."""
+    status = await conn.execute(
+        PRESENT_UPSERT_SQL, guild_id, [m[0] for m in members], [m[1] for m in members]
+    )
+    return _rowcount(status)
+
+
+async def mark_absent_left(conn: asyncpg.Connection, guild_id: int, present_table: str, started_at: datetime) -> int:
+    """Marque partis les membres actuels absents de `present_table` et arrivés avant `started_at`.
+    Retourne le nombre de départs."""
+    return _rowcount(await conn.execute(ABSENT_LEFT_SQL.format(present=present_table), guild_id, started_at))
+
+
+def _rowcount(status: str) -> int:
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (ValueError, AttributeError):
+        return 0
+
+
+class MemberEventSink:
+    """
+    Regroupe les arrivées/départs émis par `events.members`.
+
+    `joined` / `left` sont synchrones et ne prennent aucune connexion ; le flush a lieu toutes
+    les `interval` secondes ou dès `max_batch` événements en attente. En cas d'échec, les
+    événements sont remis en file sans écraser des événements plus récents.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, *, max_batch: int = 500, interval: float = 1.0):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.interval = interval
+        # (guild_id, user_id) -> ("join" | "leave", horodatage)
+        self._pending: Dict[MemberKey, Tuple[str, Optional[datetime]]] = {}
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="guild-member-sink")
+
+    def joined(self, guild_id: int, user_id: int, joined_at: Optional[datetime] = None):
+        self._submit((guild_id, user_id), "join", joined_at or datetime.now(timezone.utc))
+
+    def left(self, guild_id: int, user_id: int, left_at: Optional[datetime] = None):
+        self._submit((guild_id, user_id), "leave", left_at or datetime.now(timezone.utc))
+
+    def _submit(self, key: MemberKey, kind: str, at: Optional[datetime]):
+        self._pending.pop(key, None)  # réinsertion : l'ordre d'arrivée reste chronologique
+        self._pending[key] = (kind, at)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec flush événements membres")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            events, self._pending = self._pending, {}
+            joins = [(g, u, at) for (g, u), (kind, at) in events.items() if kind == "join"]
+            leaves = [(g, u, at) for (g, u), (kind, at) in events.items() if kind == "leave"]
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        if joins:
+                            await conn.executemany(JOIN_SQL, joins)
+                        if leaves:
+                            await conn.executemany(LEAVE_SQL, leaves)
+            except Exception:
+                for key, event in events.items():
+                    self._pending.setdefault(key, event)
+                raise
+            logger.debug("Evénements membres groupés: %s arrivées, %s départs", len(joins), len(leaves))
+            return len(events)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+__all__ = ["ensure_schema", "upsert_present", "mark_absent_left", "MemberEventSink"]
@@ -2,21 +2,181 @@
 Helpers base de données pour la commande `/list_users`.
 
 Fonctions principales :
-- count_users(pool) -> int
-- fetch_users_page(pool, offset, limit)
+- count_users(pool, search=None, guild_id=None) -> (total, exact) : total mis en cache, estimé sur les grosses tables
+- fetch_users_page(pool, limit, after=..., before=..., last=..., search=..., guild_id=...) : pagination par clé
+
+Pagination par clé (keyset) sur `(updated_at, id)` décroissant, servie par l'index
+`idx_discord_user_updated_id` : le coût d'une page ne dépend pas de sa profondeur et les lignes
+ne se décalent pas pendant une synchronisation. La recherche par nom (`ILIKE`) s'appuie sur les
+index trigram `pg_trgm` créés par `core.db.ensure_schema` quand l'extension est disponible.
+`guild_id` restreint aux membres actuels d'un serveur (`guild_member`, clé primaire (guild_id, user_id)).
+
+Chaque combinaison (recherche, serveur, sens de pagination) est une requête nommée `list_users.*`
+(`core.statements`) déclarée au chargement : le SQL ne varie que par ces options, jamais par les valeurs.
 """
 from __future__ import annotations
 
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from core import statements
+
+UserKey = Tuple[datetime, int]
+
+# Sous ce volume estimé, un COUNT(*) exact reste bon marché
+EXACT_COUNT_THRESHOLD = 50_000
+COUNT_TTL = 60.0
+# Une entrée par (recherche, serveur) : LRU borné, les entrées expirées sont purgées à l'écriture
+COUNT_CACHE_MAX = 512
+
+_COUNT_CACHE: "OrderedDict[Tuple[Optional[str], Optional[int]], Tuple[float, int, bool]]" = OrderedDict()
+
+_GUILD_FILTER = (
+    "EXISTS (SELECT 1 FROM guild_member gm WHERE gm.guild_id = ${n} "
+    "AND gm.user_id = discord_user.id AND gm.left_at IS NULL)"
+)
+
+_COLUMNS = "id, display_name, username, updated_at"
+
+
+COUNT_SEARCH = statements.define(
+    "list_users.count_search",
+    "SELECT COUNT(*) FROM discord_user WHERE (display_name ILIKE $1 OR username ILIKE $1)",
+)
+COUNT_SEARCH_GUILD = statements.define(
+    "list_users.count_search_guild",
+    "SELECT COUNT(*) FROM discord_user WHERE (display_name ILIKE $1 OR username ILIKE $1) AND " + _GUILD_FILTER.format(n=2),
+)
+COUNT_GUILD = statements.define(
+    "list_users.count_guild", "SELECT COUNT(*) FROM guild_member WHERE guild_id = $1 AND left_at IS NULL"
+)
+ESTIMATE_USERS = statements.define(
+    "list_users.estimate", "SELECT reltuples::bigint FROM pg_class WHERE oid = 'discord_user'::regclass"
+)
+COUNT_ALL = statements.define("list_users.count_all", "SELECT COUNT(*) FROM discord_user")
+
+# Sens de pagination : "first" (plus récents), "last", "after" (page suivante), "before" (précédente)
+_PAGE_MODES = ("first", "last", "after", "before")
+
+
+def _page_sql(search: bool, guild: bool, mode: str) -> str:
+    n = 0
+    where = []
+    if search:
+        n += 1
+        where.append(f"(display_name ILIKE ${n} OR username ILIKE ${n})")
+    if guild:
+        n += 1
+        where.append(_GUILD_FILTER.format(n=n))
+    if mode in ("after", "before"):
+        n += 2
+        where.append(f"(updated_at, id) {'<' if mode == 'after' else '>'} (${n - 1}, ${n})")
+    order = "updated_at ASC, id ASC" if mode in ("last", "before") else "updated_at DESC, id DESC"
+    q = f"SELECT {_COLUMNS} FROM discord_user"
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    return q + f" ORDER BY {order} LIMIT ${n + 1}"
 
-async def count_users(pool) -> int:
+
+def _page_name(search: bool, guild: bool, mode: str) -> str:
+    return "list_users.page" + (".search" if search else "") + (".guild" if guild else "") + "." + mode
+
+
+# Seule la première page sans filtre est préparée à l'ouverture des connexions, les autres au premier usage
+PAGE_STATEMENTS = {
+    (search, guild, mode): statements.define(
+        _page_name(search, guild, mode), _page_sql(search, guild, mode),
+        eager=not search and not guild and mode == "first",
+    )
+    for search in (False, True) for guild in (False, True) for mode in _PAGE_MODES
+}
+
+
+def _like_pattern(search: str) -> str:
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _store_count(key: Tuple[Optional[str], Optional[int]], total: int, exact: bool):
+    now = time.monotonic()
+    for stale in [k for k, v in _COUNT_CACHE.items() if v[0] <= now]:
+        del _COUNT_CACHE[stale]
+    _COUNT_CACHE[key] = (now + COUNT_TTL, total, exact)
+    _COUNT_CACHE.move_to_end(key)
+    while len(_COUNT_CACHE) > COUNT_CACHE_MAX:
+        _COUNT_CACHE.popitem(last=False)
+
+
+async def count_users(pool, search: Optional[str] = None, guild_id: Optional[int] = None) -> Tuple[int, bool]:
+    """Total (et s'il est exact), en cache `COUNT_TTL` secondes par recherche et serveur."""
+    key = (search.lower() if search else None, guild_id)
+    cached = _COUNT_CACHE.get(key)
+    if cached and cached[0] > time.monotonic():
+        _COUNT_CACHE.move_to_end(key)
+        return cached[1], cached[2]
     async with pool.acquire() as conn:  # type: ignore
-        return await conn.fetchval("SELECT COUNT(*) FROM discord_user") or 0
+        if search:
+            if guild_id is not None:
+                total = await COUNT_SEARCH_GUILD.fetchval(conn, _like_pattern(search), guild_id)
+            else:
+                total = await COUNT_SEARCH.fetchval(conn, _like_pattern(search))
+            exact = True
+        elif guild_id is not None:
+            total = await COUNT_GUILD.fetchval(conn, guild_id)
+            exact = True
+        else:
+            estimate = await ESTIMATE_USERS.fetchval(conn)
+            if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+                total, exact = estimate, False
+            else:
+                total, exact = await COUNT_ALL.fetchval(conn), True
+    _store_count(key, int(total or 0), exact)
+    return int(total or 0), exact
 
 
-async def fetch_users_page(pool, offset: int, limit: int):
-    q = "SELECT id, display_name, username, updated_at FROM discord_user ORDER BY updated_at DESC OFFSET $1 LIMIT $2"
+async def fetch_users_page(
+    pool,
+    limit: int,
+    *,
+    after: Optional[UserKey] = None,
+    before: Optional[UserKey] = None,
+    last: bool = False,
+    search: Optional[str] = None,
+    guild_id: Optional[int] = None,
+):
+    """Page triée du plus récent au plus ancien.
+
+    `after` : clé de la dernière ligne affichée (page suivante) ; `before` : clé de la première
+    (page précédente) ; `last` : dernière page. Retourne jusqu'à `limit + 1` lignes dans l'ordre
+    d'affichage : la ligne en trop (en fin pour `after`/première page, en tête sinon) signale une page voisine.
+    """
+    args: list = []
+    if search:
+        args.append(_like_pattern(search))
+    if guild_id is not None:
+        args.append(guild_id)
+    if after is not None:
+        args.extend(after)
+        mode = "after"
+    elif before is not None:
+        args.extend(before)
+        mode = "before"
+    else:
+        mode = "last" if last else "first"
+    backwards = mode in ("last", "before")
+    args.append(limit + 1)
+    stmt = PAGE_STATEMENTS[(bool(search), guild_id is not None, mode)]
     async with pool.acquire() as conn:  # type: ignore
-        return await conn.fetch(q, offset, limit)
+        rows = await stmt.fetch(conn, *args)
+    if backwards:
+        rows = list(reversed(rows))
+    return rows
+
+
+def row_key(row) -> UserKey:
+    return row['updated_at'], row['id']
 
 
-__all__ = ["count_users", "fetch_users_page"]
\ No newline at end of file
+__all__ = ["count_users", "fetch_users_page", "row_key"]
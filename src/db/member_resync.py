@@ -0,0 +1,73 @@
+"""
+Helpers base de données pour la resynchronisation périodique des membres (`core.member_resync`).
+
+Schéma :
+- member_resync_stats : guild_id BIGINT PRIMARY KEY, snapshot_hash TEXT, members INT,
+  rows_changed INT, duration_ms INT, skipped BOOLEAN, last_run_at TIMESTAMPTZ
+  (dernier passage par serveur : sert à dimensionner l'intervalle de resynchronisation).
+
+Les empreintes de noms sont calculées côté Postgres (`md5(display_name || chr(31) || username)`),
+identiques à `name_hash` côté bot : seules des empreintes transitent pour la comparaison.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Optional, Sequence
+
+import asyncpg
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS member_resync_stats (
+    guild_id BIGINT PRIMARY KEY,
+    snapshot_hash TEXT NULL,
+    members INT NOT NULL DEFAULT 0,
+    rows_changed INT NOT NULL DEFAULT 0,
+    duration_ms INT NOT NULL DEFAULT 0,
+    skipped BOOLEAN NOT NULL DEFAULT FALSE,
+    last_run_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+
+def name_hash(display_name: str, username: str) -> str:
+    return hashlib.md5(f"{display_name}\x1f{username}".encode("utf-8")).hexdigest()
+
+
+async def ensure_schema(pool: asyncpg.Pool):
+    async with pool.acquire() as conn:
+        await conn.execute(SCHEMA)
+
+
+async def get_snapshot_hash(pool: asyncpg.Pool, guild_id: int) -> Optional[str]:
+    async with pool.acquire() as conn:
+        return await conn.fetchval("SELECT snapshot_hash FROM member_resync_stats WHERE guild_id=$1", guild_id)
+
+
+async def fetch_name_hashes(pool: asyncpg.Pool, user_ids: Sequence[int]) -> Dict[int, str]:
+    q = """SELECT id, md5(display_name || chr(31) || username) AS h
+           FROM discord_user WHERE id = ANY($1::bigint[])"""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(q, list(user_ids))
+    return {int(r["id"]): r["h"] for r in rows}
+
+
+async def record_run(pool: asyncpg.Pool, guild_id: int, *, snapshot_hash: Optional[str], members: int,
+                     rows_changed: int, duration_ms: int, skipped: bool):
+    q = """
+    INSERT INTO member_resync_stats(guild_id, snapshot_hash, members, rows_changed, duration_ms, skipped, last_run_at)
+    VALUES($1, $2, $3, $4, $5, $6, NOW())
+    ON CONFLICT (guild_id) DO UPDATE SET snapshot_hash = EXCLUDED.snapshot_hash, members = EXCLUDED.members,
+        rows_changed = EXCLUDED.rows_changed, duration_ms = EXCLUDED.duration_ms,
+        skipped = EXCLUDED.skipped, last_run_at = NOW()
+    """
+    async with pool.acquire() as conn:
+        await conn.execute(q, guild_id, snapshot_hash, members, rows_changed, duration_ms, skipped)
+
+
+async def list_last_runs(pool: asyncpg.Pool):
+    """Derniers passages, du plus ancien au plus récent (ordre de priorité du planificateur)."""
+    async with pool.acquire() as conn:
+        return await conn.fetch("SELECT guild_id, last_run_at FROM member_resync_stats ORDER BY last_run_at")
+
+
+__all__ = ["ensure_schema", "name_hash", "get_snapshot_hash", "fetch_name_hashes", "record_run", "list_last_runs"]
@@ -0,0 +1,215 @@
+"""
+Historique append-only des changements de nom (username / display_name).
+
+Schéma :
+- discord_user_name_history : user_id, guild_id (NULL pour un username global), kind
+  ('username' | 'display_name'), old_value, new_value, changed_at ;
+  partitionnée par mois sur `changed_at` (partitions `discord_user_name_history_AAAAMM`),
+  index (user_id, changed_at DESC) hérité par chaque partition.
+
+Écritures : `NameHistoryBuffer` accumule les changements en mémoire et les écrit par un seul
+`copy_records_to_table` par flush (un rejeu gateway qui renomme des milliers de membres coûte
+un COPY, pas un INSERT par membre). Les partitions des mois présents dans le lot sont créées
+au besoin avant le COPY.
+
+Rétention : `drop_old_partitions` supprime les partitions entièrement plus anciennes que la
+fenêtre conservée (DROP TABLE d'une partition : coût constant, pas de DELETE ligne à ligne).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+TABLE = "discord_user_name_history"
+COLUMNS = ("user_id", "guild_id", "kind", "old_value", "new_value", "changed_at")
+_PARTITION_RE = re.compile(rf"^{TABLE}_(\d{{4}})(\d{{2}})$")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    user_id BIGINT NOT NULL,
+    guild_id BIGINT NULL,
+    kind TEXT NOT NULL,
+    old_value TEXT NULL,
+    new_value TEXT NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+) PARTITION BY RANGE (changed_at);
+CREATE INDEX IF NOT EXISTS idx_name_history_user ON {TABLE}(user_id, changed_at DESC);
+"""
+
+HistoryRow = Tuple[int, Optional[int], str, Optional[str], str, datetime]
+
+# Partitions dont l'existence est déjà vérifiée dans ce processus
+_KNOWN_PARTITIONS: Set[Tuple[int, int]] = set()
+
+
+def _month_start(year: int, month: int) -> date:
+    return date(year, month, 1)
+
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{TABLE}_{year:04d}{month:02d}"
+
+
+async def ensure_schema(pool: asyncpg.Pool):
+    async with pool.acquire() as conn:
+        await conn.execute(SCHEMA)
+    now = datetime.now(timezone.utc)
+    await ensure_partitions(pool, [(now.year, now.month), _next_month(now.year, now.month)])
+
+
+async def ensure_partitions(pool_or_conn, months):
+    """Crée les partitions mensuelles manquantes (idempotent)."""
+    missing = [m for m in set(months) if m not in _KNOWN_PARTITIONS]
+    if not missing:
+        return
+    statements = []
+    for year, month in sorted(missing):
+        ny, nm = _next_month(year, month)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(year, month)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{_month_start(year, month).isoformat()} 00:00+00') "
+            f"TO ('{_month_start(ny, nm).isoformat()} 00:00+00');"
+        )
+    if isinstance(pool_or_conn, asyncpg.Pool):
+        async with pool_or_conn.acquire() as conn:
+            await conn.execute("\n".join(statements))
+    else:
+        await pool_or_conn.execute("\n".join(statements))
+    _KNOWN_PARTITIONS.update(missing)
+
+
+async def drop_old_partitions(pool: asyncpg.Pool, keep_months: int) -> List[str]:
+    """Supprime les partitions dont le mois précède les `keep_months` derniers mois (mois courant inclus)."""
+    if keep_months <= 0:
+        return []
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + (now.month - 1) - (keep_months - 1)
+    cutoff = (index // 12, index % 12 + 1)
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """SELECT c.relname FROM pg_inherits i
+               JOIN pg_class c ON c.oid = i.inhrelid
+               WHERE i.inhparent = $1::regclass""",
+            TABLE,
+        )
+        dropped = []
+        for r in rows:
+            m = _PARTITION_RE.match(r["relname"])
+            if not m:
+                continue
+            month = (int(m.group(1)), int(m.group(2)))
+            if month < cutoff:
+                await conn.execute(f"DROP TABLE IF EXISTS {r['relname']}")
+                _KNOWN_PARTITIONS.discard(month)
+                dropped.append(r["relname"])
+    return dropped
+
+
+async def fetch_history(pool: asyncpg.Pool, user_id: int, guild_id: Optional[int] = None, limit: int = 25):
+    """Derniers changements : usernames globaux et pseudos du serveur `guild_id` uniquement."""
+    q = f"""SELECT guild_id, kind, old_value, new_value, changed_at FROM {TABLE}
+            WHERE user_id = $1 AND (guild_id IS NULL OR guild_id = $2)
+            ORDER BY changed_at DESC LIMIT $3"""
+    async with pool.acquire() as conn:
+        return await conn.fetch(q, user_id, guild_id, limit)
+
+
+class NameHistoryBuffer:
+    """
+    Tampon des changements de nom, vidé par `copy_records_to_table`.
+
+    `record` est synchrone et ne prend aucune connexion ; le flush a lieu toutes les `interval`
+    secondes ou dès `max_batch` lignes. En cas d'échec, le lot est remis en tête de file
+    (l'historique est append-only : rien n'est dédupliqué).
+    """
+
+    def __init__(self, pool: asyncpg.Pool, *, max_batch: int = 1000, interval: float = 2.0):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.interval = interval
+        self._pending: List[HistoryRow] = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="name-history-buffer")
+
+    def record(self, user_id: int, kind: str, old_value: Optional[str], new_value: str, *,
+               guild_id: Optional[int] = None, at: Optional[datetime] = None):
+        self._pending.append((user_id, guild_id, kind, old_value, new_value, at or datetime.now(timezone.utc)))
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Echec flush historique des noms")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            try:
+                async with self.pool.acquire() as conn:
+                    await ensure_partitions(conn, {(r[5].year, r[5].month) for r in rows})
+                    await conn.copy_records_to_table(TABLE, records=rows, columns=COLUMNS)
+            except Exception:
+                self._pending[:0] = rows
+                raise
+            logger.debug("Historique des noms: %s lignes copiées", len(rows))
+            return len(rows)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+async def run_retention(pool: asyncpg.Pool, keep_months: int, interval: float):
+    """Boucle de maintenance : partitions du mois suivant créées à l'avance, anciennes supprimées."""
+    while True:
+        try:
+            now = datetime.now(timezone.utc)
+            await ensure_partitions(pool, [(now.year, now.month), _next_month(now.year, now.month)])
+            dropped = await drop_old_partitions(pool, keep_months)
+            if dropped:
+                logger.info("Historique des noms: partitions supprimées %s", ", ".join(dropped))
+        except Exception:  # noqa: BLE001
+            logger.exception("Echec maintenance historique des noms")
+        await asyncio.sleep(interval)
+
+
+__all__ = [
+    "ensure_schema", "ensure_partitions", "drop_old_partitions", "fetch_history",
+    "NameHistoryBuffer", "run_retention", "partition_name",
+]
@@ -1,12 +1,79 @@
 """
 Helpers base de données pour la commande `/sync_users`.
+
+`MemberSyncWriter` garde une connexion dédiée pendant une synchronisation et écrit les
+membres lot par lot : upsert `discord_user` (executemany), upsert `guild_member` des présents,
+et copie des IDs vus dans une table temporaire. `finish` marque partis, en une instruction,
+les membres actuels absents de cette table, hormis ceux arrivés depuis le début de la
+synchronisation (`started_at`). La mémoire côté bot ne dépend que de la taille
+d'un lot, pas de celle du serveur.
 """
 from __future__ import annotations
-from typing import Iterable, Tuple
+
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Sequence, Tuple
+
+from core import db as core_db
+from db import guild_members as guild_members_db
+
+PRESENT_TABLE = "sync_present_members"
+
+# (id, display_name, username, joined_at)
+MemberRow = Tuple[int, str, str, Optional[datetime]]
 
 async def bulk_upsert_users(pool, rows: Iterable[Tuple[int, str, str]]):
     # Délégué à core.db.bulk_upsert_users pour conserver logique existante
-    from core import db as core_db  # import local pour éviter cycles
     return await core_db.bulk_upsert_users(pool, rows)
 
-__all__ = ["bulk_upsert_users"]
\ No newline at end of file
+
+class MemberSyncWriter:
+    """Écriture par lots d'une synchronisation de serveur (à utiliser avec `async with`)."""
+
+    def __init__(self, pool, guild_id: int):
+        self.pool = pool
+        self.guild_id = guild_id
+        self.written = 0
+        self.started_at: Optional[datetime] = None
+        self._conn = None
+
+    async def __aenter__(self) -> "MemberSyncWriter":
+        # Avant la collecte : les arrivées postérieures (événements join écrits pendant la
+        # synchronisation) ne seront pas marquées parties
+        self.started_at = datetime.now(timezone.utc)
+        self._conn = await self.pool.acquire()
+        try:
+            await self._conn.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {PRESENT_TABLE} (user_id BIGINT PRIMARY KEY); "
+                f"TRUNCATE {PRESENT_TABLE};"
+            )
+        except BaseException:
+            await self.pool.release(self._conn)
+            self._conn = None
+            raise
+        return self
+
+    async def write_chunk(self, rows: Sequence[MemberRow]) -> int:
+        if not rows:
+            return 0
+        async with self._conn.transaction():
+            await core_db.UPSERT_USER.executemany(self._conn, [(r[0], r[1], r[2]) for r in rows])
+            await guild_members_db.upsert_present(self._conn, self.guild_id, [(r[0], r[3]) for r in rows])
+            await self._conn.copy_records_to_table(PRESENT_TABLE, records=[(r[0],) for r in rows])
+        self.written += len(rows)
+        return len(rows)
+
+    async def finish(self) -> int:
+        """Marque partis les membres non vus. Retourne le nombre de départs."""
+        return await guild_members_db.mark_absent_left(self._conn, self.guild_id, PRESENT_TABLE, self.started_at)
+
+    async def __aexit__(self, *exc):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            # La connexion retourne au pool : la table temporaire ne doit pas lui survivre
+            await conn.execute(f"DROP TABLE IF EXISTS {PRESENT_TABLE}")
+        finally:
+            await self.pool.release(conn)
+
+__all__ = ["bulk_upsert_users", "MemberSyncWriter"]
@@ -1,10 +1,14 @@
 """
 Helpers base de données pour la fonctionnalité voice hubs.
+
+Les requêtes sont des requêtes nommées `voice_hubs.*` (`core.statements`), préparées par connexion.
 """
 from __future__ import annotations
 import asyncpg
 from typing import Optional, Sequence
 
+from core import statements
+
 VOICE_HUB_SCHEMA = """
 CREATE TABLE IF NOT EXISTS voice_hub (
     id BIGINT PRIMARY KEY,
@@ -34,30 +38,33 @@ async def ensure_voice_hub_schema(pool: asyncpg.Pool):
     async with pool.acquire() as conn:
         await conn.execute(VOICE_HUB_SCHEMA)
 
-async def insert_hub(pool: asyncpg.Pool, channel_id: int, guild_id: int):
-    q = """INSERT INTO voice_hub(id, guild_id) VALUES($1,$2)
+INSERT_HUB = statements.define("voice_hubs.insert_hub", """INSERT INTO voice_hub(id, guild_id) VALUES($1,$2)
             ON CONFLICT (id) DO UPDATE SET updated_at = NOW(), active = TRUE
-            RETURNING id, guild_id, active, naming_scheme, max_rooms"""
+            RETURNING id, guild_id, active, naming_scheme, max_rooms""")
+
+async def insert_hub(pool: asyncpg.Pool, channel_id: int, guild_id: int):
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, channel_id, guild_id)
+        return await INSERT_HUB.fetchrow(conn, channel_id, guild_id)
+
+DEACTIVATE_HUB = statements.define("voice_hubs.deactivate_hub", "UPDATE voice_hub SET active = FALSE, updated_at = NOW() WHERE id=$1")
 
 async def deactivate_hub(pool: asyncpg.Pool, channel_id: int):
-    q = "UPDATE voice_hub SET active = FALSE, updated_at = NOW() WHERE id=$1"
     async with pool.acquire() as conn:
-        await conn.execute(q, channel_id)
+        await DEACTIVATE_HUB.execute(conn, channel_id)
+
+FETCH_ACTIVE_HUBS = statements.define("voice_hubs.fetch_active_hubs", "SELECT id, guild_id, naming_scheme, max_rooms FROM voice_hub WHERE active=TRUE")
 
 async def fetch_active_hubs(pool: asyncpg.Pool) -> Sequence[asyncpg.Record]:
-    q = "SELECT id, guild_id, naming_scheme, max_rooms FROM voice_hub WHERE active=TRUE"
     async with pool.acquire() as conn:
-        return await conn.fetch(q)
+        return await FETCH_ACTIVE_HUBS.fetch(conn)
+
+HUB_EXISTS = statements.define("voice_hubs.hub_exists", "SELECT 1 FROM voice_hub WHERE id=$1 AND active=TRUE")
 
 async def hub_exists(pool: asyncpg.Pool, channel_id: int) -> bool:
-    q = "SELECT 1 FROM voice_hub WHERE id=$1 AND active=TRUE"
     async with pool.acquire() as conn:
-        return await conn.fetchval(q, channel_id) is not None
+        return await HUB_EXISTS.fetchval(conn, channel_id) is not None
 
-async def update_hub_config(pool: asyncpg.Pool, channel_id: int, naming_scheme: str | None, user_limit: int | None):
-    q = """
+UPDATE_HUB_CONFIG = statements.define("voice_hubs.update_hub_config", """
         UPDATE voice_hub
         SET
             naming_scheme = COALESCE($2, naming_scheme),
@@ -65,39 +72,44 @@ async def update_hub_config(pool: asyncpg.Pool, channel_id: int, naming_scheme:
             updated_at = NOW()
         WHERE id=$1
         RETURNING id, naming_scheme, max_rooms
-    """
+    """)
+
+async def update_hub_config(pool: asyncpg.Pool, channel_id: int, naming_scheme: str | None, user_limit: int | None):
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, channel_id, naming_scheme, user_limit)
+        return await UPDATE_HUB_CONFIG.fetchrow(conn, channel_id, naming_scheme, user_limit)
+
+FETCH_HUB_CONFIG = statements.define("voice_hubs.fetch_hub_config", "SELECT id, naming_scheme, max_rooms FROM voice_hub WHERE id=$1")
 
 async def fetch_hub_config(pool: asyncpg.Pool, channel_id: int):
-    q = "SELECT id, naming_scheme, max_rooms FROM voice_hub WHERE id=$1"
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, channel_id)
+        return await FETCH_HUB_CONFIG.fetchrow(conn, channel_id)
+
+INSERT_ROOM = statements.define("voice_hubs.insert_room", """INSERT INTO voice_room(id, hub_id, guild_id, creator_id, sequence, name)
+            VALUES($1,$2,$3,$4,$5,$6) RETURNING id""")
 
 async def insert_room(pool: asyncpg.Pool, room_id: int, hub_id: int, guild_id: int, creator_id: Optional[int], sequence: int, name: str):
-    q = """INSERT INTO voice_room(id, hub_id, guild_id, creator_id, sequence, name)
-            VALUES($1,$2,$3,$4,$5,$6) RETURNING id"""
     async with pool.acquire() as conn:
-        return await conn.fetchval(q, room_id, hub_id, guild_id, creator_id, sequence, name)
+        return await INSERT_ROOM.fetchval(conn, room_id, hub_id, guild_id, creator_id, sequence, name)
+
+DELETE_ROOM = statements.define("voice_hubs.delete_room", "DELETE FROM voice_room WHERE id=$1")
 
 async def delete_room(pool: asyncpg.Pool, room_id: int):
-    q = "DELETE FROM voice_room WHERE id=$1"
     async with pool.acquire() as conn:
-        await conn.execute(q, room_id)
+        await DELETE_ROOM.execute(conn, room_id)
+
+FETCH_ROOM = statements.define("voice_hubs.fetch_room", "SELECT id, hub_id FROM voice_room WHERE id=$1")
 
 async def fetch_room(pool: asyncpg.Pool, room_id: int):
-    q = "SELECT id, hub_id FROM voice_room WHERE id=$1"
     async with pool.acquire() as conn:
-        return await conn.fetchrow(q, room_id)
+        return await FETCH_ROOM.fetchrow(conn, room_id)
+
+COUNT_ROOMS_FOR_HUB = statements.define("voice_hubs.count_rooms_for_hub", "SELECT COUNT(*) FROM voice_room WHERE hub_id=$1")
 
 async def count_rooms_for_hub(pool: asyncpg.Pool, hub_id: int) -> int:
-    q = "SELECT COUNT(*) FROM voice_room WHERE hub_id=$1"
     async with pool.acquire() as conn:
-        return await conn.fetchval(q, hub_id) or 0
+        return await COUNT_ROOMS_FOR_HUB.fetchval(conn, hub_id) or 0
 
-async def next_sequence_for_hub(pool: asyncpg.Pool, hub_id: int) -> int:
-    # Retourne le plus petit entier positif manquant (1..max+1) pour combler les trous de numérotation
-    q = """
+NEXT_SEQUENCE_FOR_HUB = statements.define("voice_hubs.next_sequence_for_hub", """
         WITH maxseq AS (
             SELECT COALESCE(MAX(sequence), 0) AS maxs
             FROM voice_room
@@ -115,14 +127,18 @@ async def next_sequence_for_hub(pool: asyncpg.Pool, hub_id: int) -> int:
             ),
             1
         ) AS next_seq
-    """
+    """)
+
+async def next_sequence_for_hub(pool: asyncpg.Pool, hub_id: int) -> int:
+    # Retourne le plus petit entier positif manquant (1..max+1) pour combler les trous de numérotation
     async with pool.acquire() as conn:
-        return await conn.fetchval(q, hub_id) or 1
+        return await NEXT_SEQUENCE_FOR_HUB.fetchval(conn, hub_id) or 1
+
+FETCH_ALL_ROOMS = statements.define("voice_hubs.fetch_all_rooms", "SELECT id, hub_id FROM voice_room")
 
 async def fetch_all_rooms(pool: asyncpg.Pool):
-    q = "SELECT id, hub_id FROM voice_room"
     async with pool.acquire() as conn:
-        return await conn.fetch(q)
+        return await FETCH_ALL_ROOMS.fetch(conn)
 
 __all__ = [
     "ensure_voice_hub_schema","insert_hub","deactivate_hub","fetch_active_hubs","hub_exists","update_hub_config",
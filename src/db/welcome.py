@@ -3,11 +3,25 @@ Helpers base de données pour la fonctionnalité Welcome (salon de bienvenue par
 
 Schéma :
 - welcome_config : guild_id BIGINT PRIMARY KEY, channel_id BIGINT NOT NULL, updated_at TIMESTAMPTZ DEFAULT NOW()
+
+Cache :
+- La configuration est gardée en mémoire par serveur (`get_welcome_channel` ne touche la base
+  qu'en cas d'absence du cache). `set_welcome_channel` / `clear_welcome_channel` (donc
+  `/welcome set|clear`) mettent le cache à jour. `warm_cache` précharge toute la table au démarrage.
+
+Les requêtes sont des requêtes nommées `welcome.*` (`core.statements`), préparées par connexion.
 """
 from __future__ import annotations
 
 import asyncpg
-from typing import Optional
+from typing import Dict, Optional
+
+from core import statements
+
+# guild_id -> channel_id (None = aucun salon configuré)
+_CHANNEL_CACHE: Dict[int, Optional[int]] = {}
+# True une fois la table entière chargée : une absence du cache vaut alors "non configuré"
+_CACHE_COMPLETE = False
 
 
 SCHEMA = """
@@ -24,24 +38,49 @@ async def ensure_schema(pool: asyncpg.Pool):
         await conn.execute(SCHEMA)
 
 
-async def set_welcome_channel(pool: asyncpg.Pool, guild_id: int, channel_id: int):
-    q = """
+WARM_CACHE = statements.define("welcome.warm_cache", "SELECT guild_id, channel_id FROM welcome_config")
+GET_WELCOME_CHANNEL = statements.define("welcome.get_welcome_channel", "SELECT channel_id FROM welcome_config WHERE guild_id=$1")
+
+
+async def warm_cache(pool: asyncpg.Pool) -> int:
+    """Charge toute la configuration en mémoire. Retourne le nombre de serveurs configurés."""
+    global _CACHE_COMPLETE
+    async with pool.acquire() as conn:
+        rows = await WARM_CACHE.fetch(conn)
+    _CHANNEL_CACHE.clear()
+    for r in rows:
+        _CHANNEL_CACHE[int(r["guild_id"])] = int(r["channel_id"])
+    _CACHE_COMPLETE = True
+    return len(rows)
+
+
+SET_WELCOME_CHANNEL = statements.define("welcome.set_welcome_channel", """
     INSERT INTO welcome_config(guild_id, channel_id, updated_at)
     VALUES($1,$2,NOW())
     ON CONFLICT (guild_id) DO UPDATE SET channel_id = EXCLUDED.channel_id, updated_at = NOW()
-    """
+    """)
+
+async def set_welcome_channel(pool: asyncpg.Pool, guild_id: int, channel_id: int):
     async with pool.acquire() as conn:
-        await conn.execute(q, guild_id, channel_id)
+        await SET_WELCOME_CHANNEL.execute(conn, guild_id, channel_id)
+    _CHANNEL_CACHE[guild_id] = channel_id
 
 
 async def get_welcome_channel(pool: asyncpg.Pool, guild_id: int) -> Optional[int]:
-    q = "SELECT channel_id FROM welcome_config WHERE guild_id=$1"
+    if guild_id in _CHANNEL_CACHE:
+        return _CHANNEL_CACHE[guild_id]
+    if _CACHE_COMPLETE:
+        return None
     async with pool.acquire() as conn:
-        val = await conn.fetchval(q, guild_id)
-        return int(val) if val is not None else None
+        val = await GET_WELCOME_CHANNEL.fetchval(conn, guild_id)
+    cid = int(val) if val is not None else None
+    _CHANNEL_CACHE[guild_id] = cid
+    return cid
+
 
+CLEAR_WELCOME_CHANNEL = statements.define("welcome.clear_welcome_channel", "DELETE FROM welcome_config WHERE guild_id=$1")
 
 async def clear_welcome_channel(pool: asyncpg.Pool, guild_id: int):
-    q = "DELETE FROM welcome_config WHERE guild_id=$1"
     async with pool.acquire() as conn:
-        await conn.execute(q, guild_id)
+        await CLEAR_WELCOME_CHANNEL.execute(conn, guild_id)
+    _CHANNEL_CACHE[guild_id] = None
@@ -1,43 +1,83 @@
 """
-Handlers pour les événements membres Discord (join, update, username).
+Handlers pour les événements membres Discord (join, leave, update, username).
 
-Chaque handler persiste immédiatement les données en base (upsert) si un pool est disponible.
+Les upserts `discord_user` passent par l'écrivain groupé du bot (`bot.user_writer`) quand il
+est disponible : un join ou un renommage ne prend alors aucune connexion du pool.
+À l'arrivée d'un membre, la persistance et l'envoi du message de bienvenue (config en cache)
+s'exécutent en parallèle ; lors d'un afflux, les messages sont agrégés (`core.welcome_burst`).
+Arrivées et départs alimentent `guild_member` via l'écrivain groupé `bot.member_writer`.
+Les renommages sont aussi ajoutés à l'historique des noms (`bot.name_history`, écrit par COPY).
 En cas d'erreur, le workflow Discord n'est pas bloqué (log + ignore).
 """
 from __future__ import annotations
 
+import asyncio
 import logging
 import discord
 
-from core import db
+from core import db, member_cache
+from core.welcome_burst import WelcomeBurstAggregator
 from db import welcome as welcome_db
-from views.welcome import build_welcome_embed
 
 logger = logging.getLogger(__name__)
 
 
+async def _persist_user(bot: discord.Client, pool, user_id: int, display_name: str, username: str):
+    writer = getattr(bot, "user_writer", None)
+    if writer is not None:
+        writer.submit(user_id, display_name, username)
+    else:
+        await db.upsert_user(pool, user_id, display_name, username)
+
+
+def _record_name(bot: discord.Client, user_id: int, kind: str, old: str, new: str, *, guild_id: int | None = None):
+    history = getattr(bot, "name_history", None)
+    if history is not None:
+        history.record(user_id, kind, old, new, guild_id=guild_id)
+
+
 def setup(bot: discord.Client):
-    @bot.event
-    async def on_member_join(member: discord.Member):
-        pool = getattr(bot, "db_pool", None)
-        if pool is None:
-            return
+    burst = WelcomeBurstAggregator()
+    bot.welcome_burst = burst  # type: ignore[attr-defined]
+
+    async def _persist_join(pool, member: discord.Member):
         try:
-            await db.upsert_user(pool, member.id, member.display_name, member.name)
+            await _persist_user(bot, pool, member.id, member.display_name, member.name)
+            sink = getattr(bot, "member_writer", None)
+            if sink is not None and not member.bot:
+                sink.joined(member.guild.id, member.id, member.joined_at)
             logger.info("Join -> upsert %s (%s)", member.display_name, member.id)
         except Exception:
             logger.exception("Echec upsert join")
+
+    async def _send_welcome(pool, member: discord.Member):
         # Envoi message de bienvenue si configuré
         try:
             cid = await welcome_db.get_welcome_channel(pool, member.guild.id)
             if cid:
                 ch = member.guild.get_channel(cid)
                 if isinstance(ch, (discord.TextChannel, discord.Thread)):
-                    embed = await build_welcome_embed(member)
-                    await ch.send(embed=embed)
+                    await burst.dispatch(member, ch)
         except Exception:
             logger.exception("Echec envoi message de bienvenue")
 
+    @bot.event
+    async def on_member_join(member: discord.Member):
+        pool = getattr(bot, "db_pool", None)
+        if pool is None:
+            return
+        await asyncio.gather(_persist_join(pool, member), _send_welcome(pool, member))
+
+    @bot.event
+    async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+        # Événement brut : émis même si le membre n'était pas en cache (MEMBER_CACHE partiel)
+        member_cache.MEMBERS.forget(payload.guild_id, payload.user.id)
+        sink = getattr(bot, "member_writer", None)
+        if sink is None or payload.user.bot:
+            return
+        sink.left(payload.guild_id, payload.user.id)
+        logger.info("Leave -> %s (%s) guild %s", payload.user.name, payload.user.id, payload.guild_id)
+
     @bot.event
     async def on_member_update(before: discord.Member, after: discord.Member):
         pool = getattr(bot, "db_pool", None)
@@ -45,7 +85,8 @@ def setup(bot: discord.Client):
             return
         if before.display_name != after.display_name:
             try:
-                await db.upsert_user(pool, after.id, after.display_name, after.name)
+                await _persist_user(bot, pool, after.id, after.display_name, after.name)
+                _record_name(bot, after.id, "display_name", before.display_name, after.display_name, guild_id=after.guild.id)
                 logger.info("Display change: %s -> %s (%s)", before.display_name, after.display_name, after.id)
             except Exception:
                 logger.exception("Echec maj display_name")
@@ -57,8 +98,8 @@ def setup(bot: discord.Client):
             return
         if before.name != after.name:
             try:
-                await db.upsert_user(pool, after.id, getattr(after, 'display_name', after.name), after.name)
+                await _persist_user(bot, pool, after.id, getattr(after, 'display_name', after.name), after.name)
+                _record_name(bot, after.id, "username", before.name, after.name)
                 logger.info("Username change: %s -> %s (%s)", before.name, after.name, after.id)
             except Exception:
                 logger.exception("Echec maj username")
-
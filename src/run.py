@@ -33,7 +33,8 @@ bot = bot_module.Bot()
 # Démarre le bot si le script est exécuté directement
 if __name__ == "__main__":
     try:
-        bot.run(config.BOT_TOKEN)
+        # Journalisation déjà configurée par setup_logging : pas de handler ajouté par discord.py
+        bot.run(config.BOT_TOKEN, log_handler=None)
     except KeyboardInterrupt:
         print("Arrêt manuel")
         sys.exit(0)
@@ -5,6 +5,8 @@ Ce module fournit :
 - AutoroleButton : bouton pour basculer un rôle (cas 1 rôle)
 - AutoroleSelect : liste déroulante pour 2 à 25 rôles
 - AutoroleMultiSelect : plusieurs listes déroulantes pour > 25 rôles
+- build_reaction_embed : panneau du mode réaction (emoji -> rôle), sans composant
+- build_panel_view : choix de la vue adéquate pour un groupe (bouton / select / multi-select)
 
 Contraintes Discord :
 - Un Select (StringSelect) accepte 1 à 25 options maximum
@@ -43,6 +45,39 @@ def parse_emoji(s: Optional[str]) -> Optional[str]:
     return s.strip()
 
 
+def reaction_key(emoji: discord.PartialEmoji | str | None) -> Optional[str]:
+    """Clé normalisée d'un emoji de réaction : ID pour un emoji custom, texte sinon.
+
+    Accepte la chaîne stockée en base (`<:nom:id>`, `nom:id` ou unicode) comme le
+    `PartialEmoji` d'un payload de réaction, pour que les deux côtés se comparent.
+    Le sélecteur de variante U+FE0F est ignoré (Discord ne le renvoie pas toujours).
+    """
+    if emoji is None:
+        return None
+    if isinstance(emoji, str):
+        text = emoji.strip()
+        if not text:
+            return None
+        emoji = discord.PartialEmoji.from_str(text)
+    if emoji.id:
+        return str(emoji.id)
+    return (emoji.name or "").replace("\ufe0f", "") or None
+
+
+def build_reaction_embed(name: str, items: Sequence[dict], guild: discord.Guild) -> discord.Embed:
+    """Embed du panneau en mode réaction : une ligne `emoji — rôle` par item utilisable."""
+    e = discord.Embed(title=f"Autorole — {name}", color=PRIMARY)
+    lines: list[str] = []
+    for r in items:
+        emoji = parse_emoji(r["emoji"])
+        if not emoji or not guild.get_role(int(r["role_id"])):
+            continue
+        lines.append(f"{emoji} — <@&{int(r['role_id'])}>")
+    e.description = "\n".join(lines) or "Aucun rôle disponible."
+    e.set_footer(text="Réagissez pour obtenir un rôle, retirez la réaction pour le perdre.")
+    return e
+
+
 def build_select_options(items: Sequence[dict], guild: discord.Guild):
     """Construit la liste d'options pour un Select à partir d'items de DB.
 
@@ -212,3 +247,77 @@ class AutoroleMultiSelect(discord.ui.View):
 
             select.callback = _cb  # type: ignore
             self.add_item(select)
+
+
+def build_panel_view(group, items: Sequence[dict], guild: discord.Guild) -> discord.ui.View:
+    """Construit la vue persistante d'un groupe à partir de son enregistrement DB.
+
+    1 rôle -> AutoroleButton (label/style persistés), 2..25 -> AutoroleSelect, au-delà -> AutoroleMultiSelect.
+    """
+    count = len(items)
+    if count == 1:
+        try:
+            label = group["button_label"]
+        except Exception:
+            label = None
+        try:
+            style = int(group["button_style"]) if group["button_style"] is not None else None
+        except Exception:
+            style = None
+        return AutoroleButton(role_id=int(items[0]["role_id"]), multi=bool(group["multi"]), guild_id=guild.id,
+                              group_id=int(group["id"]), label=label, style=style)
+    if 2 <= count <= 25:
+        return AutoroleSelect(group_name=str(group["name"]), group_id=int(group["id"]), items=items,
+                              multi=bool(group["multi"]), max_value=int(group["max"]), guild=guild)
+    return AutoroleMultiSelect(group_name=str(group["name"]), group_id=int(group["id"]), items=items,
+                               multi=bool(group["multi"]), max_value=int(group["max"]), guild=guild)
+
+
+def build_repair_embed(reports: dict) -> discord.Embed:
+    """Embed du rapport de réparation des panneaux (un champ par serveur)."""
+    e = discord.Embed(title="Autorole — réparation des panneaux", color=PRIMARY)
+    if not reports:
+        e.description = "Aucun panneau à vérifier."
+        return e
+    for guild_id, r in reports.items():
+        e.add_field(
+            name=f"Serveur {guild_id}",
+            value=(f"vérifiés {r.checked} • ok {r.ok} • republiés {r.reposted} • "
+                   f"marqués cassés {r.marked_broken} • irréparables {r.unrepairable} • échecs {r.failed}"),
+            inline=False,
+        )
+    return e
+
+
+def _fmt_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s:02d}s"
+
+
+def build_backfill_embed(jobs: Sequence[dict], live: dict) -> discord.Embed:
+    """Embed d'état des jobs de backfill d'un serveur.
+
+    Arguments:
+        jobs: lignes `autorole_backfill_job` (avec `group_name`), les plus récentes d'abord
+        live: job_id -> BackfillProgress pour les jobs en cours d'exécution (débit/ETA)
+    """
+    e = discord.Embed(title="Autorole — backfill", color=PRIMARY)
+    if not jobs:
+        e.description = "Aucun job."
+        return e
+    for j in jobs:
+        action = "ajout" if j["action"] == "add" else "retrait"
+        roles = " ".join(f"<@&{int(rid)}>" for rid in j["role_ids"])
+        counts = f"{j['processed']}/{j['total']} membres • {j['changed']} modifiés"
+        if j["failed"]:
+            counts += f" • {j['failed']} échecs"
+        lines = [f"{action} {roles}", counts]
+        prog = live.get(int(j["id"]))
+        if prog is not None:
+            lines.append(f"{prog.rate():.1f} membres/s • ETA {_fmt_duration(prog.eta())}")
+        e.add_field(name=f"#{j['id']} {j['group_name']} — {j['status']}", value="\n".join(lines)[:1024], inline=False)
+    return e
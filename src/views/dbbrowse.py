@@ -12,10 +12,21 @@ def build_root_embed(tables: list[str]) -> discord.Embed:
     e.add_field(name="Tables", value=", ".join(tables) or "(aucune)", inline=False)
     return e
 
-def build_table_embed(page: TablePage) -> discord.Embed:
-    title = f"Table: {page.table} (page {page.page+1})"
+def format_total(page: TablePage) -> str:
+    if page.total is None:
+        return "inconnu"
+    if page.total_exact:
+        return str(page.total)
+    return f"≈{page.total} (estimation)"
+
+def build_table_embed(page: TablePage, *, title: str | None = None, footer: str | None = None) -> discord.Embed:
+    num = f"~{page.page+1}" if page.page_approx else str(page.page+1)
+    title = f"{title or f'Table: {page.table}'} (page {num})"
     e = discord.Embed(title=title, color=PRIMARY_COLOR)
-    if page.total == 0:
+    footer = footer or page.note
+    if footer:
+        e.set_footer(text=footer)
+    if not page.rows:
         e.description = "Aucune ligne."
         return e
     header = " | ".join(page.columns)
@@ -31,7 +42,12 @@ def build_table_embed(page: TablePage) -> discord.Embed:
     preview = "\n".join(lines)
     if len(preview) > 3800:
         preview = preview[:3800] + "\n…"
-    e.description = f"Total lignes: {page.total}\n``{preview}``"
+    e.description = f"Total lignes: {format_total(page)}\n``{preview}``"
     return e
 
-__all__ = ["build_root_embed", "build_table_embed"]
+def build_plan_text(plan: str, limit: int = 1900) -> str:
+    if len(plan) > limit:
+        plan = plan[:limit] + "\n…"
+    return f"```\n{plan.replace('`', '')}\n```"
+
+__all__ = ["build_root_embed", "build_table_embed", "build_plan_text", "format_total"]
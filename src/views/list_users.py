@@ -4,18 +4,28 @@ Embeds pour la commande `/list_users`.
 from __future__ import annotations
 import discord
 
-def build_empty_embed(total: int) -> discord.Embed:
-    e = discord.Embed(title=f"Utilisateurs ({total})", description="Aucun utilisateur en base.", color=discord.Color.blurple())
+def _title(total: int, exact: bool = True, search: str | None = None) -> str:
+    count = str(total) if exact else f"≈{total}"
+    if search:
+        return f"Utilisateurs « {search} » ({count})"
+    return f"Utilisateurs ({count})"
+
+def build_empty_embed(total: int, *, exact: bool = True, search: str | None = None) -> discord.Embed:
+    description = "Aucun utilisateur ne correspond." if search else "Aucun utilisateur en base."
+    e = discord.Embed(title=_title(total, exact, search), description=description, color=discord.Color.blurple())
     return e
 
-def build_users_embed(total: int, page: int, pages: int, page_size: int, rows):
-    e = discord.Embed(title=f"Utilisateurs ({total})", color=discord.Color.blurple())
+def build_users_embed(total: int, page: int, pages: int, page_size: int, rows, *, exact: bool = True,
+                      search: str | None = None, approx_page: bool = False, start: int | None = None):
+    e = discord.Embed(title=_title(total, exact, search), color=discord.Color.blurple())
     lines = []
-    start_index = page * page_size
+    start_index = page * page_size if start is None else start
+    mark = "~" if approx_page else ""
     for idx, r in enumerate(rows, start=start_index + 1):
-        lines.append(f"**{idx}.** `{r['id']}` — {r['display_name']} (@{r['username']})")
+        lines.append(f"**{mark}{idx}.** `{r['id']}` — {r['display_name']} (@{r['username']})")
     e.description = "\n".join(lines)
-    e.set_footer(text=f"Page {page + 1}/{pages} • {page_size} par page")
+    pages_txt = str(pages) if exact else f"~{pages}"
+    e.set_footer(text=f"Page {mark}{page + 1}/{pages_txt} • {page_size} par page")
     return e
 
 __all__ = ["build_empty_embed", "build_users_embed"]
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+Embeds pour la commande `/name_history`.
+"""
+from __future__ import annotations
+import discord
+
+KIND_LABELS = {"username": "Nom d'utilisateur", "display_name": "Pseudo"}
+
+def build_history_embed(user: discord.abc.User, rows) -> discord.Embed:
+    e = discord.Embed(title=f"Historique des noms — {user}", color=discord.Color.blurple())
+    if not rows:
+        e.description = "Aucun changement enregistré."
+        return e
+    lines = []
+    for r in rows:
+        ts = discord.utils.format_dt(r['changed_at'], style='f')
+        label = KIND_LABELS.get(r['kind'], r['kind'])
+        old = discord.utils.escape_markdown(r['old_value'] or '?')
+        new = discord.utils.escape_markdown(r['new_value'])
+        lines.append(f"{ts} · {label} : {old} → **{new}**")
+    e.description = "\n".join(lines)[:4000]
+    return e
+
+__all__ = ["build_history_embed"]
@@ -3,8 +3,16 @@ Textes et helpers pour la commande `/sync_users`.
 """
 from __future__ import annotations
 
-def build_success(count: int) -> str:
-    return f"Sync OK: {count} utilisateurs"
+def build_success(count: int, left: int | None = None) -> str:
+    text = f"Sync OK: {count} utilisateurs"
+    if left:
+        text += f", {left} départs enregistrés"
+    return text
+
+def build_progress(written: int, total: int | None, elapsed: float) -> str:
+    rate = written / elapsed if elapsed > 0 else 0
+    done = f"{written}/{total}" if total else str(written)
+    return f"Sync en cours… {done} membres ({rate:.0f}/s)"
 
 def build_error() -> str:
     return "Erreur sync"
@@ -12,4 +20,4 @@ def build_error() -> str:
 def build_no_db() -> str:
     return "DB non configurée"
 
-__all__ = ["build_success", "build_error", "build_no_db"]
\ No newline at end of file
+__all__ = ["build_success", "build_progress", "build_error", "build_no_db"]
\ No newline at end of file
@@ -7,6 +7,8 @@ import re
 import discord
 from typing import Optional, Set
 
+from core import member_cache
+
 CONTROL_TITLE = "Voice Hub"
 
 
@@ -76,7 +78,7 @@ def build_control_view(manager, meta: "RoomMeta", *, readonly: bool = False) ->
                 guild = resolved_guild
             if not isinstance(channel, discord.VoiceChannel) or not isinstance(guild, discord.Guild):
                 return
-            creator_member = guild.get_member(rm.creator_id) if rm.creator_id else None
+            creator_member = member_cache.cached(guild, rm.creator_id) if rm.creator_id else None
             embed = build_control_embed(rm, channel, creator_member)
             # Essaye d'éditer via interaction courante si possible sinon via fetch
             text_channel_id = getattr(rm, "text_channel_id", None)
@@ -120,7 +122,7 @@ def build_control_view(manager, meta: "RoomMeta", *, readonly: bool = False) ->
                 return False
             channel, guild = self._resolve_channel_and_guild(rm)
             if isinstance(guild, discord.Guild):
-                member = guild.get_member(interaction.user.id)
+                member = member_cache.from_interaction(interaction)
                 if member and member.guild_permissions.administrator:
                     return True
             if rm.creator_id == interaction.user.id:
@@ -309,7 +311,7 @@ def build_control_view(manager, meta: "RoomMeta", *, readonly: bool = False) ->
                 await interaction.response.send_message("Erreur lors de la mise à jour des permissions", ephemeral=True)
                 return
 
-            creator_member = guild.get_member(rm.creator_id) if rm.creator_id else None
+            creator_member = member_cache.cached(guild, rm.creator_id) if rm.creator_id else None
             new_embed = build_control_embed(rm, channel, creator_member)
             new_view = build_control_view(manager, rm)
             try:
@@ -383,7 +385,7 @@ def build_control_view(manager, meta: "RoomMeta", *, readonly: bool = False) ->
                             raise RuntimeError("EMPTY_LIST")
                         options = []
                         for uid in source_ids[:25]:  # Discord Select max 25 options
-                            member = self.guild.get_member(uid) if self.guild else None
+                            member = member_cache.cached(self.guild, uid) if self.guild else None
                             label = member.display_name if isinstance(member, discord.Member) else f"ID {uid}"
                             desc = f"{member.name}" if isinstance(member, discord.Member) else "Utilisateur inconnu"
                             options.append(discord.SelectOption(label=label, value=str(uid), description=desc))
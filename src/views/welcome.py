@@ -1,8 +1,11 @@
 """
 Embed de bienvenue stylisé Valorant (propre et minimal).
+
+La carte PNG optionnelle est rendue par `views.welcome_card` (voir `build_welcome_payload`).
 """
 from __future__ import annotations
-from typing import Optional
+import asyncio
+from typing import Optional, Sequence
 import discord
 
 VALORANT_RED = discord.Color.from_str("#FF4655")  # Rouge Valorant
@@ -41,3 +44,35 @@ async def build_welcome_embed(
 
     e.set_footer(text="Respect • Jeu d’équipe • Fair-play")
     return e
+
+
+def build_welcome_burst_embed(
+    guild: discord.Guild,
+    members: Sequence[discord.Member],
+    *,
+    color: Optional[discord.Color] = None,
+) -> discord.Embed:
+    """Variante multi-membres, utilisée pendant un afflux d'arrivées (un embed pour N membres)."""
+    title = f"‹ BIENVENUE, AGENTS ({len(members)}) ›"
+    roster = "\n".join(f"▸ {m.mention}" for m in members)
+    e = discord.Embed(
+        title=title,
+        description=f"╺━━━━━━━━━━━━━━━━╸\nAccès accordé à {guild.name}. Protocole actif.\n{roster}\n╺━━━━━━━━━━━━━━━━╸"[:4096],
+        color=color or VALORANT_RED,
+        timestamp=discord.utils.utcnow(),
+    )
+    if guild.icon:
+        e.set_author(name="PROTOCOL // VALORANT", icon_url=guild.icon.url)
+    e.set_footer(text="Respect • Jeu d’équipe • Fair-play")
+    return e
+
+
+async def build_welcome_payload(member: discord.Member) -> dict:
+    """Arguments `send(...)` du message de bienvenue : embed, plus la carte PNG si activée."""
+    from views.welcome_card import render_card_file  # import local (Pillow optionnel)
+
+    embed, card = await asyncio.gather(build_welcome_embed(member), render_card_file(member))
+    if card is None:
+        return {"embed": embed}
+    embed.set_image(url=f"attachment://{card.filename}")
+    return {"embed": embed, "file": card}
@@ -0,0 +1,258 @@
+"""
+Carte de bienvenue rendue en PNG (avatar, nom, numéro de membre).
+
+Principes :
+- La composition Pillow s'exécute dans un pool de threads dédié : la boucle asyncio ne bloque jamais.
+- Les fonds (bannière du serveur ou dégradé par défaut) et les polices sont décodés une seule fois
+  puis gardés dans des caches LRU ; le masque circulaire de l'avatar est calculé une fois.
+- Les octets d'avatar passent par un cache LRU borné en taille : un membre qui revient ou un afflux
+  d'arrivées réutilise le travail déjà fait.
+- La récupération des avatars est injectable (`AvatarFetcher`) ; `LocalAvatarStub` génère des avatars
+  localement pour tester ou mesurer sans réseau (voir `tools/bench_welcome_card.py`).
+
+Activation : `WELCOME_CARD_ENABLED=true` et Pillow installé. Sans Pillow, `render_card_file` retourne None
+et l'embed texte reste utilisé seul.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+import discord
+
+from core import config
+
+try:  # Dépendance optionnelle
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    Image = ImageDraw = ImageFont = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+CARD_SIZE = (1024, 360)
+AVATAR_SIZE = 256
+CARD_FILENAME = "welcome.png"
+ACCENT = (255, 70, 85)  # Rouge Valorant
+
+BACKGROUND_CACHE_SIZE = 64
+
+AvatarFetcher = Callable[[discord.Member], Awaitable[bytes]]
+
+
+def cards_available() -> bool:
+    return Image is not None
+
+
+class BytesLRU:
+    """Cache LRU borné par le volume total d'octets stockés."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        val = self._data.get(key)
+        if val is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def put(self, key: Hashable, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._data[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes and self._data:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+async def discord_avatar_fetcher(member: discord.Member) -> bytes:
+    """Récupère l'avatar via le CDN Discord (PNG, taille fixe pour un cache homogène)."""
+    return await member.display_avatar.replace(size=AVATAR_SIZE, format="png").read()
+
+
+class LocalAvatarStub:
+    """Fetcher local : avatar uni déterministe par membre, sans réseau. Compte les appels."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, member: discord.Member) -> bytes:
+        self.calls += 1
+        seed = zlib.crc32(str(member.id).encode())
+        color = (seed & 0xFF, (seed >> 8) & 0xFF, (seed >> 16) & 0xFF)
+        buf = io.BytesIO()
+        Image.new("RGB", (AVATAR_SIZE, AVATAR_SIZE), color).save(buf, format="PNG")
+        return buf.getvalue()
+
+
+# ---------- assets décodés (appelés dans le pool de threads) ----------
+
+@lru_cache(maxsize=16)
+def _load_font(path: Optional[str], size: int):
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            logger.warning("Police de carte introuvable: %s (police par défaut)", path)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4)
+def _avatar_mask(size: int):
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size - 1, size - 1), fill=255)
+    return mask
+
+
+@lru_cache(maxsize=1)
+def _default_background():
+    w, h = CARD_SIZE
+    bg = Image.new("RGB", CARD_SIZE, (15, 25, 35))
+    draw = ImageDraw.Draw(bg)
+    for x in range(w):
+        shade = int(40 * x / w)
+        draw.line([(x, 0), (x, h)], fill=(15 + shade, 25, 35 + shade))
+    draw.rectangle((0, h - 8, w, h), fill=ACCENT)
+    return bg
+
+
+_BACKGROUNDS: "OrderedDict[Hashable, object]" = OrderedDict()
+_BACKGROUNDS_LOCK = threading.Lock()
+
+
+def _cached_background(key: Hashable):
+    with _BACKGROUNDS_LOCK:
+        cached = _BACKGROUNDS.get(key)
+        if cached is not None:
+            _BACKGROUNDS.move_to_end(key)
+        return cached
+
+
+def _decode_background(key: Hashable, data: bytes):
+    cached = _cached_background(key)
+    if cached is not None:
+        return cached
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    # Recadrage centré au ratio de la carte puis redimensionnement, fait une seule fois
+    w, h = img.size
+    target_ratio = CARD_SIZE[0] / CARD_SIZE[1]
+    if w / h > target_ratio:
+        nw = int(h * target_ratio)
+        img = img.crop(((w - nw) // 2, 0, (w - nw) // 2 + nw, h))
+    else:
+        nh = int(w / target_ratio)
+        img = img.crop((0, (h - nh) // 2, w, (h - nh) // 2 + nh))
+    img = img.resize(CARD_SIZE)
+    with _BACKGROUNDS_LOCK:
+        _BACKGROUNDS[key] = img
+        while len(_BACKGROUNDS) > BACKGROUND_CACHE_SIZE:
+            _BACKGROUNDS.popitem(last=False)
+    return img
+
+
+def _compose(background, avatar_bytes: bytes, name: str, subtitle: str, font_path: Optional[str]) -> bytes:
+    card = background.copy()
+    avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGB").resize((AVATAR_SIZE, AVATAR_SIZE))
+    top = (CARD_SIZE[1] - AVATAR_SIZE) // 2
+    draw = ImageDraw.Draw(card)
+    draw.ellipse((40 - 6, top - 6, 40 + AVATAR_SIZE + 6, top + AVATAR_SIZE + 6), fill=ACCENT)
+    card.paste(avatar, (40, top), _avatar_mask(AVATAR_SIZE))
+    x = 40 + AVATAR_SIZE + 48
+    draw.text((x, top + 20), "BIENVENUE", font=_load_font(font_path, 40), fill=ACCENT)
+    draw.text((x, top + 80), name[:24], font=_load_font(font_path, 64), fill=(255, 255, 255))
+    draw.text((x, top + 170), subtitle, font=_load_font(font_path, 32), fill=(200, 200, 200))
+    buf = io.BytesIO()
+    card.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+class WelcomeCardRenderer:
+    def __init__(self, *, fetcher: Optional[AvatarFetcher] = None, avatar_cache_bytes: Optional[int] = None,
+                 workers: Optional[int] = None, font_path: Optional[str] = None):
+        self.fetcher = fetcher or discord_avatar_fetcher
+        self.avatars = BytesLRU(avatar_cache_bytes if avatar_cache_bytes is not None else config.WELCOME_CARD_AVATAR_CACHE_MB * 1024 * 1024)
+        self.font_path = font_path or config.WELCOME_CARD_FONT
+        self._executor = ThreadPoolExecutor(max_workers=workers or config.WELCOME_CARD_WORKERS, thread_name_prefix="welcome-card")
+
+    async def _avatar_bytes(self, member: discord.Member) -> bytes:
+        key: Tuple[int, str] = (member.id, getattr(getattr(member, "display_avatar", None), "key", ""))
+        data = self.avatars.get(key)
+        if data is None:
+            data = await self.fetcher(member)
+            self.avatars.put(key, data)
+        return data
+
+    async def _background(self, guild: discord.Guild):
+        loop = asyncio.get_running_loop()
+        banner = getattr(guild, "banner", None)
+        if banner is None:
+            return await loop.run_in_executor(self._executor, _default_background)
+        key = (guild.id, banner.key)
+        cached = _cached_background(key)
+        if cached is not None:
+            return cached
+        data = await banner.replace(size=1024, format="png").read()
+        return await loop.run_in_executor(self._executor, _decode_background, key, data)
+
+    async def render(self, member: discord.Member) -> bytes:
+        guild = member.guild
+        avatar, background = await asyncio.gather(self._avatar_bytes(member), self._background(guild))
+        subtitle = f"Membre #{guild.member_count}" if guild.member_count else guild.name
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, _compose, background, avatar, member.display_name, subtitle, self.font_path
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_renderer: Optional[WelcomeCardRenderer] = None
+
+
+def get_renderer() -> WelcomeCardRenderer:
+    global _renderer
+    if _renderer is None:
+        _renderer = WelcomeCardRenderer()
+    return _renderer
+
+
+async def render_card_file(member: discord.Member) -> Optional[discord.File]:
+    """Carte de bienvenue prête à joindre, ou None si désactivée / indisponible / en échec."""
+    if not config.WELCOME_CARD_ENABLED or not cards_available():
+        return None
+    try:
+        png = await get_renderer().render(member)
+    except Exception:  # noqa: BLE001
+        logger.exception("Echec rendu carte de bienvenue pour %s", member.id)
+        return None
+    return discord.File(io.BytesIO(png), filename=CARD_FILENAME)
+
+
+__all__ = [
+    "WelcomeCardRenderer", "LocalAvatarStub", "BytesLRU", "discord_avatar_fetcher",
+    "render_card_file", "get_renderer", "cards_available", "CARD_FILENAME",
+]
@@ -0,0 +1,100 @@
+"""
+Benchmark mémoire du cache de membres, sans réseau.
+
+Construit un serveur factice de `--members` membres (objets `discord.Member` réels, charges
+utiles gateway synthétiques) et mesure avec `tracemalloc` :
+- avant : cache complet (`MEMBER_CACHE=all`, chunk au démarrage), tous les membres en cache ;
+- après : cache partiel (`MEMBER_CACHE=voice`, sans chunk), seuls `--active` membres récemment
+  actifs sont gardés dans le LRU de `core.member_cache` (limité à `MEMBER_LRU_SIZE`).
+
+Usage :
+    python tools/bench_member_cache.py [--members 100000] [--active 2000] [--lru 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("BOT_TOKEN", "bench")  # évite le warning de core.config
+
+import discord  # noqa: E402
+
+from core.member_cache import MemberLRU  # noqa: E402
+
+GUILD_ID = 1
+
+
+def _member_payload(i: int) -> dict:
+    uid = str(100000000000000000 + i)
+    return {
+        "user": {"id": uid, "username": f"user{i}", "discriminator": "0", "global_name": f"User {i}", "avatar": None},
+        "nick": f"Pseudo {i}" if i % 3 == 0 else None,
+        "roles": [str(10 + (i % 5))],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def _make_guild(client: discord.Client) -> discord.Guild:
+    data = {
+        "id": str(GUILD_ID), "name": "Bench", "owner_id": "1", "member_count": 0,
+        "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "0", "position": 0,
+                   "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "emojis": [], "features": [], "channels": [],
+    }
+    return discord.Guild(data=data, state=client._connection)
+
+
+def _measure(fn) -> tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = fn()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=100_000)
+    parser.add_argument("--active", type=int, default=2_000, help="membres actifs pendant la fenêtre")
+    parser.add_argument("--lru", type=int, default=1_000, help="MEMBER_LRU_SIZE")
+    args = parser.parse_args()
+
+    client = discord.Client(intents=discord.Intents.default())
+    state = client._connection
+
+    def full_cache():
+        guild = _make_guild(client)
+        for i in range(args.members):
+            guild._add_member(discord.Member(data=_member_payload(i), guild=guild, state=state))  # type: ignore[arg-type]
+        return guild
+
+    def partial_cache():
+        guild = _make_guild(client)
+        lru = MemberLRU(args.lru, ttl=300)
+        for i in range(args.active):
+            lru.put(GUILD_ID, i, discord.Member(data=_member_payload(i), guild=guild, state=state))  # type: ignore[arg-type]
+        return guild, lru
+
+    before, guild = _measure(full_cache)
+    # Les utilisateurs restent référencés par l'état du client : on repart d'un état vierge
+    del guild
+    state._users.clear()
+    after, (_, lru) = _measure(partial_cache)
+    print(f"Membres du serveur : {args.members}, actifs : {args.active}, LRU : {args.lru}")
+    print(f"avant (cache complet) : {before / 1024 / 1024:8.1f} Mo  ({before / max(1, args.members):.0f} o/membre)")
+    print(f"après (LRU)           : {after / 1024 / 1024:8.1f} Mo  ({len(lru)} membres gardés)")
+    print(f"gain                  : {(before - after) / 1024 / 1024:8.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark du rendu des cartes de bienvenue (cartes/seconde), sans réseau.
+
+Les avatars sont fournis par `LocalAvatarStub` ; deux passes sont mesurées :
+- froide : chaque membre est nouveau (avatar récupéré puis mis en cache) ;
+- chaude : mêmes membres (octets d'avatar servis par le cache LRU).
+
+Usage :
+    python tools/bench_welcome_card.py [--cards 200] [--concurrency 16] [--workers 2]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("BOT_TOKEN", "bench")  # évite le warning de core.config
+
+from views.welcome_card import LocalAvatarStub, WelcomeCardRenderer, cards_available  # noqa: E402
+
+
+def _fake_member(i: int, guild) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=100000000000000000 + i,
+        display_name=f"Agent {i}",
+        guild=guild,
+        display_avatar=SimpleNamespace(key=f"avatar{i}"),
+    )
+
+
+async def _run_pass(renderer: WelcomeCardRenderer, members, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(m):
+        async with sem:
+            await renderer.render(m)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(m) for m in members))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    if not cards_available():
+        raise SystemExit("Pillow non installé")
+
+    stub = LocalAvatarStub()
+    renderer = WelcomeCardRenderer(fetcher=stub, workers=args.workers)
+    guild = SimpleNamespace(id=1, name="Bench", member_count=12345, banner=None)
+    members = [_fake_member(i, guild) for i in range(args.cards)]
+    try:
+        cold = await _run_pass(renderer, members, args.concurrency)
+        fetches = stub.calls
+        warm = await _run_pass(renderer, members, args.concurrency)
+    finally:
+        renderer.close()
+    print(f"cartes: {args.cards} | workers: {args.workers} | concurrence: {args.concurrency}")
+    print(f"froid : {args.cards / cold:8.1f} cartes/s ({fetches} avatars récupérés)")
+    print(f"chaud : {args.cards / warm:8.1f} cartes/s ({stub.calls - fetches} avatars récupérés, "
+          f"cache {renderer.avatars.size / 1024:.0f} Kio / {len(renderer.avatars)} entrées)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())